@@ -0,0 +1,83 @@
+"""
+aggregator.py — Agrégation des mesures instantanées entre deux publications.
+
+Une trame arrive toutes les ~1,5 s alors qu'on ne publie que toutes les
+PUBLISH_INTERVAL secondes : sans agrégation, la plupart des échantillons PAPP
+et IINST sont perdus. Chaque trame alimente ici min / max / somme / nombre
+par grandeur, dans un tableau de taille fixe : la mémoire ne
+dépend ni de la durée de fonctionnement ni de l'intervalle.
+"""
+
+import threading
+from array import array
+
+from tic_frame import TicFrame
+
+# Grandeur TIC → préfixe de topic (et attribut de la TicFrame)
+METRICS: dict[str, str] = {
+    "PAPP":   "papp",
+    "IINST1": "iinst1",
+    "IINST2": "iinst2",
+    "IINST3": "iinst3",
+}
+
+# Emplacements dans le tableau, par grandeur
+_MIN, _MAX, _SUM, _COUNT = range(4)
+_SLOTS = 4
+
+
+class WindowAggregator:
+    """
+    Statistiques sur la fenêtre courante, remises à zéro à chaque flush().
+    add() et flush() peuvent être appelés depuis deux threads différents.
+    """
+
+    def __init__(self):
+        self._labels = tuple(METRICS)
+        self._attrs  = tuple(METRICS.values())
+        self._stats  = array("d", bytes(8 * _SLOTS * len(self._labels)))
+        self._lock   = threading.Lock()
+
+    def add(self, frame: TicFrame) -> None:
+        """Intègre les grandeurs présentes dans une trame typée."""
+        stats = self._stats
+        with self._lock:
+            for i, attr in enumerate(self._attrs):
+                value = getattr(frame, attr)
+                if value is None:
+                    continue
+                base = i * _SLOTS
+                if stats[base + _COUNT]:
+                    if value < stats[base + _MIN]:
+                        stats[base + _MIN] = value
+                    if value > stats[base + _MAX]:
+                        stats[base + _MAX] = value
+                else:
+                    stats[base + _MIN] = stats[base + _MAX] = value
+                stats[base + _SUM]   += value
+                stats[base + _COUNT] += 1
+
+    def flush(self) -> dict[str, int | float]:
+        """
+        Retourne { topic: valeur } (ex : papp_max, iinst1_mean) pour les
+        grandeurs vues depuis le dernier flush, puis remet la fenêtre à zéro.
+        """
+        result: dict[str, int | float] = {}
+        stats = self._stats
+        with self._lock:
+            for i, label in enumerate(self._labels):
+                base  = i * _SLOTS
+                count = stats[base + _COUNT]
+                if not count:
+                    continue
+                prefix = METRICS[label]
+                result[f"{prefix}_min"]  = _number(stats[base + _MIN])
+                result[f"{prefix}_max"]  = _number(stats[base + _MAX])
+                result[f"{prefix}_mean"] = round(stats[base + _SUM] / count, 1)
+            for j in range(len(stats)):
+                stats[j] = 0.0
+        return result
+
+
+def _number(v: float) -> int | float:
+    return int(v) if v.is_integer() else v
@@ -0,0 +1,181 @@
+"""
+benchmark.py — Microbenchmarks des fonctions du chemin critique.
+
+Mesure, sur des trames historiques synthétiques (tic_synth.py) :
+  - tic_parser.parse_frame       trame brute → { LABEL: str }
+  - payload.structure_payload    { LABEL: str } → TicFrame
+  - publisher.publish_all        TicFrame → publications (client sans effet)
+
+Cas : monophasé, triphasé, chacune des six périodes Tempo, checksums
+corrompues (20 % des lignes) et checksums valant SP.
+
+Pour chaque fonction et chaque cas :
+  - ns_per_frame     meilleur temps moyen sur `--repeat` passes, GC désactivé
+  - peak_bytes       pic d'allocation moyen pendant un appel (tracemalloc),
+                     résultat compris
+  - blocks           blocs mémoire encore référencés par le résultat, par trame
+
+    python benchmark.py --output bench-0.2.json
+    python benchmark.py --compare bench-0.1.json --tolerance 0.15
+
+Avec --compare, le code de sortie vaut 1 si un temps dépasse l'ancien de plus
+de `tolerance` (15 % par défaut) : utilisable en CI avant une release.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import tic_parser
+import payload
+import publisher
+from tic_synth import PERIODS, FrameGenerator
+
+CASES: dict[str, dict] = {
+    "mono":           {"phases": 1},
+    "tri":            {"phases": 3},
+    **{f"period_{ptec}": {"period": ptec} for ptec in PERIODS},
+    "corrupted":      {"corrupt_rate": 0.2},
+    "space_checksum": {"space_checksums": True},
+}
+
+
+class _NoopClient:
+    """Client MQTT sans effet : ne mesure que le calcul des topics."""
+
+    failures = 0
+
+    def publish(self, topic, value, retain=True, full_topic=None) -> bool:
+        return True
+
+    def add_on_connect(self, callback) -> None:
+        pass
+
+
+# ── Mesures ────────────────────────────────────────────────────────────────────
+
+def _time_ns(fn, inputs: list, repeat: int) -> float:
+    """Meilleur temps moyen par appel, en ns."""
+    best = float("inf")
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            for item in inputs:
+                fn(item)
+            best = min(best, time.perf_counter_ns() - start)
+    finally:
+        if enabled:
+            gc.enable()
+    return best / len(inputs)
+
+
+def _allocations(fn, inputs: list) -> tuple[float, float]:
+    """(pic d'allocation moyen en octets, blocs retenus par résultat)."""
+    tracemalloc.start()
+    try:
+        peaks = 0
+        for item in inputs:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            fn(item)
+            peaks += tracemalloc.get_traced_memory()[1] - before
+
+        before  = tracemalloc.take_snapshot()
+        results = [fn(item) for item in inputs]
+        after   = tracemalloc.take_snapshot()
+        blocks  = sum(stat.count_diff for stat in after.compare_to(before, "filename")
+                      if stat.count_diff > 0)
+        del results
+    finally:
+        tracemalloc.stop()
+    # la liste `results` elle-même : un bloc
+    return peaks / len(inputs), max(blocks - 1, 0) / len(inputs)
+
+
+def run(frames: int, repeat: int) -> dict:
+    client = _NoopClient()
+    results: dict[str, dict] = {}
+    for case, options in CASES.items():
+        generator = FrameGenerator(seed=1, **options)
+        raws   = [next(generator)[1:-1] for _ in range(frames)]      # sans STX / ETX
+        parsed = [tic_parser.parse_frame(raw) for raw in raws]
+        typed  = [payload.structure_payload(item) for item in parsed]
+
+        steps = (
+            ("parse_frame",       tic_parser.parse_frame,                   raws),
+            ("structure_payload", payload.structure_payload,                parsed),
+            ("publish_all",       lambda f: publisher.publish_all(client, f), typed),
+        )
+        results[case] = {}
+        for name, fn, inputs in steps:
+            peak, blocks = _allocations(fn, inputs)
+            results[case][name] = {
+                "ns_per_frame": round(_time_ns(fn, inputs, repeat)),
+                "peak_bytes":   round(peak),
+                "blocks":       round(blocks, 1),
+            }
+    return results
+
+
+# ── Comparaison ────────────────────────────────────────────────────────────────
+
+def compare(current: dict, previous: dict, tolerance: float) -> list[str]:
+    """Régressions de temps au-delà de `tolerance` (0.15 = +15 %)."""
+    regressions = []
+    for case, functions in current["results"].items():
+        for name, stats in functions.items():
+            old = previous.get("results", {}).get(case, {}).get(name)
+            if not old:
+                continue
+            ratio = stats["ns_per_frame"] / old["ns_per_frame"]
+            if ratio > 1 + tolerance:
+                regressions.append(f"{case}/{name} : {old['ns_per_frame']} → "
+                                   f"{stats['ns_per_frame']} ns/trame (+{ratio - 1:.0%})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks du chemin critique")
+    parser.add_argument("--frames", type=int, default=200, help="trames distinctes par cas")
+    parser.add_argument("--repeat", type=int, default=5, help="passes (meilleure retenue)")
+    parser.add_argument("--output", metavar="FICHIER", help="résultats JSON")
+    parser.add_argument("--compare", metavar="FICHIER", help="résultats JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python":    platform.python_version(),
+        "machine":   platform.machine(),
+        "frames":    args.frames,
+        "repeat":    args.repeat,
+        "results":   run(args.frames, args.repeat),
+    }
+
+    print(f"{'cas':<16} {'fonction':<18} {'ns/trame':>10} {'pic (o)':>9} {'blocs':>7}")
+    for case, functions in report["results"].items():
+        for name, stats in functions.items():
+            print(f"{case:<16} {name:<18} {stats['ns_per_frame']:>10} "
+                  f"{stats['peak_bytes']:>9} {stats['blocks']:>7}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"RÉGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,143 +2,636 @@
 bridge.py — Boucle principale du bridge TIC → MQTT.
 
 Responsabilités :
-  - Ouverture et supervision du port série (reconnexion automatique)
-  - Détection des trames TIC (STX 0x02 / ETX 0x03)
-  - Rate-limiting (PUBLISH_INTERVAL secondes entre deux publications)
-  - Orchestration : parser → payload → publisher
+  - Ouverture et supervision des ports série (reconnexion automatique par port)
+  - Lecture par blocs et détection des trames TIC (voir tic_framer.py)
+  - Rate-limiting (PUBLISH_INTERVAL secondes entre deux publications), avec
+    agrégation min / max / moyenne des trames reçues entre deux publications
+  - Puissance active pinst calculée depuis les index (PINST_INTERVAL)
+  - Consommation et coût du jour et du mois par couleur Tempo (ENERGY)
+  - Sorties supplémentaires non bloquantes (SINKS, voir sinks.py)
+  - Historique local des lectures (HISTORY_DIR, voir history.py)
+  - Orchestration : parser → payload (via le cache de lignes) → publisher
+
+Par défaut, tous les compteurs (METERS) sont lus par une boucle asyncio
+unique qui partage la connexion MQTT. Le mode threadé (THREADED) reste
+disponible pour un compteur unique.
 """
 
+import asyncio
 import logging
+import os
 import signal
+import threading
 import time
 from typing import Optional
 
 import serial
 
 import config
+import metrics
+import fake_serial
+import serial_probe
+from capture     import CaptureWriter, capture_path
+from diagnostics import Diagnostics
+from energy      import EnergyMeter, parse_prices, publish_energy
+from history     import HistoryStore
 from mqtt_client import MQTTClient
-from tic_parser  import parse_frame
-from payload     import structure_payload
-from publisher   import publish_all
+from tic_framer  import TicFramer
+from tic_frame   import TicFrame
+from frame_queue import LatestQueue
+from line_cache  import LineCache
+from aggregator  import WindowAggregator
+from power       import PowerEstimator
+from publisher   import Publisher, publish_pinst, publish_state, publish_window
+from sinks       import open_sinks
+from state_file  import StateFile
 
 log = logging.getLogger(__name__)
 
+# Période de scrutation des sources sans descripteur de fichier (rfc2217://...)
+_POLL_INTERVAL = 0.05
+# Taille maximale d'une lecture par scrutation
+_POLL_CHUNK = 4096
+
+# Réouverture d'un port série : délai doublé à chaque échec, remis à zéro à l'ouverture
+_RETRY_MIN = 1
+_RETRY_MAX = 60
+
+# Une seule famille de métriques pour les caches de tous les compteurs
+_pipelines: list["_Pipeline"] = []
+metrics.Callback(
+    "linky_line_cache_total", "Lignes servies par le cache (hit) ou décodées (miss), "
+    "trames identiques à la précédente (frame_hit)", "counter",
+    lambda: {(p.port, result): count for p in _pipelines
+             for result, count in (("hit", p.cache.hits), ("miss", p.cache.misses),
+                                   ("frame_hit", p.cache.frame_hits))},
+    ("port", "result"))
+
+
+# ── Compteurs ──────────────────────────────────────────────────────────────────
+
+def meters() -> list[tuple[str, str]]:
+    """
+    Liste des compteurs (port ou URL série, préfixe MQTT).
+
+    METERS="/dev/ttyUSB0=edf,socket://10.0.0.5:4001=edf2" ; sans préfixe,
+    MQTT_PREFIX est utilisé. METERS vide : SERIAL_PORT seul.
+    """
+    result = []
+    for entry in filter(None, (e.strip() for e in config.METERS.split(","))):
+        port, prefix = _split_meter(entry)
+        result.append((port.strip(), prefix.strip() or config.MQTT_PREFIX))
+    return result or [(config.SERIAL_PORT, config.MQTT_PREFIX)]
+
+
+def _split_meter(entry: str) -> tuple[str, str]:
+    """
+    Sépare "port=préfixe". Le dernier "=" n'introduit un préfixe que si le
+    nom qui suit ne contient ni "/", ni "?", ni "&", et s'il ne termine pas
+    un paramètre d'URL : "synthetic://?speed=1" est un port sans préfixe,
+    "synthetic://?speed=1=edf2" un port avec préfixe.
+    """
+    port, sep, prefix = entry.rpartition("=")
+    if not sep or any(c in prefix for c in "/?&"):
+        return entry, ""
+    if "?" in port and "=" not in port.partition("?")[2].rpartition("&")[2]:
+        return entry, ""
+    return port, prefix
+
 
 # ── Ouverture du port série ────────────────────────────────────────────────────
 
-def _open_serial() -> serial.Serial:
-    parity_map = {
-        "E": serial.PARITY_EVEN,
-        "N": serial.PARITY_NONE,
-        "O": serial.PARITY_ODD,
-    }
-    return serial.Serial(
-        port     = config.SERIAL_PORT,
-        baudrate = config.SERIAL_BAUD,
-        bytesize = config.SERIAL_BITS,
-        parity   = parity_map.get(config.SERIAL_PARITY.upper(), serial.PARITY_EVEN),
-        stopbits = config.SERIAL_STOPS,
-        timeout  = 10,
+_PARITY_MAP = {
+    "E": serial.PARITY_EVEN,
+    "N": serial.PARITY_NONE,
+    "O": serial.PARITY_ODD,
+}
+
+_probe_cache: Optional[serial_probe.ProbeCache] = None
+_probe_lock  = threading.Lock()
+
+
+def _open_serial(port: str, timeout: float = 10) -> serial.SerialBase:
+    """
+    Ouvre un port série local, une URL pyserial (socket://, rfc2217://...)
+    ou une source simulée (replay://, synthetic://, voir fake_serial.py).
+
+    Avec SERIAL_PROBE, les réglages sont ceux détectés (et mémorisés) par
+    serial_probe.py plutôt que SERIAL_BAUD / SERIAL_BITS / SERIAL_PARITY.
+    """
+    if port.startswith(fake_serial.SCHEMES):
+        return fake_serial.open_url(port, timeout)
+    settings = _probed_settings(port) if config.SERIAL_PROBE else None
+    if settings is None:
+        settings = serial_probe.Settings(config.SERIAL_BAUD, config.SERIAL_BITS,
+                                         config.SERIAL_PARITY.upper(), config.SERIAL_STOPS,
+                                         False, config.TIC_MODE)
+    ser = _serial_for_url(port, settings, timeout)
+    return serial_probe.MaskedSerial(ser) if settings.mask else ser
+
+
+def _serial_for_url(port: str, settings: serial_probe.Settings,
+                    timeout: float) -> serial.SerialBase:
+    return serial.serial_for_url(
+        port,
+        baudrate = settings.baudrate,
+        bytesize = settings.bytesize,
+        parity   = _PARITY_MAP.get(settings.parity, serial.PARITY_EVEN),
+        stopbits = settings.stopbits,
+        timeout  = timeout,
     )
 
 
+def _probed_settings(port: str) -> Optional[serial_probe.Settings]:
+    """Réglages mémorisés pour ce port, sinon détectés (quelques secondes)."""
+    global _probe_cache
+    with _probe_lock:
+        if _probe_cache is None:
+            _probe_cache = serial_probe.ProbeCache(config.STATE_DIR)
+    name = _probe_cache.get(port)
+    if name:
+        log.info("Port %s : réglages détectés précédemment (%s)", port, name)
+    else:
+        log.info("Port %s : détection des paramètres série…", port)
+        name = serial_probe.probe(
+            port, lambda settings, timeout: _serial_for_url(port, settings, timeout),
+            config.SERIAL_PROBE_TIME, config.TIC_MODE)
+        if name is None:
+            log.warning("Port %s : SERIAL_BAUD / SERIAL_BITS / SERIAL_PARITY utilisés", port)
+            return None
+        with _probe_lock:
+            _probe_cache.put(port, name)
+    return serial_probe.CANDIDATES[name]
+
+
+def _port_mode(port: str) -> str:
+    """Mode TIC d'un port : celui des réglages détectés (SERIAL_PROBE), sinon TIC_MODE."""
+    name = _probe_cache.get(port) if config.SERIAL_PROBE and _probe_cache else None
+    return serial_probe.CANDIDATES[name].mode if name else config.TIC_MODE
+
+
 # ── Boucle principale ──────────────────────────────────────────────────────────
 
 def run(mqtt: MQTTClient) -> None:
     """
-    Lit le port série en continu, détecte les trames TIC et les publie sur MQTT.
+    Lit les ports série en continu, détecte les trames TIC et les publie sur MQTT.
     S'arrête proprement sur SIGTERM ou SIGINT.
     """
+    sources = meters()
     log.info(
-        "Bridge démarré — port=%s  broker=%s:%s  prefix=%s  interval=%ss",
-        config.SERIAL_PORT, config.MQTT_HOST, config.MQTT_PORT,
-        config.MQTT_PREFIX, config.PUBLISH_INTERVAL,
+        "Bridge démarré — compteurs=%s  mode=%s  broker=%s:%s  interval=%ss  threaded=%s",
+        ", ".join(f"{port}→{prefix}" for port, prefix in sources), config.TIC_MODE,
+        config.MQTT_HOST, config.MQTT_PORT, config.PUBLISH_INTERVAL, config.THREADED,
     )
 
-    running = True
+    pipelines = [_Pipeline(mqtt.for_prefix(prefix), port) for port, prefix in sources]
+
+    diagnostics = Diagnostics(config.DIAG_DIR, config.DIAG_DURATION,
+                              lambda: _sizes(mqtt, pipelines), config.DIAG_TRACE_PERSIST)
+    sinks = open_sinks(config.SINKS)
+    for pipeline in pipelines:
+        pipeline.diagnostics = diagnostics
+        pipeline.raw_sinks   = [sink for sink in sinks if sink.raw]
+        pipeline.topic_sinks = [sink for sink in sinks if not sink.raw]
+    signal.signal(signal.SIGUSR1, diagnostics.on_signal)
+    if config.DIAG_TOPIC:
+        mqtt.subscribe(config.DIAG_TOPIC, diagnostics.on_command)
+
+    if config.THREADED and len(pipelines) == 1:
+        stop = threading.Event()
+
+        def _stop(sig, _frame):
+            log.info("Signal %s reçu → arrêt propre", sig)
+            stop.set()
+
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT,  _stop)
+        _run_threaded(pipelines[0], stop)
+    else:
+        if config.THREADED:
+            log.warning("THREADED ignoré : plusieurs compteurs → boucle asyncio")
+        asyncio.run(_run_async(pipelines))
+
+    for pipeline in pipelines:
+        log.info("Cache %s — %s", pipeline.port, pipeline.cache.stats())
+        if pipeline.capture:
+            pipeline.capture.close()
+        if pipeline.history:
+            pipeline.history.close()
+        if pipeline.energy:
+            pipeline.energy.flush()
+    for sink in sinks:
+        sink.stop()
+    log.info("Publications évitées — %s", mqtt.policy.stats())
+    log.info("Bridge arrêté")
+
+
+def _sizes(mqtt: MQTTClient, pipelines: list["_Pipeline"]) -> dict[str, int]:
+    """Taille des caches et fenêtres, pour les rapports de diagnostic."""
+    sizes = mqtt.sizes()
+    for pipeline in pipelines:
+        sizes[f"line_cache[{pipeline.port}]"] = len(pipeline.cache)
+        if pipeline.power:
+            sizes[f"pinst_samples[{pipeline.port}]"] = pipeline.power.size()
+    return sizes
+
+
+# ── Boucle asyncio ─────────────────────────────────────────────────────────────
+
+async def _run_async(pipelines: list["_Pipeline"]) -> None:
+    """Une tâche par compteur, toutes sur la même boucle et le même client MQTT."""
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+
+    def _stop(sig: signal.Signals) -> None:
+        log.info("Signal %s reçu → arrêt propre", sig.name)
+        stop.set()
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, _stop, sig)
+
+    await asyncio.gather(*(_meter_loop(p, stop) for p in pipelines))
+
+
+async def _meter_loop(pipeline: "_Pipeline", stop: asyncio.Event) -> None:
+    """Ouverture, lecture et reconnexion d'un port, indépendamment des autres."""
+    port   = pipeline.port
+    delay  = _RETRY_MIN
+    opened = False
+    while not stop.is_set():
+        try:
+            # Hors de la boucle : la détection (SERIAL_PROBE) dure quelques secondes
+            ser = await asyncio.to_thread(_open_serial, port, 0)
+        except Exception as exc:            # port absent, URL invalide (ValueError)…
+            log.error("Impossible d'ouvrir %s : %s  → retry dans %d s", port, exc, delay)
+            await _wait(stop, delay)
+            delay = min(delay * 2, _RETRY_MAX)
+            continue
+
+        delay = _RETRY_MIN
+        if opened:
+            pipeline.reconnects.inc()
+        opened = True
+        pipeline.mode = _port_mode(port)
+        log.info("Port série ouvert : %s (mode %s)", port, pipeline.mode)
+        crashed = False
+        try:
+            fd = _fileno(ser)
+            if fd is not None:
+                await _pump_fd(ser, fd, pipeline, stop)
+            else:
+                await _pump_poll(ser, pipeline, stop)
+        except (serial.SerialException, OSError) as exc:
+            log.error("Erreur lecture série %s : %s", port, exc)
+        except Exception:
+            # Un compteur en erreur ne doit pas arrêter les autres
+            log.exception("Erreur inattendue sur %s  → retry dans %d s", port, _RETRY_MAX)
+            crashed = True
+        finally:
+            _close_serial(ser)
+            pipeline.framer.reset()
+        if crashed:
+            await _wait(stop, _RETRY_MAX)
+
+
+async def _pump_fd(ser, fd: int, pipeline: "_Pipeline", stop: asyncio.Event) -> None:
+    """Lecture pilotée par la boucle (add_reader) : aucun réveil sans données."""
+    loop   = asyncio.get_running_loop()
+    failed = loop.create_future()
+
+    def _readable() -> None:
+        try:
+            pipeline.feed(ser.read(ser.in_waiting or 1))
+        except Exception as exc:            # EIO à l'arrachement : in_waiting lève OSError
+            loop.remove_reader(fd)
+            if not failed.done():
+                failed.set_exception(exc)
+
+    loop.add_reader(fd, _readable)
+    stopped = asyncio.ensure_future(stop.wait())
+    try:
+        await asyncio.wait((failed, stopped), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        loop.remove_reader(fd)
+        stopped.cancel()
+    if failed.done():
+        failed.result()
+
 
-    def _stop(sig, _frame):
-        nonlocal running
-        log.info("Signal %s reçu → arrêt propre", sig)
-        running = False
+async def _pump_poll(ser, pipeline: "_Pipeline", stop: asyncio.Event) -> None:
+    """Lecture par scrutation, pour les sources sans descripteur de fichier."""
+    while not stop.is_set():
+        # Port ouvert avec timeout=0 : read() rend ce qui est disponible
+        chunk = ser.read(_POLL_CHUNK)
+        if chunk:
+            pipeline.feed(chunk)
+            await asyncio.sleep(0)          # laisse tourner les autres compteurs
+        else:
+            await _wait(stop, _POLL_INTERVAL)
 
-    signal.signal(signal.SIGTERM, _stop)
-    signal.signal(signal.SIGINT,  _stop)
 
-    ser: Optional[serial.Serial] = None
-    frame_buf = bytearray()
-    in_frame  = False
-    last_pub  = 0.0
+def _fileno(ser) -> Optional[int]:
+    try:
+        return ser.fileno()
+    except (AttributeError, OSError, serial.SerialException):
+        return None
+
+
+async def _wait(stop: asyncio.Event, delay: float) -> None:
+    """Attend `delay` secondes ou l'arrêt, au premier des deux."""
+    try:
+        await asyncio.wait_for(stop.wait(), delay)
+    except asyncio.TimeoutError:
+        pass
+
+
+# ── Lecture bloquante (mode threadé) ───────────────────────────────────────────
+
+def _read_serial(pipeline: "_Pipeline", stop: threading.Event, on_frame,
+                 timeout: float = 10) -> None:
+    """
+    Possède le port série : ouverture, reconnexion, lecture par blocs et
+    découpage en trames. Appelle on_frame(raw) pour chaque trame complète.
+    """
+    ser: Optional[serial.SerialBase] = None
+    framer = pipeline.framer
+    port   = pipeline.port
+    delay  = _RETRY_MIN
+    opened = False
 
-    while running:
+    while not stop.is_set():
 
         # ── Connexion / reconnexion série ──────────────────────────────────────
         if ser is None or not ser.is_open:
             try:
-                ser = _open_serial()
-                log.info("Port série ouvert : %s", config.SERIAL_PORT)
-            except serial.SerialException as exc:
-                log.error("Impossible d'ouvrir %s : %s  → retry dans 10 s",
-                          config.SERIAL_PORT, exc)
-                time.sleep(10)
+                ser = _open_serial(port, timeout)
+                delay = _RETRY_MIN
+                if opened:
+                    pipeline.reconnects.inc()
+                opened = True
+                pipeline.mode = _port_mode(port)
+                log.info("Port série ouvert : %s (mode %s)", port, pipeline.mode)
+            except Exception as exc:        # port absent, URL invalide (ValueError)…
+                log.error("Impossible d'ouvrir %s : %s  → retry dans %d s", port, exc, delay)
+                stop.wait(delay)
+                delay = min(delay * 2, _RETRY_MAX)
                 continue
 
-        # ── Lecture octet par octet ────────────────────────────────────────────
+        # ── Lecture par blocs ──────────────────────────────────────────────────
+        # Bloque jusqu'au premier octet (ou timeout), puis vide le buffer du port.
         try:
-            byte = ser.read(1)
-        except serial.SerialException as exc:
+            chunk = ser.read(ser.in_waiting or 1)
+            pipeline.received(chunk)
+        except (serial.SerialException, OSError) as exc:   # OSError : EIO à l'arrachement
             log.error("Erreur lecture série : %s", exc)
             _close_serial(ser)
             ser = None
+            framer.reset()
             continue
 
-        if not byte:
-            continue
+        for raw in framer.feed(chunk):
+            try:
+                on_frame(raw)
+            except Exception:
+                # Une trame qui fait échouer le traitement ne doit pas arrêter la lecture
+                log.exception("Erreur lors du traitement d'une trame")
+
+    # ── Nettoyage ──────────────────────────────────────────────────────────────
+    _close_serial(ser)
 
-        b = byte[0]
 
-        if b == 0x02:               # STX — début de trame
-            frame_buf = bytearray()
-            in_frame  = True
+# ── Mode threadé ───────────────────────────────────────────────────────────────
 
-        elif b == 0x03:             # ETX — fin de trame
-            if in_frame and frame_buf:
-                if _process_frame(mqtt, bytes(frame_buf), last_pub):
-                    last_pub = time.time()
-            in_frame  = False
-            frame_buf = bytearray()
+def _run_threaded(pipeline: "_Pipeline", stop: threading.Event) -> None:
+    """
+    Un thread lit et décode toutes les trames, un autre publie la plus récente :
+    la lecture série n'attend jamais le réseau. Le thread principal ne fait
+    qu'attendre le signal d'arrêt.
+    """
+    queue = LatestQueue()
+    metrics.Callback("linky_queue_depth", "Trames en attente de publication (mode threadé)",
+                     "gauge", queue.qsize)
+    metrics.Callback("linky_queue_dropped_total",
+                     "Trames remplacées par une plus récente avant publication",
+                     "counter", lambda: queue.dropped)
 
-        elif in_frame:
-            frame_buf.append(b)
+    def _on_frame(raw: bytes) -> None:
+        frame = pipeline.ingest(raw)
+        if frame:
+            queue.put(frame)
 
-    # ── Nettoyage ──────────────────────────────────────────────────────────────
-    _close_serial(ser)
-    log.info("Bridge arrêté")
+    threads = [
+        threading.Thread(target=_read_serial, args=(pipeline, stop, _on_frame, 1.0),
+                         name="tic-reader"),
+        threading.Thread(target=_publish_loop, args=(pipeline, queue, stop),
+                         name="mqtt-publisher"),
+    ]
+    for t in threads:
+        t.start()
+
+    while not stop.wait(1.0):
+        if not all(t.is_alive() for t in threads):
+            log.error("Un thread du bridge s'est arrêté — arrêt")
+            stop.set()
+
+    for t in threads:
+        t.join()
+    log.info("Trames écartées (remplacées par une plus récente) : %d", queue.dropped)
+
+
+def _publish_loop(pipeline: "_Pipeline", queue: LatestQueue,
+                  stop: threading.Event) -> None:
+    """Publie la dernière trame disponible selon les cadences du pipeline."""
+    while not stop.is_set():
+        frame = queue.get(timeout=1.0)
+        if frame is None:
+            continue
+        try:
+            pipeline.publish(frame)
+        except Exception:
+            log.exception("Erreur lors de la publication")
 
 
 # ── Traitement d'une trame complète ───────────────────────────────────────────
 
-def _process_frame(mqtt: MQTTClient, raw: bytes, last_pub: float) -> bool:
-    """Parse, structure et publie une trame si l'intervalle est écoulé.
-    Retourne True si une publication a eu lieu."""
-    now = time.time()
-    if now - last_pub < config.PUBLISH_INTERVAL:
-        log.debug("Trame ignorée (rate-limit, %.1f s restantes)",
-                  config.PUBLISH_INTERVAL - (now - last_pub))
-        return False
+class _Pipeline:
+    """
+    Étapes appliquées aux trames d'un compteur :
+      - ingest()  : à chaque trame (décodage, agrégation, échantillon pinst)
+      - publish() : publication MQTT selon PUBLISH_INTERVAL et PINST_INTERVAL
+
+    En mode threadé, ingest() tourne dans le thread de lecture et publish()
+    dans le thread de publication.
+
+    Tant que le broker n'a jamais répondu (démarrage), les trames sont
+    décodées et agrégées, et la plus récente est gardée : elle est publiée dès
+    la connexion, sans attendre PUBLISH_INTERVAL. Avec le spool, les lectures
+    de cette période y sont en plus conservées (rejouées sur PREFIX/history).
+    """
+
+    def __init__(self, mqtt, port: str):
+        self.mqtt      = mqtt            # MQTTClient vu avec le préfixe du compteur
+        self.port      = port
+        self.mode      = config.TIC_MODE  # ou mode détecté à l'ouverture (SERIAL_PROBE)
+        self.framer    = TicFramer()
+        self.cache     = LineCache(config.LINE_CACHE_SIZE)
+        self.publisher = Publisher(mqtt, mqtt.prefix, per_topic=config.PUBLISH_TOPICS)
+        self.window    = WindowAggregator() if config.AGGREGATE else None
+        self.power     = PowerEstimator(config.PINST_WINDOW) if config.PINST_INTERVAL > 0 else None
+        self.energy    = _energy_meter(mqtt.prefix) if config.ENERGY else None
+        self._last_pub   = 0.0
+        self._last_pinst = 0.0
+        self._pinst: Optional[int] = None
+        self._started = time.monotonic()
+        self._first_frame = True
+        self._held: Optional[TicFrame] = None    # trame reçue avant la première connexion
+        self._lock = threading.Lock()            # publish() : thread de publication ou paho
+        self.diagnostics: Optional[Diagnostics] = None
+        self.raw_sinks:   list = []          # sorties alimentées à chaque trame (data=raw)
+        self.topic_sinks: list = []          # et à chaque publication (data=topics)
+        self.capture: Optional[CaptureWriter] = None
+        if config.CAPTURE_DIR:
+            try:
+                self.capture = CaptureWriter(capture_path(config.CAPTURE_DIR, port))
+            except OSError as exc:
+                log.error("Capture impossible pour %s : %s", port, exc)
+        self.history: Optional[HistoryStore] = None
+        if config.HISTORY_DIR:
+            try:
+                self.history = HistoryStore(os.path.join(config.HISTORY_DIR, mqtt.prefix),
+                                            config.HISTORY_INTERVAL)
+            except OSError as exc:
+                log.error("Historique impossible pour %s : %s", port, exc)
+
+        # Métriques (séries de ce port, résolues une fois)
+        self.bytes_read     = metrics.BYTES_READ.labels(port)
+        self.reconnects     = metrics.SERIAL_RECONNECTS.labels(port)
+        self._framed        = metrics.FRAMES.labels(port, "framed")
+        self._decoded       = metrics.FRAMES.labels(port, "decoded")
+        self._rate_limited  = metrics.FRAMES.labels(port, "rate_limited")
+        self._published     = metrics.FRAMES.labels(port, "published")
+        self._publish_time  = metrics.STAGE_SECONDS.labels("publish")
+        _pipelines.append(self)
+        mqtt.add_on_connect(self._on_connect)
+
+    def received(self, chunk: bytes) -> None:
+        """Comptabilise (et enregistre, si CAPTURE_DIR) un bloc lu sur le port."""
+        self.bytes_read.inc(len(chunk))
+        if self.capture:
+            self.capture.write(chunk)
+
+    def feed(self, chunk: bytes) -> None:
+        """Découpe un bloc lu sur le port et traite chaque trame complète."""
+        self.received(chunk)
+        for raw in self.framer.feed(chunk):
+            frame = self.ingest(raw)
+            if frame:
+                self.publish(frame)
+
+    def ingest(self, raw: bytes) -> Optional[TicFrame]:
+        """Parse et structure une trame, et alimente les agrégats."""
+        self._framed.inc()
+        if self.diagnostics and self.diagnostics.active:
+            self.diagnostics.tick()
+        frame = self.cache.decode(raw, self.mode)
+        if not frame:
+            log.debug("Trame vide ou entièrement invalide — ignorée")
+            return None
+        if self._first_frame:
+            self._first_frame = False
+            log.info("Première trame décodée sur %s %.1f s après le démarrage",
+                     self.port, time.monotonic() - self._started)
+        self._decoded.inc()
+
+        if self.window:
+            self.window.add(frame)
+        if self.power:
+            self.power.add(time.monotonic(), frame)
+        now = time.time()
+        if self.energy:
+            self.energy.add(now, frame)
+        if self.history:
+            self.history.append(now, frame)
+        for sink in self.raw_sinks:
+            sink.offer(now, self.mqtt.prefix, frame)
+        return frame
+
+    def publish(self, frame: TicFrame) -> bool:
+        """Publie la trame si l'intervalle est écoulé.
+        Retourne True si une publication de la trame a eu lieu."""
+        if not self.mqtt.ever_connected:
+            self._held = frame           # publiée à la connexion
+            if not self.mqtt.spooling:
+                return False
+        with self._lock:
+            return self._publish(frame)
+
+    def _on_connect(self, first: bool) -> None:
+        """Première connexion : publie sans attendre la trame gardée jusque-là."""
+        frame, self._held = self._held, None
+        if not (first and frame):
+            return
+        with self._lock:
+            self._last_pub = self._last_pinst = 0.0
+            self._publish(frame)
+
+    def _publish(self, frame: TicFrame) -> bool:
+        mqtt = self.mqtt
+        now  = time.time()
+
+        if self.power and now - self._last_pinst >= config.PINST_INTERVAL:
+            pinst = self.power.value()
+            if pinst is not None:
+                self._pinst = pinst
+                if config.PUBLISH_TOPICS:
+                    publish_pinst(mqtt, pinst)
+                self._last_pinst = now
+
+        if now - self._last_pub < config.PUBLISH_INTERVAL:
+            self._rate_limited.inc()
+            log.debug("Trame ignorée (rate-limit, %.1f s restantes)",
+                      config.PUBLISH_INTERVAL - (now - self._last_pub))
+            return False
+
+        start = time.perf_counter()
+        self.publisher.publish(frame)
+        stats = self.window.flush() if self.window else {}
+        if config.PUBLISH_TOPICS:
+            publish_window(mqtt, stats)
+            if self.energy:
+                publish_energy(mqtt, self.energy)
+        if config.STATE_FORMAT or self.topic_sinks:
+            state = dict(self.publisher.values)
+            state.update(stats)
+            if self._pinst is not None:
+                state["pinst"] = self._pinst
+            if config.STATE_FORMAT:
+                publish_state(mqtt, state, config.STATE_FORMAT)
+            if self.topic_sinks:
+                if self.energy:
+                    state.update(self.energy.values())
+                for sink in self.topic_sinks:
+                    sink.offer(now, mqtt.prefix, state)
+        mqtt.publish_due()
+        self._last_pub = now
+        self._publish_time.observe(time.perf_counter() - start)
+        self._published.inc()
+        log.info("Trame publiée (%s) — %d étiquettes TIC", mqtt.prefix, len(frame))
+        return True
 
-    raw_data = parse_frame(raw)
-    if not raw_data:
-        log.debug("Trame vide ou entièrement invalide — ignorée")
-        return False
 
-    data = structure_payload(raw_data)
-    publish_all(mqtt, data)
-    log.info("Trame publiée — %d étiquettes TIC", len(raw_data))
-    return True
+def _energy_meter(prefix: str) -> EnergyMeter:
+    """Compteurs d'énergie d'un préfixe, persistants si STATE_DIR existe."""
+    store = None
+    if os.path.isdir(config.STATE_DIR):
+        name = f"energy-{prefix.replace('/', '_')}.json"
+        store = StateFile(os.path.join(config.STATE_DIR, name))
+    else:
+        log.warning("Compteurs d'énergie non persistants : dossier %s absent", config.STATE_DIR)
+    return EnergyMeter(parse_prices(config.ENERGY_PRICES), store)
 
 
-def _close_serial(ser: Optional[serial.Serial]) -> None:
+def _close_serial(ser: Optional[serial.SerialBase]) -> None:
     if ser:
         try:
             ser.close()
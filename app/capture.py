@@ -0,0 +1,102 @@
+"""
+capture.py — Enregistrement du flux série brut, horodaté, dans un fichier compact.
+
+Format (little-endian) :
+    en-tête     : b"TICCAP1\\n", instant de début (float64, epoch)
+    enregistrement : délai depuis l'enregistrement précédent en ms (uint32),
+                     longueur (uint16), octets lus
+
+Les octets lus sont regroupés jusqu'à la fin d'une trame (ETX) : un
+enregistrement par trame environ, soit ~2 % de surcoût par rapport au flux
+brut (~10 Mo par jour en mode historique). Les fichiers .gz sont acceptés
+en lecture.
+
+Rejeu : voir fake_serial.py (SERIAL_PORT=replay:///chemin/capture.tic).
+"""
+
+import gzip
+import logging
+import os
+import re
+import struct
+import time
+from typing import Iterator
+
+log = logging.getLogger(__name__)
+
+MAGIC   = b"TICCAP1\n"
+_HEADER = struct.Struct("<8sd")
+_RECORD = struct.Struct("<IH")
+_ETX    = 0x03
+
+# Au-delà, le tampon est écrit même sans ETX (flux sans trame valide)
+_MAX_PENDING = 4096
+
+
+class CaptureWriter:
+
+    def __init__(self, path: str):
+        self.path   = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file  = open(path, "wb")
+        self._last  = time.time()
+        self._pending = bytearray()
+        self._file.write(_HEADER.pack(MAGIC, self._last))
+        log.info("Capture du flux série dans %s", path)
+
+    def write(self, chunk: bytes) -> None:
+        """Ajoute des octets lus ; écrit un enregistrement à chaque fin de trame."""
+        pending = self._pending
+        pending += chunk
+        end = pending.rfind(_ETX) + 1
+        if not end and len(pending) >= _MAX_PENDING:
+            end = len(pending)
+        if end:
+            self._emit(pending[:end])
+            del pending[:end]
+
+    def close(self) -> None:
+        if self._pending:
+            self._emit(self._pending)
+            self._pending.clear()
+        self._file.close()
+
+    def _emit(self, data: bytes) -> None:
+        now   = time.time()
+        delay = min(max(int((now - self._last) * 1000), 0), 0xFFFFFFFF)
+        self._last = now
+        try:
+            for start in range(0, len(data), 0xFFFF):
+                part = data[start:start + 0xFFFF]
+                self._file.write(_RECORD.pack(delay, len(part)))
+                self._file.write(part)
+                delay = 0
+            self._file.flush()
+        except OSError as exc:
+            log.error("Capture : écriture impossible : %s", exc)
+
+
+def capture_path(directory: str, port: str) -> str:
+    """Nom de fichier de capture pour un port, horodaté."""
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", port).strip("_")
+    return os.path.join(directory, f"capture-{name}-{time.strftime('%Y%m%d-%H%M%S')}.tic")
+
+
+def read_capture(path: str) -> Iterator[tuple[float, bytes]]:
+    """Enregistrements d'une capture : (secondes depuis le début, octets)."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        magic, _start = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} : pas un fichier de capture TIC")
+        offset = 0.0
+        while True:
+            head = f.read(_RECORD.size)
+            if len(head) < _RECORD.size:
+                return                      # fin, ou enregistrement tronqué
+            delay, size = _RECORD.unpack(head)
+            data = f.read(size)
+            if len(data) < size:
+                return
+            offset += delay / 1000
+            yield offset, data
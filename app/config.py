@@ -7,12 +7,24 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# ── Mode TIC ───────────────────────────────────────────────────────────────────
+# historique (1200 bauds), standard (9600 bauds) ou auto (détection par trame)
+TIC_MODE        = os.getenv("TIC_MODE", "auto").lower()
+
 # ── Port série ─────────────────────────────────────────────────────────────────
 SERIAL_PORT     = os.getenv("SERIAL_PORT",   "/dev/ttyUSB0")
-SERIAL_BAUD     = int(os.getenv("SERIAL_BAUD",   "1200"))
+SERIAL_BAUD     = int(os.getenv("SERIAL_BAUD",
+                                "9600" if TIC_MODE == "standard" else "1200"))
 SERIAL_BITS     = int(os.getenv("SERIAL_BITS",   "7"))
 SERIAL_PARITY   = os.getenv("SERIAL_PARITY", "E")   # E=Even, N=None, O=Odd
 SERIAL_STOPS    = int(os.getenv("SERIAL_STOPS",  "1"))
+# Détection des paramètres série au premier démarrage, mémorisée dans STATE_DIR
+# (voir serial_probe.py) ; durée d'écoute max par réglage candidat, en secondes
+SERIAL_PROBE    = os.getenv("SERIAL_PROBE", "false").lower() in ("1", "true", "yes")
+SERIAL_PROBE_TIME = float(os.getenv("SERIAL_PROBE_TIME", "3"))
+# Plusieurs compteurs dans un même processus : "port=prefixe,port=prefixe"
+# (ports locaux ou URL pyserial : socket://hôte:port, rfc2217://hôte:port)
+METERS          = os.getenv("METERS", "")
 
 # ── Broker MQTT ────────────────────────────────────────────────────────────────
 MQTT_HOST       = os.getenv("MQTT_HOST",   "mymqtt")
@@ -21,7 +33,81 @@ MQTT_USER       = os.getenv("MQTT_USER",   "")
 MQTT_PASS       = os.getenv("MQTT_PASS",   "")
 MQTT_CLIENT     = os.getenv("MQTT_CLIENT", "linky2mqtt")
 MQTT_PREFIX     = os.getenv("MQTT_PREFIX", "edf")
+# MQTTv5 : alias de topics (si le broker les accepte) et expiration des messages (s, 0 = aucune)
+MQTT_TOPIC_ALIASES  = os.getenv("MQTT_TOPIC_ALIASES", "true").lower() in ("1", "true", "yes")
+MQTT_MESSAGE_EXPIRY = int(os.getenv("MQTT_MESSAGE_EXPIRY", "0"))
+
+# ── Sorties ────────────────────────────────────────────────────────────────────
+# Un topic par valeur (edf/papp...) et/ou un message d'état unique edf/state
+PUBLISH_TOPICS  = os.getenv("PUBLISH_TOPICS", "true").lower() in ("1", "true", "yes")
+STATE_FORMAT    = os.getenv("STATE_FORMAT", "").lower()   # "", "json" ou "kv"
+
+# Règles de publication par topic (deadband, intervalle min, heartbeat),
+# en plus des règles par défaut de publish_policy.py
+PUBLISH_POLICY  = os.getenv("PUBLISH_POLICY", "")
+
+# ── Home Assistant ─────────────────────────────────────────────────────────────
+HA_DISCOVERY        = os.getenv("HA_DISCOVERY", "true").lower() in ("1", "true", "yes")
+HA_DISCOVERY_PREFIX = os.getenv("HA_DISCOVERY_PREFIX", "homeassistant")
+
+# ── Persistance ────────────────────────────────────────────────────────────────
+# Dossier des fichiers d'état (monté en volume dans docker-compose.yml)
+STATE_DIR       = os.getenv("STATE_DIR", "/data")
+# Mémorise les dernières valeurs publiées (RBE) pour ne pas tout republier au redémarrage
+RBE_PERSIST     = os.getenv("RBE_PERSIST", "true").lower() in ("1", "true", "yes")
+
+# Spool des lectures non publiées pendant une coupure du broker
+SPOOL            = os.getenv("SPOOL", "true").lower() in ("1", "true", "yes")
+SPOOL_MAX_MB     = float(os.getenv("SPOOL_MAX_MB",      "5"))
+SPOOL_MAX_AGE_H  = float(os.getenv("SPOOL_MAX_AGE_H",   "168"))
+SPOOL_REPLAY_RATE = float(os.getenv("SPOOL_REPLAY_RATE", "20"))   # lectures / s
+
+# Enregistrement du flux série brut (voir capture.py) : dossier des captures,
+# vide = désactivé
+CAPTURE_DIR      = os.getenv("CAPTURE_DIR", "")
+
+# Historique local des lectures (voir history.py) : dossier (un sous-dossier
+# par préfixe MQTT, vide = désactivé) et intervalle minimal entre deux
+# enregistrements, en secondes
+HISTORY_DIR      = os.getenv("HISTORY_DIR", "")
+HISTORY_INTERVAL = float(os.getenv("HISTORY_INTERVAL", "10"))
+
+# Sorties supplémentaires alimentées avec les mêmes lectures (voir sinks.py),
+# URL séparées par des virgules : udp://hôte:port, unix:///chemin, file:///chemin
+SINKS            = os.getenv("SINKS", "")
+
+# ── Supervision ────────────────────────────────────────────────────────────────
+# Port HTTP de l'endpoint /metrics au format Prometheus (0 = désactivé)
+METRICS_PORT     = int(os.getenv("METRICS_PORT", "0"))
+
+# Diagnostic à la demande (SIGUSR1 ou message sur DIAG_TOPIC, "" = pas de topic) :
+# durée du profilage en secondes et dossier des rapports
+DIAG_TOPIC       = os.getenv("DIAG_TOPIC", f"{MQTT_PREFIX}/cmd/diagnostics")
+DIAG_DURATION    = float(os.getenv("DIAG_DURATION", "60"))
+DIAG_DIR         = os.getenv("DIAG_DIR", os.path.join(STATE_DIR, "diagnostics"))
+# Laisse tracemalloc actif entre deux diagnostics (référence au premier)
+DIAG_TRACE_PERSIST = os.getenv("DIAG_TRACE_PERSIST", "false").lower() in ("1", "true", "yes")
 
 # ── Comportement du bridge ─────────────────────────────────────────────────────
 # Intervalle minimum entre deux publications (équivalent nœud delay 1/15s Node-RED)
 PUBLISH_INTERVAL = float(os.getenv("PUBLISH_INTERVAL", "15"))
+
+# Nombre max de lignes TIC validées conservées en cache (voir line_cache.py)
+LINE_CACHE_SIZE  = int(os.getenv("LINE_CACHE_SIZE", "256"))
+
+# Lecture série et publication MQTT dans deux threads séparés (voir bridge.py)
+THREADED         = os.getenv("THREADED", "false").lower() in ("1", "true", "yes")
+
+# Publication de min / max / moyenne de PAPP et IINST sur chaque intervalle
+AGGREGATE        = os.getenv("AGGREGATE", "true").lower() in ("1", "true", "yes")
+
+# Consommation et coût du jour et du mois par couleur Tempo × HC/HP (voir
+# energy.py) et prix du kWh en €, en plus des prix par défaut :
+# "blue_hc=0.1288,red_hp=0.6586"
+ENERGY           = os.getenv("ENERGY", "true").lower() in ("1", "true", "yes")
+ENERGY_PRICES    = os.getenv("ENERGY_PRICES", "")
+
+# Puissance active pinst (W) calculée depuis les index : cadence de publication
+# (0 = désactivé) et largeur de la fenêtre glissante, en secondes
+PINST_INTERVAL   = float(os.getenv("PINST_INTERVAL", "30"))
+PINST_WINDOW     = float(os.getenv("PINST_WINDOW",   "120"))
@@ -0,0 +1,192 @@
+"""
+diagnostics.py — Profilage et instantanés mémoire à la demande.
+
+Déclenchement sans redémarrage, par SIGUSR1 ou par un message sur le topic
+de commande (DIAG_TOPIC, payload optionnel : durée en secondes) :
+  - cProfile de la boucle de lecture pendant DIAG_DURATION secondes
+  - instantané tracemalloc comparé à la référence prise au début de la
+    session ; tracemalloc est arrêté après le rapport (son coût en mémoire
+    et en CPU n'est payé que pendant la session). Avec DIAG_TRACE_PERSIST,
+    il reste actif et la référence est celle du premier déclenchement : le
+    déclenchement suivant montre ce qui a grossi entre les deux
+  - tailles des caches internes (RBE, alias, cache de lignes...), RSS
+
+Le profileur est démarré par le thread qui lit les trames, au passage de la
+trame suivante : la session couvre la boucle du bridge. Il est arrêté par un
+minuteur à la fin de la durée demandée, même si plus aucune trame n'arrive
+(port débranché), et le rapport est écrit dans un thread à part.
+
+Fichiers produits dans DIAG_DIR, par session :
+  - diag-AAAAMMJJ-HHMMSS.prof : statistiques cProfile (pstats, snakeviz...)
+  - diag-AAAAMMJJ-HHMMSS.txt  : résumé lisible
+"""
+
+import cProfile
+import gc
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+log = logging.getLogger(__name__)
+
+_MAX_DURATION = 3600
+_TOP = 30
+
+
+class Diagnostics:
+
+    def __init__(self, directory: str, duration: float, sizes, persist: bool = False):
+        """
+        `sizes()` retourne { nom: taille } des structures internes à surveiller.
+        `persist` laisse tracemalloc actif entre deux sessions.
+        """
+        self._dir      = directory
+        self._duration = duration
+        self._sizes    = sizes
+        self._persist  = persist
+        self._lock     = threading.Lock()
+        self._requested: float | None = None     # durée demandée, session à démarrer
+        self._profiler: cProfile.Profile | None = None
+        self._owner    = 0                       # thread qui a démarré le profileur
+        self._detached: cProfile.Profile | None = None   # à désactiver par ce thread
+        self._writing  = False
+        self._started  = 0.0
+        self._baseline: tracemalloc.Snapshot | None = None
+        self.active    = False                   # vrai si tick() a quelque chose à faire
+
+    # ── Déclenchement (n'importe quel thread, ou gestionnaire de signal) ───────
+
+    def request(self, duration: float | None = None) -> None:
+        """Demande une session ; ignorée si une session est déjà en cours."""
+        if self._profiler is not None or self._requested is not None or self._writing:
+            log.info("Diagnostic déjà en cours — demande ignorée")
+            return
+        duration = min(max(duration or self._duration, 1.0), _MAX_DURATION)
+        self._requested = duration
+        self.active = True
+
+    def on_signal(self, _sig, _frame) -> None:
+        self.request()
+
+    def on_command(self, payload: bytes) -> None:
+        """Commande MQTT : payload vide ou durée en secondes."""
+        try:
+            duration = float(payload) if payload.strip() else None
+        except ValueError:
+            log.warning("Commande de diagnostic invalide : %r", payload[:32])
+            return
+        self.request(duration)
+
+    # ── Boucle (thread de lecture) ─────────────────────────────────────────────
+
+    def tick(self) -> None:
+        """À appeler à chaque trame quand `active` est vrai."""
+        with self._lock:
+            if self._detached is not None:
+                self._detached.disable()
+                self._detached = None
+                self.active = self._requested is not None
+            if self._requested is not None and self._profiler is None:
+                self._start(self._requested)
+                self._requested = None
+
+    def _start(self, duration: float) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._baseline = tracemalloc.take_snapshot()
+            log.info("Diagnostic : tracemalloc démarré, référence mémoire prise")
+        self._profiler = cProfile.Profile()
+        self._owner    = threading.get_ident()
+        self._started  = time.monotonic()
+        self._profiler.enable()
+        timer = threading.Timer(duration, self._expire)
+        timer.daemon = True
+        timer.start()
+        log.info("Diagnostic : profilage pendant %.0f s", duration)
+
+    def _expire(self) -> None:
+        """Fin de la durée demandée (thread du minuteur)."""
+        with self._lock:
+            if self._profiler is not None:
+                self._stop()
+
+    def _stop(self) -> None:
+        profiler, self._profiler = self._profiler, None
+        profiler.disable()
+        # Avant Python 3.12, le profileur n'est actif que dans le thread qui
+        # l'a démarré : c'est lui qui le désactive, à la trame suivante.
+        if sys.version_info < (3, 12) and threading.get_ident() != self._owner:
+            self._detached = profiler
+        else:
+            self.active = False
+        self._writing = True
+        elapsed = time.monotonic() - self._started
+        threading.Thread(target=self._write, args=(profiler, elapsed),
+                         name="diagnostics", daemon=True).start()
+
+    # ── Rapport ────────────────────────────────────────────────────────────────
+
+    def _write(self, profiler: cProfile.Profile, elapsed: float) -> None:
+        try:
+            os.makedirs(self._dir, exist_ok=True)
+            base = os.path.join(self._dir, time.strftime("diag-%Y%m%d-%H%M%S"))
+            profiler.dump_stats(base + ".prof")
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write(self._report(profiler, elapsed))
+        except Exception:
+            log.exception("Diagnostic : écriture du rapport impossible")
+            return
+        finally:
+            if not self._persist:
+                tracemalloc.stop()
+                self._baseline = None
+            self._writing = False
+        log.info("Diagnostic écrit : %s.txt / .prof", base)
+
+    def _report(self, profiler: cProfile.Profile, elapsed: float) -> str:
+        out = io.StringIO()
+        out.write(f"Diagnostic du {time.strftime('%Y-%m-%d %H:%M:%S')} — "
+                  f"profilage sur {elapsed:.1f} s\n\n")
+
+        out.write("── Processus ──\n")
+        out.write(f"RSS                : {_rss_kib()} KiB\n")
+        out.write(f"Threads            : {threading.active_count()}\n")
+        out.write(f"Objets suivis (gc) : {len(gc.get_objects())}\n\n")
+
+        out.write("── Structures internes ──\n")
+        for name, size in self._sizes().items():
+            out.write(f"{name:<28} {size}\n")
+        out.write("\n")
+
+        out.write(f"── cProfile : {_TOP} fonctions les plus coûteuses (temps cumulé) ──\n")
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(_TOP)
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, pstats.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        out.write(f"── tracemalloc : {current // 1024} KiB suivis (pic {peak // 1024} KiB) ──\n")
+        out.write(f"{_TOP} plus fortes croissances depuis la référence :\n")
+        for stat in snapshot.compare_to(self._baseline, "lineno")[:_TOP]:
+            out.write(f"{stat}\n")
+        return out.getvalue()
+
+
+def _rss_kib() -> int | str:
+    """RSS courant (Linux), sinon « ? »."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return "?"
@@ -0,0 +1,136 @@
+"""
+discovery.py — Auto-découverte Home Assistant (MQTT discovery).
+
+Les messages de configuration de tous les topics publiés par publisher.py
+sont construits et sérialisés une seule fois au démarrage. Ils sont publiés
+(retenus) à la première connexion au broker, puis uniquement quand Home
+Assistant annonce son redémarrage sur `homeassistant/status` : aucun coût
+par trame.
+
+Avec plusieurs compteurs (METERS), une instance par préfixe MQTT : chaque
+compteur apparaît comme un appareil distinct.
+"""
+
+import json
+import logging
+
+import config
+from mqtt_client import MQTTClient, AVAILABILITY_TOPIC
+
+log = logging.getLogger(__name__)
+
+# topic → (nom, device_class, state_class, unité)
+_ENERGY_WH  = ("energy", "total_increasing", "Wh")
+_ENERGY_KWH = ("energy", "total_increasing", "kWh")
+_CURRENT    = ("current", "measurement", "A")
+_APPARENT   = ("apparent_power", "measurement", "VA")
+_TEXT       = (None, None, None)
+
+SENSORS: dict[str, tuple] = {
+    "index_wh":       ("Index total",          *_ENERGY_WH),
+    "index_kwh":      ("Index total kWh",      *_ENERGY_KWH),
+    "index_hp_kwh":   ("Index HP",             *_ENERGY_KWH),
+    "index_hc_kwh":   ("Index HC",             *_ENERGY_KWH),
+    "index_hpb_kwh":  ("Index HP Bleu",        *_ENERGY_KWH),
+    "index_hpw_kwh":  ("Index HP Blanc",       *_ENERGY_KWH),
+    "index_hpr_kwh":  ("Index HP Rouge",       *_ENERGY_KWH),
+    "index_hcb_kwh":  ("Index HC Bleu",        *_ENERGY_KWH),
+    "index_hcw_kwh":  ("Index HC Blanc",       *_ENERGY_KWH),
+    "index_hcr_kwh":  ("Index HC Rouge",       *_ENERGY_KWH),
+    "iinst1":         ("Courant phase 1",      *_CURRENT),
+    "iinst2":         ("Courant phase 2",      *_CURRENT),
+    "iinst3":         ("Courant phase 3",      *_CURRENT),
+    "papp":           ("Puissance apparente",  *_APPARENT),
+    "pmax":           ("Puissance max",        *_APPARENT),
+    "ptec":           ("Période tarifaire",    *_TEXT),
+    "tempo_day":      ("Couleur Tempo",        *_TEXT),
+    "next_tempo_day": ("Couleur Tempo demain", *_TEXT),
+}
+
+if config.PINST_INTERVAL > 0:
+    SENSORS["pinst"] = ("Puissance active", "power", "measurement", "W")
+
+if config.AGGREGATE:
+    for _topic, _name, _kind in (("papp",   "Puissance apparente", _APPARENT),
+                                 ("iinst1", "Courant phase 1",     _CURRENT),
+                                 ("iinst2", "Courant phase 2",     _CURRENT),
+                                 ("iinst3", "Courant phase 3",     _CURRENT)):
+        for _stat, _label in (("min", "min"), ("max", "max"), ("mean", "moyen")):
+            SENSORS[f"{_topic}_{_stat}"] = (f"{_name} {_label}", *_kind)
+
+# Sans topic par valeur, energy.py ne publie rien
+if config.ENERGY and config.PUBLISH_TOPICS:
+    for _period, _label in (("today", "aujourd'hui"), ("month", "ce mois")):
+        for _color, _color_label in (("blue", "Bleu"), ("white", "Blanc"), ("red", "Rouge")):
+            for _hour in ("hc", "hp"):
+                SENSORS[f"energy/{_period}/{_color}_{_hour}"] = (
+                    f"Consommation {_hour.upper()} {_color_label} {_label}", *_ENERGY_KWH)
+        SENSORS[f"energy/{_period}/total"] = (f"Consommation {_label}", *_ENERGY_KWH)
+        SENSORS[f"cost/{_period}"] = (f"Coût {_label}", "monetary", "total", "EUR")
+
+
+class Discovery:
+
+    def __init__(self, mqtt: MQTTClient, prefix: str = config.MQTT_PREFIX):
+        self._mqtt = mqtt
+        self._prefix = prefix
+        self._messages = self._build()
+        mqtt.add_on_connect(self._on_connect)
+        mqtt.subscribe(f"{config.HA_DISCOVERY_PREFIX}/status", self._on_ha_status)
+        log.info("Auto-découverte HA : %d capteurs préparés", len(self._messages))
+
+    def _build(self) -> list[tuple[str, bytes]]:
+        """Construit une fois pour toutes les couples (topic config, payload JSON)."""
+        prefix = self._prefix
+        if prefix == config.MQTT_PREFIX:
+            node, name = config.MQTT_CLIENT, "Linky"
+        else:
+            node, name = f"{config.MQTT_CLIENT}_{prefix.replace('/', '_')}", f"Linky {prefix}"
+        device = {
+            "identifiers":  [node],
+            "name":         name,
+            "manufacturer": "Enedis",
+            "model":        "Linky TIC",
+        }
+        messages = []
+        # Sans topic par valeur, les capteurs lisent le message d'état JSON
+        from_state = not config.PUBLISH_TOPICS and config.STATE_FORMAT == "json"
+        for topic, (name, device_class, state_class, unit) in SENSORS.items():
+            key = topic.replace("/", "_")
+            payload = {
+                "name":               name,
+                "unique_id":          f"{node}_{key}",
+                "object_id":          f"{node}_{key}" if node != config.MQTT_CLIENT
+                                      else f"linky_{key}",
+                "state_topic":        f"{prefix}/{topic}",
+                "availability_topic": AVAILABILITY_TOPIC,
+                "device":             device,
+            }
+            if from_state:
+                payload["state_topic"]    = f"{prefix}/state"
+                payload["value_template"] = f"{{{{ value_json.{topic} }}}}"
+            if device_class:
+                payload["device_class"] = device_class
+            if state_class:
+                payload["state_class"] = state_class
+            if unit:
+                payload["unit_of_measurement"] = unit
+            messages.append((
+                f"{config.HA_DISCOVERY_PREFIX}/sensor/{node}/{key}/config",
+                json.dumps(payload, separators=(",", ":")).encode(),
+            ))
+        return messages
+
+    def publish(self) -> None:
+        for topic, payload in self._messages:
+            self._mqtt.publish_raw(topic, payload, retain=True)
+        log.info("Auto-découverte HA : %d configurations publiées", len(self._messages))
+
+    def _on_connect(self, first: bool) -> None:
+        if first:
+            self.publish()
+
+    def _on_ha_status(self, payload: bytes) -> None:
+        if payload == b"online":
+            log.info("Home Assistant redémarré → republication de l'auto-découverte")
+            self.publish()
@@ -0,0 +1,170 @@
+"""
+energy.py — Consommation et coût par couleur Tempo et période HC / HP.
+
+Remplace les utility_meter de Home Assistant qui relisaient l'historique des
+topics index_*_kwh. À chaque trame, l'écart de chacun des six index BBR
+depuis la trame précédente est ajouté aux compteurs du jour et du mois
+(six additions : coût constant par trame). Un index BBR ne progresse que
+pendant sa propre période : l'écart est rangé dans la bonne case
+(couleur × HC/HP) sans avoir à lire l'heure.
+
+Le jour est le jour Tempo (de 6 h à 6 h) : il change au passage de PTEC d'une
+période HC à une période HP. L'horloge (date de now − 6 h) ne sert qu'en
+secours, quand ce passage n'a pas été vu (bridge arrêté à 6 h).
+
+Publication, en kWh et en euros (prix de ENERGY_PRICES) :
+    PREFIX/energy/today/<couleur>_<hc|hp>    PREFIX/energy/today/total
+    PREFIX/energy/month/<couleur>_<hc|hp>    PREFIX/energy/month/total
+    PREFIX/cost/today                        PREFIX/cost/month
+
+L'état (compteurs et derniers index) est conservé dans STATE_DIR : la
+consommation pendant un arrêt du bridge est comptée dans le jour du
+redémarrage.
+"""
+
+import datetime
+import logging
+import threading
+
+from state_file import StateFile
+from tic_frame import Ptec, TicFrame
+
+log = logging.getLogger(__name__)
+
+# index BBR → case (couleur_période)
+BUCKETS: dict[str, str] = {
+    "bbrhcjb": "blue_hc",
+    "bbrhpjb": "blue_hp",
+    "bbrhcjw": "white_hc",
+    "bbrhpjw": "white_hp",
+    "bbrhcjr": "red_hc",
+    "bbrhpjr": "red_hp",
+}
+
+# Prix du kWh TTC, option Tempo (tarif réglementé au 1er février 2025), en €
+DEFAULT_PRICES: dict[str, float] = {
+    "blue_hc":  0.1288,
+    "blue_hp":  0.1552,
+    "white_hc": 0.1447,
+    "white_hp": 0.1792,
+    "red_hc":   0.1518,
+    "red_hp":   0.6586,
+}
+
+_HC = frozenset((Ptec.HCJB, Ptec.HCJW, Ptec.HCJR))
+_HP = frozenset((Ptec.HPJB, Ptec.HPJW, Ptec.HPJR))
+
+# Le jour Tempo commence à 6 h
+_DAY_START = datetime.timedelta(hours=6)
+
+
+def parse_prices(spec: str) -> dict[str, float]:
+    """
+    Prix par défaut, surchargés par ENERGY_PRICES :
+        "red_hp=0.70,red_hc=0.16"
+    Les entrées invalides sont ignorées (avec un avertissement).
+    """
+    prices = dict(DEFAULT_PRICES)
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        key, _, value = entry.partition("=")
+        key = key.strip().lower()
+        try:
+            if key not in prices:
+                raise ValueError(f"case inconnue {key!r}")
+            prices[key] = float(value)
+        except ValueError as exc:
+            log.warning("ENERGY_PRICES : %r ignoré (%s)", entry, exc)
+    return prices
+
+
+class EnergyMeter:
+    """
+    Compteurs du jour et du mois d'un compteur Linky. add() et values()
+    peuvent être appelés depuis deux threads différents.
+    """
+
+    def __init__(self, prices: dict[str, float], store: StateFile | None = None):
+        self._prices = prices
+        self._store  = store
+        self._lock   = threading.Lock()
+        state = store.load() if store else {}
+        self._day   = state.get("day", "")
+        self._last: dict[str, int] = state.get("last", {})
+        self._today: dict[str, int] = {**dict.fromkeys(BUCKETS.values(), 0), **state.get("today", {})}
+        self._month: dict[str, int] = {**dict.fromkeys(BUCKETS.values(), 0), **state.get("month", {})}
+        self._ptec: Ptec | None = None
+        # État persistant : les dicts vivants, écrits par StateFile au fil de l'eau
+        self._state = {"day": self._day, "last": self._last,
+                       "today": self._today, "month": self._month}
+        if self._day:
+            log.info("Énergie : compteurs du %s restaurés (%.3f kWh aujourd'hui)",
+                     self._day, sum(self._today.values()) / 1000)
+
+    def add(self, now: float, frame: TicFrame) -> None:
+        """Ajoute la consommation depuis la trame précédente (instant epoch, trame typée)."""
+        with self._lock:
+            self._roll(now, frame.ptec)
+            last = self._last
+            for attr, bucket in BUCKETS.items():
+                value = getattr(frame, attr)
+                if value is None:
+                    continue
+                previous = last.get(attr)
+                last[attr] = value
+                if previous is None:
+                    continue
+                delta = value - previous
+                if delta < 0:
+                    log.warning("Index %s en recul (%d → %d Wh) — écart ignoré",
+                                attr, previous, value)
+                    continue
+                self._today[bucket] += delta
+                self._month[bucket] += delta
+        if self._store:
+            self._store.save(self._state)
+
+    def values(self) -> dict[str, float]:
+        """Valeurs à publier (topic relatif → kWh ou €)."""
+        with self._lock:
+            today, month = dict(self._today), dict(self._month)
+        result: dict[str, float] = {}
+        for period, counters in (("today", today), ("month", month)):
+            cost = 0.0
+            for bucket, wh in counters.items():
+                result[f"energy/{period}/{bucket}"] = round(wh / 1000, 3)
+                cost += wh / 1000 * self._prices.get(bucket, 0.0)
+            result[f"energy/{period}/total"] = round(sum(counters.values()) / 1000, 3)
+            result[f"cost/{period}"] = round(cost, 2)
+        return result
+
+    def flush(self) -> None:
+        if self._store:
+            self._store.flush()
+
+    def _roll(self, now: float, ptec: Ptec | None) -> None:
+        """Change de jour (et de mois) au passage HC → HP, ou d'après l'horloge."""
+        previous, self._ptec = self._ptec, ptec
+        if previous in _HC and ptec in _HP:
+            day = datetime.date.fromtimestamp(now).isoformat()
+        else:
+            day = (datetime.datetime.fromtimestamp(now) - _DAY_START).date().isoformat()
+            if day <= self._day:
+                return
+        if day == self._day:
+            return
+        if self._day:
+            log.info("Énergie : jour %s terminé — %.3f kWh", self._day,
+                     sum(self._today.values()) / 1000)
+        for bucket in self._today:
+            self._today[bucket] = 0
+        if day[:7] != self._day[:7]:
+            for bucket in self._month:
+                self._month[bucket] = 0
+        self._day = self._state["day"] = day
+
+
+def publish_energy(client, meter: EnergyMeter) -> None:
+    """Publie les compteurs d'énergie et de coût du jour et du mois."""
+    for topic, value in meter.values().items():
+        client.publish(topic, value)
+
@@ -0,0 +1,165 @@
+"""
+fake_serial.py — Sources série simulées, utilisables partout où un port est attendu.
+
+    SERIAL_PORT=replay:///data/capture-ttyUSB0.tic?speed=10&loop=1
+    SERIAL_PORT=synthetic://?speed=0&phases=3&frames=10000&corrupt=0.01
+
+  - replay://     rejoue une capture (capture.py) au rythme enregistré
+  - synthetic://  trames générées par tic_synth.py, une toutes les `interval` s
+
+Paramètres communs : speed (1 = temps réel, 10 = 10×, 0 = au plus vite),
+loop (1 = recommence à la fin). Sans loop, la fin de la source lève une
+SerialException, comme un adaptateur débranché.
+
+L'objet renvoyé a l'interface de serial.Serial utilisée par bridge.py
+(read, in_waiting, is_open, close) : le pipeline n'est pas modifié.
+"""
+
+import itertools
+import time
+from collections import deque
+from typing import Iterator
+from urllib.parse import parse_qs, urlsplit
+
+import serial
+
+from capture   import read_capture
+from tic_synth import FrameGenerator
+
+SCHEMES = ("replay://", "synthetic://")
+
+# Octets disponibles au plus dans le tampon (borne le rejeu au plus vite)
+_MAX_BUFFER = 64 * 1024
+
+
+def open_url(url: str, timeout: float | None = None) -> "FakeSerial":
+    parts  = urlsplit(url)
+    params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+    speed  = float(params.get("speed", 1))
+    loop   = params.get("loop", "0") in ("1", "true", "yes")
+
+    if parts.scheme == "replay":
+        path = parts.netloc + parts.path
+        try:
+            next(read_capture(path), None)          # vérifie l'en-tête
+        except (OSError, ValueError) as exc:
+            raise serial.SerialException(f"Capture illisible : {exc}") from exc
+
+        def records():
+            return read_capture(path)
+
+    elif parts.scheme == "synthetic":
+        interval = float(params.get("interval", 1.5))
+        count    = int(params["frames"]) if "frames" in params else None
+        options  = dict(phases       = int(params.get("phases", 1)),
+                        seed         = int(params.get("seed", 0)),
+                        interval     = interval,
+                        corrupt_rate = float(params.get("corrupt", 0)))
+
+        def records():
+            return _synthetic(FrameGenerator(**options), interval, count)
+
+    else:
+        raise serial.SerialException(f"Source inconnue : {url}")
+
+    return FakeSerial(url, records, speed, loop, timeout)
+
+
+def _synthetic(generator: FrameGenerator, interval: float,
+               count: int | None) -> Iterator[tuple[float, bytes]]:
+    for i, raw in enumerate(itertools.islice(generator, count)):
+        yield i * interval, raw
+
+
+class FakeSerial:
+    """
+    Restitue des enregistrements (décalage en s, octets) au fil du temps,
+    décalages divisés par `speed`.
+    """
+
+    def __init__(self, port: str, records, speed: float, loop: bool,
+                 timeout: float | None):
+        self.port     = port
+        self.timeout  = timeout
+        self.is_open  = True
+        self._records = records                  # () -> itérateur d'enregistrements
+        self._speed   = speed
+        self._loop    = loop
+        self._iter: Iterator = records()
+        self._next: tuple[float, bytes] | None = None
+        self._base    = 0.0                      # décalage des tours précédents (loop)
+        self._last    = 0.0                      # décalage du dernier enregistrement
+        self._start   = time.monotonic()
+        self._buffer: deque[bytes] = deque()
+        self._size    = 0
+        self._ended   = False
+
+    # ── Interface serial.Serial ────────────────────────────────────────────────
+
+    @property
+    def in_waiting(self) -> int:
+        self._pull()
+        if not self._size and self._ended:
+            raise serial.SerialException(f"Fin de la source {self.port}")
+        return self._size
+
+    def read(self, size: int = 1) -> bytes:
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not self.in_waiting:
+            wait = self._wait()
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return b""
+                wait = min(wait, remaining)
+            time.sleep(wait)
+        return self._take(size)
+
+    def close(self) -> None:
+        self.is_open = False
+
+    # ── Interne ────────────────────────────────────────────────────────────────
+
+    def _due(self, offset: float) -> float:
+        """Instant (monotonic) où un enregistrement devient disponible."""
+        if not self._speed:
+            return self._start
+        return self._start + (self._base + offset) / self._speed
+
+    def _pull(self) -> None:
+        now = time.monotonic()
+        while not self._ended and self._size < _MAX_BUFFER:
+            if self._next is None:
+                self._next = next(self._iter, None)
+                if self._next is None:
+                    if not self._loop:
+                        self._ended = True
+                        return
+                    self._base += self._last + 1.0
+                    self._iter = self._records()
+                    continue
+            offset, data = self._next
+            if self._due(offset) > now:
+                return
+            self._buffer.append(data)
+            self._size += len(data)
+            self._last = offset
+            self._next = None
+
+    def _wait(self) -> float:
+        if self._next is None:
+            return 0.01
+        return max(self._due(self._next[0]) - time.monotonic(), 0.0) or 0.001
+
+    def _take(self, size: int) -> bytes:
+        out = bytearray()
+        buffer = self._buffer
+        while buffer and len(out) < size:
+            data = buffer.popleft()
+            room = size - len(out)
+            if len(data) > room:
+                buffer.appendleft(data[room:])
+                data = data[:room]
+            out += data
+        self._size -= len(out)
+        return bytes(out)
@@ -0,0 +1,42 @@
+"""
+frame_queue.py — File « dernière valeur gagnante » entre lecture et publication.
+
+La file ne contient qu'une seule trame : un put() remplace la trame non encore
+consommée, qui est comptée comme écartée. Le lecteur série ne bloque donc
+jamais, et le publieur ne traite jamais de retard accumulé.
+"""
+
+import threading
+
+
+class LatestQueue:
+
+    def __init__(self):
+        self._cond    = threading.Condition()
+        self._item    = None
+        self._pending = False
+        self.dropped  = 0   # trames remplacées avant d'avoir été consommées
+
+    def put(self, item) -> None:
+        """Dépose une trame ; ne bloque jamais."""
+        with self._cond:
+            if self._pending:
+                self.dropped += 1
+            self._item    = item
+            self._pending = True
+            self._cond.notify()
+
+    def get(self, timeout: float | None = None):
+        """Retourne la dernière trame déposée, ou None après `timeout` secondes."""
+        with self._cond:
+            if not self._pending:
+                self._cond.wait(timeout)
+                if not self._pending:
+                    return None
+            item = self._item
+            self._item    = None
+            self._pending = False
+            return item
+
+    def qsize(self) -> int:
+        return 1 if self._pending else 0
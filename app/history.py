@@ -0,0 +1,315 @@
+"""
+history.py — Historique local compact des lectures TIC, interrogeable par plage.
+
+Chaque trame structurée (au plus une toutes les HISTORY_INTERVAL s) est
+ajoutée à un fichier par jour (heure locale), <dossier>/AAAA-MM-JJ.tsr, en
+enregistrements binaires de taille fixe (little-endian, 44 octets) :
+
+    instant (ms epoch, int64), six index BBR (Wh, uint32), PAPP (VA, uint32),
+    IINST1..3 (A, uint16), code PTEC (uint8), code DEMAIN (uint8)
+
+Une valeur absente de la trame, ou hors de la plage du champ (index
+négatif, IINST > 65534...), vaut 0xFFFF… (index, PAPP, IINST) ou 0 (codes).
+Un index clairsemé, AAAA-MM-JJ.idx, donne l'instant d'un enregistrement sur
+INDEX_EVERY : une requête sur une plage se place directement au bon endroit
+du fichier, lu par mmap, sans le parcourir depuis le début.
+
+Environ 380 Ko par jour et par compteur avec HISTORY_INTERVAL=10.
+
+    python history.py daily --from 2025-01-01 --to 2025-01-31
+    python history.py query --from 2025-01-15T06:00 --to 2025-01-16T06:00 --step 900
+"""
+
+import argparse
+import bisect
+import datetime
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from typing import Iterator, Optional
+
+from tic_frame import INDEX_FIELDS, Ptec, Tempo, TicFrame
+
+log = logging.getLogger(__name__)
+
+_RECORD  = struct.Struct("<q6IIHHHBB")
+_INDEX   = struct.Struct("<qI")              # (instant ms, numéro d'enregistrement)
+_MISSING = (0xFFFFFFFF,) * 7 + (0xFFFF,) * 3
+_DATA, _IDX = ".tsr", ".idx"
+
+# Un enregistrement sur INDEX_EVERY a une entrée dans l'index clairsemé
+INDEX_EVERY = 128
+
+# Codes PTEC / DEMAIN : 0 = absent, puis l'ordre des énumérations
+_PTEC   = {ptec: code for code, ptec in enumerate(Ptec, 1)}
+_TEMPO  = {tempo: code for code, tempo in enumerate(Tempo, 1)}
+_PTEC_OF  = [None, *Ptec]
+_TEMPO_OF = [None, *Tempo]
+
+_NUMERIC = INDEX_FIELDS + ("papp", "iinst1", "iinst2", "iinst3")
+
+
+def pack(ts: float, frame: TicFrame) -> bytes:
+    """Enregistrement binaire d'une trame reçue à `ts` (epoch, s)."""
+    values = [getattr(frame, attr) for attr in _NUMERIC]
+    values = [value if isinstance(value, int) and 0 <= value < missing else missing
+              for value, missing in zip(values, _MISSING)]
+    return _RECORD.pack(int(ts * 1000), *values,
+                        _PTEC.get(frame.ptec, 0), _TEMPO.get(frame.demain, 0))
+
+
+def unpack(record) -> dict:
+    """Enregistrement binaire → dict (instant en s, valeurs absentes à None)."""
+    ts, *values, ptec, demain = _RECORD.unpack(record)
+    result = {"t": ts / 1000}
+    for attr, value, missing in zip(_NUMERIC, values, _MISSING):
+        result[attr] = None if value == missing else value
+    result["ptec"]   = _PTEC_OF[ptec] if ptec < len(_PTEC_OF) else None
+    result["demain"] = _TEMPO_OF[demain] if demain < len(_TEMPO_OF) else None
+    return result
+
+
+# ── Écriture ───────────────────────────────────────────────────────────────────
+
+class HistoryStore:
+    """Ajout des trames d'un compteur, avec rotation quotidienne."""
+
+    def __init__(self, directory: str, interval: float = 10.0):
+        self.directory = directory
+        self._interval = interval
+        self._last  = 0.0
+        self._day   = ""
+        self._data  = None
+        self._index = None
+        self._count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, ts: float, frame: TicFrame) -> None:
+        """Ajoute la trame si HISTORY_INTERVAL est écoulé depuis la précédente."""
+        if ts - self._last < self._interval:
+            return
+        try:
+            record = pack(ts, frame)
+            day = datetime.date.fromtimestamp(ts).isoformat()
+        except (struct.error, OverflowError, OSError, ValueError) as exc:
+            # Instant hors plage (horloge déréglée) : trame ignorée
+            log.warning("Historique : trame de %s ignorée : %s", ts, exc)
+            return
+        self._last = ts
+        try:
+            if day != self._day:
+                self._open(day)
+            if self._count % INDEX_EVERY == 0:
+                self._index.write(_INDEX.pack(int(ts * 1000), self._count))
+                self._index.flush()
+            self._data.write(record)
+            self._data.flush()
+            self._count += 1
+        except OSError as exc:
+            log.error("Historique : écriture impossible dans %s : %s", self.directory, exc)
+            self.close()                         # nouvel essai à la trame suivante
+
+    def close(self) -> None:
+        for f in (self._data, self._index):
+            if f:
+                f.close()
+        self._data = self._index = None
+        self._day = ""
+
+    def _open(self, day: str) -> None:
+        """Ouvre le fichier du jour en ajout et reconstruit son index."""
+        self.close()
+        path = os.path.join(self.directory, day)
+        data = open(path + _DATA, "ab")
+        size = data.tell()
+        if size % _RECORD.size:                  # enregistrement tronqué (arrêt brutal)
+            data.truncate(size - size % _RECORD.size)
+            data.seek(0, os.SEEK_END)
+        self._count = data.tell() // _RECORD.size
+
+        with open(path + _IDX, "wb") as index, open(path + _DATA, "rb") as f:
+            for number in range(0, self._count, INDEX_EVERY):
+                f.seek(number * _RECORD.size)
+                ts = struct.unpack_from("<q", f.read(8))[0]
+                index.write(_INDEX.pack(ts, number))
+        self._data  = data
+        self._index = open(path + _IDX, "ab")
+        self._day   = day
+        log.info("Historique : %s%s (%d enregistrements)", path, _DATA, self._count)
+
+
+# ── Lecture ────────────────────────────────────────────────────────────────────
+
+class _Day:
+    """Fichier d'un jour projeté en mémoire (vide si absent)."""
+
+    def __init__(self, directory: str, day: datetime.date):
+        self._path = os.path.join(directory, day.isoformat())
+        self._map: Optional[mmap.mmap] = None
+        self.count = 0
+        try:
+            with open(self._path + _DATA, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size >= _RECORD.size:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self.count = size // _RECORD.size
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._map:
+            self._map.close()
+
+    def record(self, number: int) -> dict:
+        return unpack(self._map[number * _RECORD.size:(number + 1) * _RECORD.size])
+
+    def timestamp(self, number: int) -> int:
+        return struct.unpack_from("<q", self._map, number * _RECORD.size)[0]
+
+    def records(self, start_ms: int, end_ms: int) -> Iterator[dict]:
+        """Enregistrements de [start_ms, end_ms[, dans l'ordre du fichier."""
+        number = self._seek(start_ms)
+        while number < self.count:
+            ts = self.timestamp(number)
+            if ts >= end_ms:
+                return
+            if ts >= start_ms:
+                yield self.record(number)
+            number += 1
+
+    def _seek(self, start_ms: int) -> int:
+        """Premier enregistrement à lire, d'après l'index clairsemé."""
+        if not self.count:
+            return 0
+        try:
+            with open(self._path + _IDX, "rb") as f:
+                entries = [entry for entry in _INDEX.iter_unpack(f.read())
+                           if entry[1] < self.count]
+        except (OSError, struct.error):
+            return 0                             # pas d'index : lecture complète
+        position = bisect.bisect_right(entries, start_ms, key=lambda entry: entry[0])
+        return entries[position - 1][1] if position else 0
+
+
+def _days(first: datetime.date, last: datetime.date) -> Iterator[datetime.date]:
+    day = first
+    while day <= last:
+        yield day
+        day += datetime.timedelta(days=1)
+
+
+def query(directory: str, start: float, end: float, step: float) -> list[dict]:
+    """
+    Lectures de [start, end[ (epoch, s) regroupées par tranches de `step` s :
+    index et PTEC / DEMAIN en fin de tranche, PAPP moyenne et max, IINST max.
+    """
+    buckets: dict[int, dict] = {}
+    first = datetime.date.fromtimestamp(start)
+    last  = datetime.date.fromtimestamp(end)
+    for day in _days(first, last):
+        with _Day(directory, day) as records:
+            for rec in records.records(int(start * 1000), int(end * 1000)):
+                key = int((rec["t"] - start) // step)
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = {"t": start + key * step, "n": 0,
+                                             "papp_sum": 0, "papp_n": 0, "papp_max": None}
+                bucket["n"] += 1
+                papp = rec["papp"]
+                if papp is not None:
+                    bucket["papp_sum"] += papp
+                    bucket["papp_n"]   += 1
+                    bucket["papp_max"]  = max(bucket["papp_max"] or 0, papp)
+                for attr in ("iinst1", "iinst2", "iinst3"):
+                    if rec[attr] is not None:
+                        bucket[f"{attr}_max"] = max(bucket.get(f"{attr}_max", 0), rec[attr])
+                for attr in INDEX_FIELDS + ("ptec", "demain"):
+                    if rec[attr] is not None:
+                        bucket[attr] = rec[attr]
+
+    result = []
+    for _, bucket in sorted(buckets.items()):
+        papp_sum, papp_n = bucket.pop("papp_sum"), bucket.pop("papp_n")
+        bucket["papp_avg"] = round(papp_sum / papp_n) if papp_n else None
+        result.append(bucket)
+    return result
+
+
+def daily(directory: str, first: datetime.date, last: datetime.date) -> list[dict]:
+    """
+    Consommation par jour et par index (Wh) : de la première lecture du jour
+    à la première du lendemain (à défaut, à la dernière du jour). Seuls le
+    premier et le dernier enregistrement de chaque fichier sont lus.
+    """
+    result = []
+    next_first = None
+    for day in reversed(list(_days(first, last + datetime.timedelta(days=1)))):
+        with _Day(directory, day) as records:
+            if not records.count:
+                next_first = None
+                continue
+            head = records.record(0)
+            tail = next_first or records.record(records.count - 1)
+            next_first = head
+        if day > last:
+            continue
+        wh = {attr: tail[attr] - head[attr] for attr in INDEX_FIELDS
+              if head[attr] is not None and tail[attr] is not None}
+        result.append({"day": day.isoformat(), "wh": wh,
+                       "total": sum(wh.values()) if len(wh) == len(INDEX_FIELDS) else None})
+    result.reverse()
+    return result
+
+
+# ── Ligne de commande ──────────────────────────────────────────────────────────
+
+def _default_dir() -> Optional[str]:
+    import config
+    return os.path.join(config.HISTORY_DIR, config.MQTT_PREFIX) if config.HISTORY_DIR else None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Interrogation de l'historique local")
+    parser.add_argument("--dir", help="dossier du compteur (défaut : HISTORY_DIR/MQTT_PREFIX)")
+    parser.add_argument("--json", action="store_true", help="sortie JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+    by_day = commands.add_parser("daily", help="consommation par jour")
+    by_day.add_argument("--from", dest="start", type=datetime.date.fromisoformat, required=True)
+    by_day.add_argument("--to",   dest="end",   type=datetime.date.fromisoformat, required=True)
+    ranged = commands.add_parser("query", help="lectures regroupées par tranche")
+    ranged.add_argument("--from", dest="start", type=datetime.datetime.fromisoformat, required=True)
+    ranged.add_argument("--to",   dest="end",   type=datetime.datetime.fromisoformat, required=True)
+    ranged.add_argument("--step", type=float, default=900, help="largeur des tranches (s)")
+    args = parser.parse_args()
+
+    directory = args.dir or _default_dir()
+    if not directory:
+        parser.error("--dir requis (HISTORY_DIR non défini)")
+
+    if args.command == "daily":
+        rows = daily(directory, args.start, args.end)
+    else:
+        rows = query(directory, args.start.timestamp(), args.end.timestamp(), args.step)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    elif args.command == "daily":
+        for row in rows:
+            detail = "  ".join(f"{attr[3:].upper()}={wh}" for attr, wh in row["wh"].items() if wh)
+            print(f"{row['day']}  {row['total'] if row['total'] is not None else '?':>7} Wh  {detail}")
+    else:
+        for row in rows:
+            when = datetime.datetime.fromtimestamp(row["t"]).isoformat(timespec="minutes")
+            print(f"{when}  n={row['n']:<4} papp={row['papp_avg']}/{row['papp_max']} VA  "
+                  f"ptec={row.get('ptec', '-')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+line_cache.py — Cache des lignes TIC déjà validées et typées.
+
+D'une trame à l'autre, la plupart des lignes sont identiques à l'octet près
+(ADCO, OPTARIF, ISOUSC, index inactifs, DEMAIN...). Le cache associe l'octet
+brut d'une ligne à sa place dans la TicFrame (attribut, clé, valeur typée) :
+une ligne déjà vue n'est ni re-découpée, ni re-vérifiée, ni re-convertie.
+Une trame entièrement identique à la précédente renvoie directement la
+TicFrame précédente.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+
+import metrics
+from tic_parser import AUTO, decode_line, detect_mode, split_lines
+from payload    import frame_item
+from tic_frame  import TicFrame
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SIZE = 256
+
+_PARSE_SECONDS     = metrics.STAGE_SECONDS.labels("parse")
+_STRUCTURE_SECONDS = metrics.STAGE_SECONDS.labels("structure")
+
+
+class LineCache:
+    """
+    Décodage parse + structure d'une trame avec cache borné par ligne.
+
+    Le cache est LRU : une fois plein, la ligne servie le moins récemment est
+    évincée (les index inactifs, présents dans chaque trame, restent en cache).
+    Les lignes invalides ne sont jamais mises en cache.
+    """
+
+    def __init__(self, max_lines: int = DEFAULT_SIZE):
+        self._max   = max_lines
+        self._lines: OrderedDict[bytes, tuple] = OrderedDict()   # ligne brute → (attribut, clé, valeur)
+        self._last_raw:  bytes | None = None
+        self._last_data = TicFrame()
+
+        self.hits        = 0   # lignes servies depuis le cache
+        self.misses      = 0   # lignes décodées
+        self.frame_hits  = 0   # trames identiques à la précédente
+
+    def decode(self, raw: bytes, mode: str = AUTO) -> TicFrame:
+        """
+        Équivalent de structure_payload(decode_frame(raw, mode)).
+
+        La trame renvoyée peut être partagée avec l'appel précédent : ne pas la modifier.
+        """
+        if raw == self._last_raw:
+            self.frame_hits += 1
+            return self._last_data
+
+        if mode == AUTO:
+            mode = detect_mode(raw)
+
+        lines = self._lines
+        frame = TicFrame()
+        extra = frame.extra
+        clock = time.perf_counter
+        parse_time = structure_time = 0.0
+
+        for line in split_lines(raw):
+            item = lines.get(line)
+            if item is not None:
+                self.hits += 1
+                lines.move_to_end(line)
+            else:
+                if not line or line in (b"\x02", b"\x03"):
+                    continue
+                self.misses += 1
+                t0 = clock()
+                parsed = decode_line(line, mode)
+                t1 = clock()
+                parse_time += t1 - t0
+                if not parsed:
+                    continue
+                item = frame_item(*parsed)
+                structure_time += clock() - t1
+                if len(lines) >= self._max:
+                    lines.popitem(last=False)
+                lines[line] = item
+            attr, key, value = item
+            if attr:
+                setattr(frame, attr, value)
+            else:
+                extra[key] = value
+
+        _PARSE_SECONDS.observe(parse_time)
+        _STRUCTURE_SECONDS.observe(structure_time)
+        self._last_raw  = raw
+        self._last_data = frame
+        return frame
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        ratio = self.hits / total if total else 0.0
+        return (f"lignes : {self.hits} hits / {self.misses} misses ({ratio:.0%}), "
+                f"trames identiques : {self.frame_hits}, taille : {len(self._lines)}")
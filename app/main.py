@@ -10,8 +10,12 @@ and publishes measurements to MQTT with Home Assistant auto-discovery.
 """
 
 import logging
+
+import config
+import metrics
 from mqtt_client import MQTTClient
-from bridge import run
+from discovery import Discovery
+from bridge import meters, run
 
 VERSION = "0.1"
 
@@ -28,7 +32,12 @@ def main():
     logger.info("  linky2mqtt — Linky TIC to MQTT")
     logger.info("  version: %s  ", VERSION)
     logger.info("=" * 50)
+    if config.METRICS_PORT:
+        metrics.serve(config.METRICS_PORT)
     mqtt = MQTTClient()
+    if config.HA_DISCOVERY:
+        for _port, prefix in meters():
+            Discovery(mqtt, prefix)
     mqtt.connect()
     try:
         run(mqtt)
@@ -0,0 +1,252 @@
+"""
+metrics.py — Métriques au format texte Prometheus, servies sur /metrics.
+
+Les compteurs et histogrammes du chemin critique sont de simples entiers et
+flottants incrémentés en place : pas de verrou, pas d'allocation par trame
+(un incrément concurrent perdu en mode threadé est sans importance ici).
+Les valeurs déjà tenues ailleurs (cache de lignes, règles de publication,
+file de trames) sont lues par des fonctions appelées au moment de la requête.
+
+Le serveur HTTP tourne dans son propre thread (METRICS_PORT, 0 = désactivé).
+"""
+
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+# Bornes des histogrammes de durée, en secondes (de 10 µs à 1 s)
+LATENCY_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3,
+                   5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0)
+
+# Au-delà, les nouvelles combinaisons d'étiquettes sont regroupées sous « other »
+_MAX_SERIES = 64
+
+_registry: list = []
+
+
+# ── Types de métriques ─────────────────────────────────────────────────────────
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int | float = 1) -> None:
+        self.value += amount
+
+
+class Counter:
+    """Compteur monotone, éventuellement décliné par étiquettes (labels())."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._children: dict[tuple, _CounterChild] = {}
+        if not labelnames:
+            self._default = self.labels()
+        _registry.append(self)
+
+    def labels(self, *values) -> _CounterChild:
+        """Série pour ces valeurs d'étiquettes (à garder par l'appelant si appelée souvent)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(self._children) >= _MAX_SERIES:
+                values = ("other",) * len(self.labelnames)
+                child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = _CounterChild()
+        return child
+
+    def inc(self, amount: int | float = 1) -> None:
+        self._default.value += amount
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield self.name, values, child.value
+
+    def labelnames_for(self, sample: str) -> tuple[str, ...]:
+        return self.labelnames
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum    = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(Counter):
+    """Histogramme cumulatif (le +Inf est la dernière case)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        super().__init__(name, help, labelnames)
+
+    def labels(self, *values) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _HistogramChild(self.buckets)
+        return child
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            cumulated = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulated += count
+                yield f"{self.name}_bucket", values + (_format(bound),), cumulated
+            yield f"{self.name}_sum",   values, child.sum
+            yield f"{self.name}_count", values, cumulated
+
+    def labelnames_for(self, sample: str) -> tuple[str, ...]:
+        return self.labelnames + ("le",) if sample.endswith("_bucket") else self.labelnames
+
+
+class Callback:
+    """
+    Métrique lue au moment de la requête : fn() retourne une valeur, ou un
+    dict { tuple de valeurs d'étiquettes: valeur }.
+    """
+
+    def __init__(self, name: str, help: str, kind: str, fn,
+                 labelnames: tuple[str, ...] = ()):
+        self.name, self.help, self.kind = name, help, kind
+        self.labelnames, self._fn = labelnames, fn
+        _registry.append(self)
+
+    def samples(self):
+        result = self._fn()
+        if not isinstance(result, dict):
+            result = {(): result}
+        for values, value in result.items():
+            yield self.name, values, value
+
+    def labelnames_for(self, sample: str) -> tuple[str, ...]:
+        return self.labelnames
+
+
+# ── Métriques du bridge ────────────────────────────────────────────────────────
+
+BYTES_READ = Counter(
+    "linky_serial_bytes_read_total", "Octets lus sur le port série", ("port",))
+FRAMES = Counter(
+    "linky_frames_total",
+    "Trames par étape : framed (STX..ETX complète), decoded (au moins une ligne valide), "
+    "rate_limited (non publiée, intervalle), published",
+    ("port", "stage"))
+CHECKSUM_ERRORS = Counter(
+    "linky_checksum_errors_total", "Lignes TIC à checksum invalide, par étiquette", ("label",))
+MALFORMED_LINES = Counter(
+    "linky_malformed_lines_total", "Lignes TIC au format inattendu")
+STAGE_SECONDS = Histogram(
+    "linky_stage_duration_seconds",
+    "Durée par trame des étapes parse, structure (lignes absentes du cache) et publish",
+    ("stage",))
+MQTT_PUBLISH = Counter(
+    "linky_mqtt_publish_total",
+    "Valeurs soumises à MQTTClient.publish, par résultat (published, unchanged, "
+    "deadband, deferred, failed)",
+    ("result",))
+SERIAL_RECONNECTS = Counter(
+    "linky_serial_reconnects_total", "Réouvertures du port série après une erreur", ("port",))
+MQTT_DISCONNECTS = Counter(
+    "linky_mqtt_disconnects_total", "Déconnexions inattendues du broker MQTT")
+SINK_RECORDS = Counter(
+    "linky_sink_records_total",
+    "Lectures par sortie supplémentaire (SINKS) et par résultat : written, dropped "
+    "(file pleine), failed",
+    ("sink", "result"))
+SINK_SECONDS = Histogram(
+    "linky_sink_latency_seconds",
+    "Délai entre le dépôt d'une lecture dans la file d'une sortie et son écriture",
+    ("sink",))
+
+
+# ── Exposition ─────────────────────────────────────────────────────────────────
+
+def render() -> str:
+    """
+    Texte au format d'exposition Prometheus 0.0.4. Une famille enregistrée
+    plusieurs fois sous le même nom n'est déclarée qu'une fois (Prometheus
+    rejette sinon toute la réponse), avec les séries de chaque instance.
+    """
+    families: dict[str, list] = {}
+    for metric in _registry:
+        families.setdefault(metric.name, []).append(metric)
+    out = []
+    for name, group in families.items():
+        samples = []
+        readable = False
+        for metric in group:
+            try:
+                samples += [(sample, values, value, metric)
+                            for sample, values, value in metric.samples()]
+                readable = True
+            except Exception:
+                log.exception("Métrique %s illisible", name)
+        if not readable:
+            continue
+        out.append(f"# HELP {name} {group[0].help}")
+        out.append(f"# TYPE {name} {group[0].kind}")
+        for sample, values, value, metric in samples:
+            if values:
+                names  = metric.labelnames_for(sample)
+                labels = ",".join(f'{k}="{_escape(str(v))}"' for k, v in zip(names, values))
+                out.append(f"{sample}{{{labels}}} {_format(value)}")
+            else:
+                out.append(f"{sample} {_format(value)}")
+    return "\n".join(out) + "\n"
+
+
+def serve(port: int, host: str = "") -> ThreadingHTTPServer:
+    """Démarre le serveur /metrics dans un thread dédié."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    log.info("Métriques exposées sur http://%s:%d/metrics", host or "0.0.0.0", port)
+    return server
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug("HTTP %s — " + format, self.client_address[0], *args)
+
+
+def _format(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -1,31 +1,108 @@
 """
-mqtt_client.py — Connexion au broker MQTT et publication avec RBE.
+mqtt_client.py — Connexion au broker MQTT et publication filtrée par topic
+(deadband, intervalle min, heartbeat : voir publish_policy.py).
 Compatible paho-mqtt 1.6.1 et 2.x.
+
+Les publications en échec (broker injoignable) sont conservées dans un spool
+sur disque et rejouées à la reconnexion sur PREFIX/history/<topic>.
+
+La connexion est établie en arrière-plan (reconnexion à délai exponentiel) :
+la lecture série démarre sans attendre le broker.
+
+La disponibilité du bridge est publiée sur PREFIX/status (online / offline
+via le Last Will).
+
+MQTTv5 : les topics publiés utilisent des alias (dans la limite annoncée par
+le broker dans le CONNACK) et, si configurée, une durée d'expiration.
 """
 
+import json
 import logging
+import os
+import threading
 import time
 import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
 
 from config import (
     MQTT_HOST, MQTT_PORT, MQTT_USER, MQTT_PASS,
-    MQTT_CLIENT, MQTT_PREFIX,
+    MQTT_CLIENT, MQTT_PREFIX, STATE_DIR, RBE_PERSIST,
+    SPOOL, SPOOL_MAX_MB, SPOOL_MAX_AGE_H, SPOOL_REPLAY_RATE, PUBLISH_POLICY,
+    MQTT_TOPIC_ALIASES, MQTT_MESSAGE_EXPIRY,
 )
+import metrics
+from publish_policy import PUBLISH, UNCHANGED, DEADBAND, DEFERRED, PublishPolicy, parse_rules
+from spool      import Spool
+from state_file import StateFile
 
 log = logging.getLogger(__name__)
 
-_RETRY_DELAY = 5
+_RETRY_MIN   = 1       # délai de reconnexion initial (s), doublé à chaque échec
+_RETRY_MAX   = 60
+_RBE_FILE    = "rbe.json"
+_RBE_SAVE_INTERVAL = 60.0
+_SPOOL_DIR   = "spool"
+
+AVAILABILITY_TOPIC = f"{MQTT_PREFIX}/status"
+
+# Client exposé par les métriques (le dernier créé : un seul en service)
+_clients: list["MQTTClient"] = []
+metrics.Callback("linky_mqtt_connected", "Connexion au broker établie (0 / 1)", "gauge",
+                 lambda: int(any(client._connected for client in _clients)))
+metrics.Callback("linky_mqtt_deferred", "Valeurs différées en attente (intervalle min)",
+                 "gauge", lambda: sum(len(client._deferred) for client in _clients))
+
+# Décision de publication → série de linky_mqtt_publish_total
+_RESULTS = {
+    verdict: metrics.MQTT_PUBLISH.labels(result)
+    for verdict, result in ((PUBLISH, "published"), (UNCHANGED, "unchanged"),
+                            (DEADBAND, "deadband"), (DEFERRED, "deferred"), (None, "failed"))
+}
 
 
 class MQTTClient:
 
-    def __init__(self):
-        self._client = mqtt.Client(
+    def __init__(self, client=None):
+        """`client` remplace le client paho (ex : stub_broker.StubBroker pour les mesures)."""
+        self._client = client or mqtt.Client(
             client_id = MQTT_CLIENT,
             protocol  = mqtt.MQTTv5,
         )
-        self._last: dict[str, str] = {}
+        self._last: dict[str, str] = {}          # topic complet → dernière valeur publiée
+        self._last_time: dict[str, float] = {}   # topic complet → instant (monotonic)
+        self._topics: dict[str, tuple] = {}      # topic complet → (topic, préfixe)
+        self._observed: dict[str, object] = {}   # topic complet → dernière valeur reçue
+        self._deferred: dict[str, tuple] = {}    # topic complet → (topic, valeur, préfixe) différés
+        self.policy = PublishPolicy(parse_rules(PUBLISH_POLICY))
         self._connected = False
+        self._ever_connected = False
+        self.failures   = 0     # publications en échec depuis le démarrage
+        self._started   = time.monotonic()
+        self._published = False
+        self._attempts  = 0
+        self._rbe_store: StateFile | None = None
+
+        self._spool: Spool | None = None
+        self._replay: threading.Thread | None = None
+
+        # MQTTv5 : topic complet → propriétés PUBLISH portant son alias,
+        # réinitialisé à chaque connexion (les alias ne survivent pas à la session).
+        # Le verrou empêche un envoi d'utiliser un alias de la connexion précédente
+        # pendant que _on_connect (thread paho) les réinitialise.
+        self._alias_lock = threading.Lock()
+        self._alias_max = 0
+        self._aliases: dict[str, Properties] = {}
+        self._expiry = _publish_properties(None)
+
+        # topic → callbacks(payload: bytes), réabonnés à chaque connexion
+        self._subscriptions: dict[str, list] = {}
+        self._on_connected: list = []
+
+        if RBE_PERSIST:
+            self._load_rbe()
+        if SPOOL:
+            self._open_spool()
 
         if MQTT_USER:
             self._client.username_pw_set(MQTT_USER, MQTT_PASS)
@@ -36,72 +113,334 @@ class MQTTClient:
         log.info("Client MQTT : id=%r  protocol=MQTTv5  broker=%s:%s",
                  MQTT_CLIENT, MQTT_HOST, MQTT_PORT)
 
-        self._client.on_connect    = self._on_connect
-        self._client.on_disconnect = self._on_disconnect
+        self._client.will_set(AVAILABILITY_TOPIC, payload="offline", retain=True)
+
+        self._client.on_connect      = self._on_connect
+        self._client.on_disconnect   = self._on_disconnect
+        self._client.on_connect_fail = self._on_connect_fail
+        _clients[:] = [self]
 
     # ── Connexion ──────────────────────────────────────────────────────────────
 
     def connect(self) -> None:
-        attempt = 0
-        while True:
-            attempt += 1
-            try:
-                log.info("Connexion MQTT → %s:%s (tentative %d)…",
-                         MQTT_HOST, MQTT_PORT, attempt)
-                self._client.connect(MQTT_HOST, MQTT_PORT, keepalive=60)
-                self._client.loop_start()
-                for _ in range(20):
-                    if self._connected:
-                        return
-                    time.sleep(0.5)
-                log.warning("Pas de réponse du broker après 10 s — on continue quand même")
-                return
-
-            except OSError as exc:
-                log.error("Connexion MQTT échouée : %s — retry dans %d s", exc, _RETRY_DELAY)
-                time.sleep(_RETRY_DELAY)
+        """
+        Lance la connexion au broker et rend la main immédiatement. Le thread
+        réseau de paho réessaie ensuite avec un délai doublé à chaque échec
+        (de _RETRY_MIN à _RETRY_MAX secondes). En attendant, les publications
+        échouent et partent dans le spool.
+        """
+        log.info("Connexion MQTT → %s:%s (en arrière-plan)…", MQTT_HOST, MQTT_PORT)
+        self._client.reconnect_delay_set(_RETRY_MIN, _RETRY_MAX)
+        self._client.connect_async(MQTT_HOST, MQTT_PORT, keepalive=60)
+        self._client.loop_start()
+
+    @property
+    def ever_connected(self) -> bool:
+        """Vrai dès la première connexion réussie au broker."""
+        return self._ever_connected
+
+    @property
+    def spooling(self) -> bool:
+        """Vrai si les publications en échec sont conservées dans le spool."""
+        return self._spool is not None
 
     def disconnect(self) -> None:
+        if self._connected:
+            self._client.publish(AVAILABILITY_TOPIC, payload="offline", retain=True)
         self._client.loop_stop()
         self._client.disconnect()
+        if self._rbe_store:
+            self._rbe_store.flush()
         log.info("MQTT déconnecté")
 
+    # ── Persistance RBE ────────────────────────────────────────────────────────
+
+    def _load_rbe(self) -> None:
+        """Recharge les dernières valeurs publiées lors de l'exécution précédente."""
+        if not os.path.isdir(STATE_DIR):
+            log.warning("RBE persistant désactivé : dossier %s absent", STATE_DIR)
+            return
+        self._rbe_store = StateFile(os.path.join(STATE_DIR, _RBE_FILE), _RBE_SAVE_INTERVAL)
+        state = self._rbe_store.load()
+        # Ancien format : topic complet → valeur, sans (topic, préfixe) ; ces
+        # topics n'ont pas de heartbeat tant qu'aucune valeur n'a été reçue.
+        values = state.get("values") if isinstance(state.get("values"), dict) else state
+        topics = state.get("topics") if isinstance(state.get("topics"), dict) else {}
+        now = time.monotonic()
+        for full_topic, value in values.items():
+            if isinstance(value, str):
+                self._last[full_topic] = value
+                self._last_time[full_topic] = now
+                entry = topics.get(full_topic)
+                if isinstance(entry, list) and len(entry) == 2:
+                    self._topics[full_topic] = tuple(entry)
+        # État persistant : les dicts vivants, écrits par StateFile au fil de l'eau
+        self._rbe_state = {"values": self._last, "topics": self._topics}
+        log.info("RBE : %d valeurs restaurées depuis %s", len(self._last), self._rbe_store.path)
+
+    # ── Spool (store-and-forward) ──────────────────────────────────────────────
+
+    def _open_spool(self) -> None:
+        if not os.path.isdir(STATE_DIR):
+            log.warning("Spool désactivé : dossier %s absent", STATE_DIR)
+            return
+        self._spool = Spool(
+            os.path.join(STATE_DIR, _SPOOL_DIR),
+            max_bytes = int(SPOOL_MAX_MB * 1024 * 1024),
+            max_age   = SPOOL_MAX_AGE_H * 3600,
+        )
+
+    def _start_replay(self) -> None:
+        """Lance le rejeu du spool dans un thread dédié (n'attend pas)."""
+        if not (self._spool and self._spool.pending()):
+            return
+        if self._replay and self._replay.is_alive():
+            return
+        self._replay = threading.Thread(target=self._run_replay, name="spool-replay",
+                                        daemon=True)
+        self._replay.start()
+
+    def _run_replay(self) -> None:
+        batch = max(1, int(SPOOL_REPLAY_RATE))
+        sent  = self._spool.replay(self._publish_history, batch=batch, pause=1.0)
+        log.info("Spool : %d lectures rejouées", sent)
+
+    def _publish_history(self, prefix: str, topic: str, value: str, ts: float) -> bool:
+        """Publie une lecture différée sur PREFIX/history/<topic>, non retenue."""
+        if not self._connected:
+            return False
+        payload = json.dumps({"ts": ts, "value": value}, separators=(",", ":"))
+        result  = self._client.publish(f"{prefix}/history/{topic}", payload=payload,
+                                       qos=1, retain=False)
+        return result.rc == mqtt.MQTT_ERR_SUCCESS
+
+    # ── Diagnostic ─────────────────────────────────────────────────────────────
+
+    def sizes(self) -> dict[str, int]:
+        """Taille des structures internes (voir diagnostics.py)."""
+        return {
+            "mqtt.last":          len(self._last),
+            "mqtt.last_time":     len(self._last_time),
+            "mqtt.topics":        len(self._topics),
+            "mqtt.observed":      len(self._observed),
+            "mqtt.deferred":      len(self._deferred),
+            "mqtt.aliases":       len(self._aliases),
+            "mqtt.subscriptions": len(self._subscriptions),
+            "policy.rules_cache": len(self.policy._by_topic),
+        }
+
+    # ── Abonnements et publications brutes ────────────────────────────────────
+
+    def subscribe(self, topic: str, callback) -> None:
+        """
+        Abonne callback(payload: bytes) à un topic (maintenu après reconnexion).
+        Plusieurs callbacks peuvent suivre le même topic (un par compteur).
+        """
+        callbacks = self._subscriptions.get(topic)
+        if callbacks is not None:
+            callbacks.append(callback)
+            return
+        callbacks = self._subscriptions[topic] = [callback]
+
+        def _dispatch(_client, _userdata, msg) -> None:
+            for callback in list(callbacks):
+                try:
+                    callback(msg.payload)
+                except Exception:
+                    log.exception("Erreur dans un callback du topic %s", topic)
+
+        self._client.message_callback_add(topic, _dispatch)
+        if self._connected:
+            self._client.subscribe(topic)
+
+    def add_on_connect(self, callback) -> None:
+        """Enregistre callback(first: bool) appelé à chaque connexion au broker."""
+        self._on_connected.append(callback)
+
+    def publish_raw(self, topic: str, payload: bytes, retain: bool = True) -> bool:
+        """Publie un payload tel quel sur un topic complet, sans préfixe ni RBE."""
+        result = self._client.publish(topic, payload=payload, retain=retain)
+        return result.rc == mqtt.MQTT_ERR_SUCCESS
+
+    def _send(self, full_topic: str, payload: str, retain: bool):
+        """
+        Envoie un PUBLISH en utilisant l'alias du topic s'il est déjà établi
+        sur cette connexion (topic vide), ou en en établissant un nouveau.
+        """
+        with self._alias_lock:
+            aliases = self._aliases
+            props   = aliases.get(full_topic)
+            if props is not None:
+                return self._client.publish("", payload=payload, retain=retain, properties=props)
+
+            if len(aliases) < self._alias_max:
+                props  = _publish_properties(len(aliases) + 1)
+                result = self._client.publish(full_topic, payload=payload, retain=retain,
+                                              properties=props)
+                if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                    aliases[full_topic] = props
+                return result
+
+        return self._client.publish(full_topic, payload=payload, retain=retain,
+                                    properties=self._expiry)
+
     # ── Publication RBE ────────────────────────────────────────────────────────
 
-    def publish(self, topic: str, value, retain: bool = True) -> bool:
-        full_topic = f"{MQTT_PREFIX}/{topic}"
-        str_value  = str(value)
+    def for_prefix(self, prefix: str) -> "PrefixedClient":
+        """Vue de ce client publiant sous un autre préfixe (un compteur parmi plusieurs)."""
+        return PrefixedClient(self, prefix)
+
+    def publish(self, topic: str, value, retain: bool = True,
+                full_topic: str | None = None, prefix: str = MQTT_PREFIX) -> bool:
+        """
+        Publie `value` sur PREFIX/topic selon la règle du topic (publish_policy.py).
+        `full_topic` évite de reconstruire le topic complet quand l'appelant l'a déjà.
+        """
+        full_topic = full_topic or f"{prefix}/{topic}"
+        now  = time.monotonic()
+        rule = self.policy.rule(topic)
+        if rule.digits is not None and isinstance(value, float):
+            value = round(value, rule.digits)
+        str_value = str(value)
+        self._observed[full_topic] = value
+        if full_topic not in self._topics:
+            self._topics[full_topic] = (topic, prefix)
 
-        if self._last.get(full_topic) == str_value:
-            log.debug("RBE skip : %s (inchangé : %s)", full_topic, str_value)
+        last    = self._last.get(full_topic)
+        verdict = self.policy.decide(rule, value, str_value, last,
+                                     now - self._last_time.get(full_topic, now))
+        if verdict != PUBLISH:
+            _RESULTS[verdict].inc()
+            if verdict == DEFERRED:
+                self._deferred[full_topic] = (topic, value, prefix)
+            else:
+                self._deferred.pop(full_topic, None)
+            log.debug("Publication évitée (%s) : %s = %s", verdict, full_topic, str_value)
             return False
 
-        result = self._client.publish(full_topic, payload=str_value, retain=retain)
+        result = self._send(full_topic, str_value, retain)
 
         if result.rc != mqtt.MQTT_ERR_SUCCESS:
-            log.error("Échec publication — topic=%s  rc=%s  valeur=%s",
-                      full_topic, result.rc, str_value)
+            self.failures += 1
+            _RESULTS[None].inc()
+            if self._spool:
+                self._spool.append(prefix, topic, str_value)
+                log.debug("Publication différée (spool) — topic=%s  rc=%s  valeur=%s",
+                          full_topic, result.rc, str_value)
+            else:
+                log.error("Échec publication — topic=%s  rc=%s  valeur=%s",
+                          full_topic, result.rc, str_value)
             return False
 
-        prev = self._last.get(full_topic, "<jamais publié>")
+        _RESULTS[PUBLISH].inc()
+        if not self._published:
+            self._published = True
+            log.info("Première publication MQTT %.1f s après le démarrage",
+                     now - self._started)
+        self._deferred.pop(full_topic, None)
         self._last[full_topic] = str_value
-        log.debug("MQTT ↑ %s : %s → %s", full_topic, prev, str_value)
+        self._last_time[full_topic] = now
+        if self._rbe_store:
+            self._rbe_store.save(self._rbe_state)
+        log.debug("MQTT ↑ %s : %s → %s", full_topic, last or "<jamais publié>", str_value)
         return True
 
+    def publish_due(self) -> None:
+        """
+        Publie les valeurs différées dont l'intervalle min est écoulé et les
+        heartbeats des topics restés silencieux trop longtemps. Le heartbeat
+        envoie la dernière valeur reçue (éventuellement retenue par la zone
+        morte), qui devient la nouvelle référence. À appeler périodiquement
+        (à chaque publication de trame).
+        """
+        now = time.monotonic()
+        for full_topic, (topic, value, prefix) in list(self._deferred.items()):
+            if now - self._last_time.get(full_topic, now) >= self.policy.rule(topic).min_interval:
+                self.publish(topic, value, full_topic=full_topic, prefix=prefix)
+
+        for full_topic, str_value in list(self._last.items()):
+            entry = self._topics.get(full_topic)
+            if entry is None:                    # ancien rbe.json : topic pas encore reçu
+                continue
+            topic, prefix = entry
+            silence = self.policy.rule(topic).max_silence
+            if silence and now - self._last_time[full_topic] >= silence:
+                value = self._observed.get(full_topic, str_value)
+                self.publish(topic, value, full_topic=full_topic, prefix=prefix)
+
     # ── Callbacks ─────────────────────────────────────────────────────────────
 
     def _on_connect(self, client, userdata, flags, rc, properties=None):
         if rc == 0:
-            self._connected = True
-            log.info("MQTT connecté à %s:%s", MQTT_HOST, MQTT_PORT)
+            first = not self._ever_connected
+            self._connected = self._ever_connected = True
+            self._attempts  = 0
+            with self._alias_lock:
+                self._aliases   = {}
+                self._alias_max = (getattr(properties, "TopicAliasMaximum", 0)
+                                   if MQTT_TOPIC_ALIASES else 0)
+            log.info("MQTT connecté à %s:%s en %.1f s (alias de topics : %d)",
+                     MQTT_HOST, MQTT_PORT, time.monotonic() - self._started, self._alias_max)
+            client.publish(AVAILABILITY_TOPIC, payload="online", retain=True)
+            for topic in self._subscriptions:
+                client.subscribe(topic)
+            for callback in self._on_connected:
+                try:
+                    callback(first)
+                except Exception:
+                    log.exception("Erreur dans un callback de connexion")
+            self._start_replay()
         else:
             log.error("MQTT connexion refusée — rc=%s : %s", rc, mqtt.connack_string(rc))
             log.error("  → broker=%s:%s  user=%r  client_id=%r",
                       MQTT_HOST, MQTT_PORT, MQTT_USER, MQTT_CLIENT)
 
+    def _on_connect_fail(self, client, userdata):
+        self._attempts += 1
+        log.error("Connexion MQTT échouée (tentative %d) — %s:%s injoignable, "
+                  "nouvel essai dans %d s max", self._attempts, MQTT_HOST, MQTT_PORT,
+                  _RETRY_MAX)
+
     def _on_disconnect(self, client, userdata, rc, properties=None):
         self._connected = False
+        with self._alias_lock:
+            self._aliases = {}
         if rc == 0:
             log.info("MQTT déconnecté proprement")
         else:
-            log.warning("MQTT déconnecté de façon inattendue (rc=%s) — reconnexion auto…", rc)
\ No newline at end of file
+            metrics.MQTT_DISCONNECTS.inc()
+            log.warning("MQTT déconnecté de façon inattendue (rc=%s) — reconnexion auto…", rc)
+            if self._spool:
+                log.warning("Lectures conservées dans le spool jusqu'à la reconnexion")
+
+
+class PrefixedClient:
+    """
+    Client MQTT partagé, vu par un compteur : publish() utilise son préfixe,
+    tout le reste (connexion, règles, spool, callbacks) est celui du client.
+    """
+
+    __slots__ = ("_client", "prefix")
+
+    def __init__(self, client: MQTTClient, prefix: str):
+        self._client = client
+        self.prefix  = prefix
+
+    def publish(self, topic: str, value, retain: bool = True,
+                full_topic: str | None = None) -> bool:
+        return self._client.publish(topic, value, retain, full_topic, self.prefix)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def _publish_properties(alias: int | None) -> Properties | None:
+    """Propriétés MQTTv5 d'un PUBLISH : alias de topic et/ou expiration."""
+    if alias is None and not MQTT_MESSAGE_EXPIRY:
+        return None
+    props = Properties(PacketTypes.PUBLISH)
+    if alias is not None:
+        props.TopicAlias = alias
+    if MQTT_MESSAGE_EXPIRY:
+        props.MessageExpiryInterval = MQTT_MESSAGE_EXPIRY
+    return props
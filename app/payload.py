@@ -3,12 +3,16 @@ payload.py — Transformation du payload TIC brut en valeurs typées.
 
 Reproduit la logique du nœud Node-RED "Structure payload" :
   - Conversion des chaînes numériques en int/float
-  - Décodage des champs alphanumériques (OPTARIF, PTEC, HHPHC)
+  - Décodage des champs alphanumériques (OPTARIF, PTEC, DEMAIN, HHPHC)
   - Renommage IINST → IINST1, IMAX → IMAX1
+
+Les valeurs typées sont rangées dans une TicFrame (voir tic_frame.py).
 """
 
 import logging
 
+from tic_frame import FIELDS, Ptec, Tempo, TicFrame
+
 log = logging.getLogger(__name__)
 
 # ── Tables de correspondance ───────────────────────────────────────────────────
@@ -21,25 +25,25 @@ OPTARIF_MAP = {
 }
 
 # PTEC : (libellé lisible, couleur Tempo ou None)
-PTEC_MAP: dict[str, tuple[str, str | None]] = {
+PTEC_MAP: dict[str, tuple[str, Tempo | None]] = {
     "TH..": ("Toutes Heures",        None),
     "HC..": ("Heures Creuses",       None),
     "HP..": ("Heures Pleines",       None),
     "HN..": ("Heures Normales",      None),
     "PM..": ("Heures Pointe Mobile", None),
-    "HCJB": ("Heures Creuses",       "BLUE"),
-    "HCJW": ("Heures Creuses",       "WHITE"),
-    "HCJR": ("Heures Creuses",       "RED"),
-    "HPJB": ("Heures Pleines",       "BLUE"),
-    "HPJW": ("Heures Pleines",       "WHITE"),
-    "HPJR": ("Heures Pleines",       "RED"),
+    "HCJB": ("Heures Creuses",       Tempo.BLUE),
+    "HCJW": ("Heures Creuses",       Tempo.WHITE),
+    "HCJR": ("Heures Creuses",       Tempo.RED),
+    "HPJB": ("Heures Pleines",       Tempo.BLUE),
+    "HPJW": ("Heures Pleines",       Tempo.WHITE),
+    "HPJR": ("Heures Pleines",       Tempo.RED),
 }
 
 # DEMAIN : préfixe 4 chars → couleur Tempo normalisée
 DEMAIN_MAP = {
-    "BLEU": "BLUE",
-    "BLAN": "WHITE",
-    "ROUG": "RED",
+    "BLEU": Tempo.BLUE,
+    "BLAN": Tempo.WHITE,
+    "ROUG": Tempo.RED,
 }
 
 
@@ -61,50 +65,73 @@ def _to_number(v: str) -> int | float:
 
 # ── Structuration principale ───────────────────────────────────────────────────
 
-def structure_payload(raw: dict[str, str]) -> dict:
+def structure_item(label: str, value: str) -> tuple[str, int | float | str]:
     """
-    Prend le dict { LABEL: str } issu du parseur TIC et retourne un dict
-    avec des valeurs correctement typées (int, float ou str selon le champ).
+    Type une étiquette TIC isolée. Retourne (clé, valeur typée) ; la clé peut
+    différer de l'étiquette (IINST → IINST1, IMAX → IMAX1).
     """
-    data: dict = {}
+    if label == "OPTARIF":
+        # 4 chars alphanumériques → int (on ignore le 4e char)
+        return label, OPTARIF_MAP.get(value[:3], 0)
 
-    for label, value in raw.items():
+    if label == "HHPHC":
+        # Caractère A–Y → code ASCII
+        return label, ord(value[0]) if value else 0
+
+    if label == "PTEC":
+        # Code de période ; la conversion lisible est faite dans publisher.py
+        return label, Ptec(value) if value in PTEC_MAP else value
+
+    if label == "DEMAIN":
+        # Normalisation de la couleur Tempo du lendemain (None : pas encore connue)
+        if value.strip() == "----":
+            return label, None
+        return label, DEMAIN_MAP.get(value[:4].upper(), value)
 
-        if label == "OPTARIF":
-            # 4 chars alphanumériques → int (on ignore le 4e char)
-            key = value[:3]
-            data[label] = OPTARIF_MAP.get(key, 0)
+    if label == "IINST":
+        # Monophasé : IINST → IINST1 (cohérence avec le triphasé)
+        return "IINST1", _to_number(value) if _is_numeric(value) else value
 
-        elif label == "HHPHC":
-            # Caractère A–Y → code ASCII
-            data[label] = ord(value[0]) if value else 0
+    if label == "IMAX":
+        # Monophasé : IMAX → IMAX1
+        return "IMAX1", _to_number(value) if _is_numeric(value) else value
 
-        elif label == "PTEC":
-            # Conservé en chaîne brute ; la conversion lisible est faite dans publisher.py
-            data[label] = value
+    if label == "ADCO":
+        # Identifiant compteur : ne pas convertir en numérique
+        return label, value
 
-        elif label == "DEMAIN":
-            # Normalisation de la couleur Tempo du lendemain
-            key = value[:4].upper()
-            data[label] = DEMAIN_MAP.get(key, value) if value.strip() != "----" else ""
+    if _is_numeric(value):
+        return label, _to_number(value)
 
-        elif label == "IINST":
-            # Monophasé : IINST → IINST1 (cohérence avec le triphasé)
-            data["IINST1"] = _to_number(value) if _is_numeric(value) else value
+    return label, value
 
-        elif label == "IMAX":
-            # Monophasé : IMAX → IMAX1
-            data["IMAX1"] = _to_number(value) if _is_numeric(value) else value
 
-        elif label == "ADCO":
-            # Identifiant compteur : ne pas convertir en numérique
-            data[label] = value
+def frame_item(label: str, value: str) -> tuple[str | None, str, int | float | str | None]:
+    """
+    Type une étiquette et choisit sa place dans une TicFrame. Retourne
+    (attribut, clé, valeur typée) ; attribut à None : la valeur va dans `extra`
+    (étiquette inconnue, ou valeur qui n'a pas le type attendu).
+    """
+    key, typed = structure_item(label, value)
+    field = FIELDS.get(key)
+    if field and (typed is None or isinstance(typed, field[1])):
+        return field[0], key, typed
+    return None, key, typed
 
-        elif _is_numeric(value):
-            data[label] = _to_number(value)
 
+def structure_payload(raw: dict[str, str], frame: TicFrame | None = None) -> TicFrame:
+    """
+    Prend le dict { LABEL: str } issu du parseur TIC et remplit `frame` (une
+    nouvelle TicFrame par défaut) avec les valeurs typées.
+    """
+    if frame is None:
+        frame = TicFrame()
+    for label, value in raw.items():
+        attr, key, typed = frame_item(label, value)
+        if attr:
+            setattr(frame, attr, typed)
         else:
-            data[label] = value
+            frame.extra[key] = typed
 
-    log.debug("Payload structuré : %d champs", len(data))
-    return data
+    log.debug("Payload structuré : %d champs", len(frame))
+    return frame
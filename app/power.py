@@ -0,0 +1,84 @@
+"""
+power.py — Puissance active instantanée (pinst) calculée depuis les index.
+
+Le compteur historique ne fournit que la puissance apparente (PAPP). La
+puissance active est déduite de la progression de l'index total (somme des
+six index Tempo) sur une fenêtre glissante d'échantillons horodatés :
+
+    pinst (W) = Δ index (Wh) × 3600 / Δ t (s)
+
+Utiliser la somme des index rend le calcul insensible aux changements de
+couleur Tempo et de période HC/HP (l'index actif change, pas le total). Une
+trame où il manque un index est ignorée, et un total qui recule (compteur
+remplacé ou remis à zéro) vide la fenêtre.
+"""
+
+import logging
+import threading
+from collections import deque
+
+from tic_frame import TicFrame
+
+log = logging.getLogger(__name__)
+
+# En dessous de cet écart entre premier et dernier échantillon, pas d'estimation
+_MIN_SPAN = 10.0
+
+
+class PowerEstimator:
+    """
+    Fenêtre glissante (horodatage, index total Wh). add() et value() peuvent
+    être appelés depuis deux threads différents.
+    """
+
+    def __init__(self, window: float, max_samples: int = 512):
+        self._window  = window
+        self._samples: deque[tuple[float, int]] = deque(maxlen=max_samples)
+        self._lock    = threading.Lock()
+
+    def add(self, now: float, frame: TicFrame) -> None:
+        """Ajoute un échantillon (horodatage monotone en secondes, trame typée)."""
+        total = frame.index_total()
+        if total is None:
+            return
+
+        with self._lock:
+            self._append(now, total)
+
+    def _append(self, now: float, total: int) -> None:
+        samples = self._samples
+        if samples:
+            last_total = samples[-1][1]
+            if total < last_total:
+                log.warning("Index total en recul (%d → %d Wh) — fenêtre pinst réinitialisée",
+                            last_total, total)
+                samples.clear()
+            elif total == last_total and len(samples) > 1 and samples[-2][1] == total:
+                # Plateau : seul le dernier point du plateau est utile
+                samples.pop()
+
+        samples.append((now, total))
+        limit = now - self._window
+        while len(samples) > 2 and samples[1][0] <= limit:
+            samples.popleft()
+
+    def size(self) -> int:
+        """Nombre d'échantillons dans la fenêtre."""
+        return len(self._samples)
+
+    def value(self) -> int | None:
+        """Puissance active moyenne sur la fenêtre, en W (None si trop peu de données)."""
+        with self._lock:
+            if len(self._samples) < 2:
+                return None
+            (t0, wh0), (t1, wh1) = self._samples[0], self._samples[-1]
+            start = t1 - self._window
+            if t0 < start:
+                # Le premier point précède la fenêtre (fin de plateau ou d'un long
+                # silence) : index interpolé au début de la fenêtre
+                tn, whn = self._samples[1]
+                wh0 = wh0 + (whn - wh0) * (start - t0) / (tn - t0)
+                t0  = start
+        if t1 - t0 < _MIN_SPAN:
+            return None
+        return round((wh1 - wh0) * 3600 / (t1 - t0))
@@ -0,0 +1,120 @@
+"""
+publish_policy.py — Règles de publication par topic (remplace le RBE strict).
+
+Pour chaque topic, la première règle dont le motif (fnmatch, sur le topic
+sans préfixe) correspond s'applique :
+  - deadband      : écart absolu en dessous duquel une valeur numérique n'est pas republiée
+  - rel_deadband  : idem en proportion de la dernière valeur publiée (0.05 = 5 %)
+  - min_interval  : délai minimal entre deux publications (la valeur est alors
+                    différée, pas perdue : voir MQTTClient.publish_due)
+  - max_silence   : heartbeat — publication de la dernière valeur reçue après
+                    ce délai sans publication (0 = jamais)
+  - digits        : arrondi des valeurs flottantes avant comparaison
+
+Une valeur identique à la dernière publiée n'est jamais republiée (hors heartbeat).
+
+Surcharge par variable d'environnement PUBLISH_POLICY, règles séparées par « ; » :
+    PUBLISH_POLICY="papp:deadband=100,min_interval=30;iinst*:deadband=2"
+"""
+
+import fnmatch
+import logging
+from typing import NamedTuple
+
+log = logging.getLogger(__name__)
+
+
+class Rule(NamedTuple):
+    pattern:      str
+    deadband:     float = 0.0
+    rel_deadband: float = 0.0
+    min_interval: float = 0.0
+    max_silence:  float = 3600.0
+    digits:       int | None = None
+
+
+DEFAULT_RULES: tuple[Rule, ...] = (
+    Rule("index*",   min_interval=60),   # index_wh, index_*kwh : changent à chaque trame sous charge
+    Rule("energy/*", min_interval=60),   # idem (energy.py)
+    Rule("cost/*",   min_interval=60),
+    Rule("papp*",    deadband=50),       # gigue de quelques dizaines de VA
+    Rule("pinst",    deadband=50),
+    Rule("iinst*",   deadband=1),        # oscillation 3 ↔ 4 A
+    Rule("*"),
+)
+
+# Motifs de décision
+PUBLISH, UNCHANGED, DEADBAND, DEFERRED = "publish", "unchanged", "deadband", "deferred"
+
+
+class PublishPolicy:
+
+    def __init__(self, rules: tuple[Rule, ...] = DEFAULT_RULES):
+        self._rules = rules
+        self._by_topic: dict[str, Rule] = {}
+        # motif de règle → { motif de décision → nombre de publications évitées }
+        self.suppressed: dict[str, dict[str, int]] = {
+            rule.pattern: {UNCHANGED: 0, DEADBAND: 0, DEFERRED: 0} for rule in rules
+        }
+
+    def rule(self, topic: str) -> Rule:
+        """Règle applicable à un topic (sans préfixe), mise en cache."""
+        rule = self._by_topic.get(topic)
+        if rule is None:
+            rule = next((r for r in self._rules if fnmatch.fnmatchcase(topic, r.pattern)),
+                        Rule("*"))
+            self._by_topic[topic] = rule
+        return rule
+
+    def decide(self, rule: Rule, value, str_value: str, last: str | None,
+               elapsed: float) -> str:
+        """
+        Décide du sort d'une valeur. `last` est la dernière valeur publiée
+        (None si jamais publiée), `elapsed` le temps écoulé depuis, en secondes.
+        """
+        if last is None:
+            return PUBLISH
+        if rule.max_silence and elapsed >= rule.max_silence:
+            return PUBLISH
+
+        verdict = PUBLISH
+        if str_value == last:
+            verdict = UNCHANGED
+        elif (rule.deadband or rule.rel_deadband) and isinstance(value, (int, float)):
+            try:
+                previous = float(last)
+            except ValueError:
+                previous = None
+            if previous is not None:
+                delta = abs(value - previous)
+                if delta <= rule.deadband or delta <= rule.rel_deadband * abs(previous):
+                    verdict = DEADBAND
+        if verdict == PUBLISH and elapsed < rule.min_interval:
+            verdict = DEFERRED
+
+        if verdict != PUBLISH:
+            self.suppressed[rule.pattern][verdict] += 1
+        return verdict
+
+    def stats(self) -> str:
+        return ", ".join(
+            f"{pattern}: " + "/".join(f"{n} {reason}" for reason, n in counts.items())
+            for pattern, counts in self.suppressed.items() if any(counts.values())
+        ) or "aucune publication évitée"
+
+
+def parse_rules(spec: str) -> tuple[Rule, ...]:
+    """Lit PUBLISH_POLICY ; les règles lues passent avant les règles par défaut."""
+    rules = []
+    for entry in filter(None, (e.strip() for e in spec.split(";"))):
+        pattern, _, params = entry.partition(":")
+        kwargs = {}
+        for param in filter(None, (p.strip() for p in params.split(","))):
+            key, _, raw = param.partition("=")
+            key = key.strip()
+            if key not in Rule._fields[1:]:
+                log.warning("PUBLISH_POLICY : paramètre inconnu %r ignoré", key)
+                continue
+            kwargs[key] = int(raw) if key == "digits" else float(raw)
+        rules.append(Rule(pattern.strip(), **kwargs))
+    return tuple(rules) + DEFAULT_RULES
@@ -3,108 +3,212 @@ publisher.py — Calcul et publication des topics MQTT depuis le payload structu
 
 Reproduit l'ensemble des nœuds de transformation (INDEX TOTAL, INDEX HC/HP,
 INDEX par couleur, IINST, PAPP, PMAX, PTEC, TEMPO) et leurs nœuds 'rbe' associés.
+
+Chaque topic est une entrée de la table TOPICS : ses champs d'entrée (attributs
+de la TicFrame) et sa fonction de calcul. Le Publisher ne recalcule et ne publie que les
+topics dont au moins une entrée a changé depuis la trame précédente.
+
+Les valeurs peuvent aussi être regroupées dans un message d'état unique
+(PREFIX/state, JSON ou clé=valeur) : un seul PUBLISH par trame.
 """
 
+import json
 import logging
+import sys
+
 from mqtt_client import MQTTClient
+from config import MQTT_PREFIX
 from payload import PTEC_MAP
+from tic_frame import INDEX_FIELDS, TicFrame
 
 log = logging.getLogger(__name__)
 
 
-def publish_all(client: MQTTClient, data: dict) -> None:
-    """
-    Calcule toutes les valeurs dérivées depuis le payload structuré
-    et les publie via le client MQTT (avec RBE intégré).
-    """
-
-    def get(key: str, default=0):
-        return data.get(key, default)
-
-    _publish_indices(client, data, get)
-    _publish_current(client, data)
-    _publish_power(client, data)
-    _publish_tariff(client, data)
-    _publish_tempo(client, data)
+# ── Fonctions de calcul ────────────────────────────────────────────────────────
+# Reçoivent les valeurs des champs d'entrée (None si absent) dans l'ordre de la
+# table ; retournent la valeur à publier, ou None pour ne rien publier.
 
+def _kwh(wh: int | float) -> float:
+    """Convertit des Wh en kWh, arrondi à 3 décimales."""
+    return round(wh / 1000, 3)
 
-# ── Indices de consommation ────────────────────────────────────────────────────
-
-def _publish_indices(client: MQTTClient, data: dict, get) -> None:
-    """Publie les index de consommation Tempo (par couleur et agrégés)."""
 
-    hcjb = get("BBRHCJB"); hpjb = get("BBRHPJB")
-    hcjw = get("BBRHCJW"); hpjw = get("BBRHPJW")
-    hcjr = get("BBRHCJR"); hpjr = get("BBRHPJR")
+def _total(*indices) -> int | None:
+    """Somme d'index ; None (rien à publier) si l'un d'eux est absent de la trame."""
+    if None in indices:
+        return None
+    return sum(indices)
 
-    index_wh = hcjb + hpjb + hcjw + hpjw + hcjr + hpjr
 
-    # ── Totaux ─────────────────────────────────────────────────────────────────
-    client.publish("index_wh",      index_wh)
-    client.publish("index_kwh",     _kwh(index_wh))
+def _total_kwh(*indices) -> float | None:
+    total = _total(*indices)
+    return None if total is None else _kwh(total)
 
-    # ── HP / HC global ─────────────────────────────────────────────────────────
-    client.publish("index_hp_kwh",  _kwh(hpjb + hpjw + hpjr))
-    client.publish("index_hc_kwh",  _kwh(hcjb + hcjw + hcjr))
 
-    # ── Par couleur Tempo ──────────────────────────────────────────────────────
-    client.publish("index_hpb_kwh", _kwh(hpjb))   # Heures Pleines Bleu
-    client.publish("index_hpw_kwh", _kwh(hpjw))   # Heures Pleines Blanc
-    client.publish("index_hpr_kwh", _kwh(hpjr))   # Heures Pleines Rouge
-    client.publish("index_hcb_kwh", _kwh(hcjb))   # Heures Creuses Bleu
-    client.publish("index_hcw_kwh", _kwh(hcjw))   # Heures Creuses Blanc
-    client.publish("index_hcr_kwh", _kwh(hcjr))   # Heures Creuses Rouge
+def _same(value):
+    return value
 
 
-# ── Courant instantané ─────────────────────────────────────────────────────────
+def _ptec_label(ptec):
+    """Libellé PTEC (ex : 'Heures Creuses') ; valeur brute si la période est inconnue."""
+    if ptec is None:
+        return None
+    return PTEC_MAP.get(ptec, (ptec, None))[0]
 
-def _publish_current(client: MQTTClient, data: dict) -> None:
-    """Publie IINST1 / IINST2 / IINST3 (mono ou triphasé)."""
-    for phase in (1, 2, 3):
-        key = f"IINST{phase}"
-        if key in data:
-            client.publish(f"iinst{phase}", data[key])
 
+def _tempo_color(ptec):
+    """Couleur du jour déduite de PTEC."""
+    return PTEC_MAP.get(ptec, (None, None))[1] if ptec is not None else None
 
-# ── Puissance ──────────────────────────────────────────────────────────────────
 
-def _publish_power(client: MQTTClient, data: dict) -> None:
-    """Publie PAPP (puissance apparente) et PMAX (puissance maximale)."""
-    if "PAPP" in data:
-        client.publish("papp", data["PAPP"])
-    if "PMAX" in data:
-        client.publish("pmax", data["PMAX"])
+def _next_color(demain):
+    """Couleur du lendemain (déjà normalisée par payload.py, brute si inconnue)."""
+    return demain
 
 
-# ── Période tarifaire ──────────────────────────────────────────────────────────
+# ── Table des topics ───────────────────────────────────────────────────────────
 
-def _publish_tariff(client: MQTTClient, data: dict) -> None:
-    """Publie le libellé PTEC (ex : 'Heures Creuses')."""
-    if "PTEC" not in data:
-        return
-    ptec_raw = data["PTEC"]
-    label, _ = PTEC_MAP.get(ptec_raw, (ptec_raw, None))
-    client.publish("ptec", label)
+# topic → (champs d'entrée, fonction de calcul)
+TOPICS: dict[str, tuple[tuple[str, ...], object]] = {
+    # Totaux
+    "index_wh":       (INDEX_FIELDS,                       _total),
+    "index_kwh":      (INDEX_FIELDS,                       _total_kwh),
+    # HP / HC global
+    "index_hp_kwh":   (("bbrhpjb", "bbrhpjw", "bbrhpjr"), _total_kwh),
+    "index_hc_kwh":   (("bbrhcjb", "bbrhcjw", "bbrhcjr"), _total_kwh),
+    # Par couleur Tempo
+    "index_hpb_kwh":  (("bbrhpjb",),                       _total_kwh),   # Heures Pleines Bleu
+    "index_hpw_kwh":  (("bbrhpjw",),                       _total_kwh),   # Heures Pleines Blanc
+    "index_hpr_kwh":  (("bbrhpjr",),                       _total_kwh),   # Heures Pleines Rouge
+    "index_hcb_kwh":  (("bbrhcjb",),                       _total_kwh),   # Heures Creuses Bleu
+    "index_hcw_kwh":  (("bbrhcjw",),                       _total_kwh),   # Heures Creuses Blanc
+    "index_hcr_kwh":  (("bbrhcjr",),                       _total_kwh),   # Heures Creuses Rouge
+    # Courant instantané (mono ou triphasé)
+    "iinst1":         (("iinst1",),                        _same),
+    "iinst2":         (("iinst2",),                        _same),
+    "iinst3":         (("iinst3",),                        _same),
+    # Puissance
+    "papp":           (("papp",),                          _same),
+    "pmax":           (("pmax",),                          _same),
+    # Période tarifaire et couleurs Tempo
+    "ptec":           (("ptec",),                          _ptec_label),
+    "tempo_day":      (("ptec",),                          _tempo_color),
+    "next_tempo_day": (("demain",),                        _next_color),
+}
 
 
-# ── Couleurs Tempo ─────────────────────────────────────────────────────────────
+# ── Publication complète ───────────────────────────────────────────────────────
 
-def _publish_tempo(client: MQTTClient, data: dict) -> None:
-    """Publie la couleur Tempo du jour courant et du lendemain."""
+def publish_all(client: MQTTClient, frame: TicFrame) -> None:
+    """
+    Calcule toutes les valeurs dérivées depuis la trame typée
+    et les publie via le client MQTT (avec RBE intégré).
+    """
+    for topic, (inputs, derive) in TOPICS.items():
+        value = derive(*(getattr(frame, attr) for attr in inputs))
+        if value is not None:
+            client.publish(topic, value)
 
-    # Couleur du jour déduite de PTEC
-    if "PTEC" in data:
-        _, color = PTEC_MAP.get(data["PTEC"], (None, None))
-        if color:
-            client.publish("tempo_day", color)
 
-    # Couleur du lendemain (déjà normalisée par payload.py)
-    if "DEMAIN" in data and data["DEMAIN"]:
-        client.publish("next_tempo_day", data["DEMAIN"])
+# ── Publication incrémentale ───────────────────────────────────────────────────
 
+class Publisher:
+    """
+    Publication pilotée par les dépendances de TOPICS : seuls les topics dont
+    un champ d'entrée a changé depuis la trame précédente sont recalculés.
 
-# ── Utilitaire ─────────────────────────────────────────────────────────────────
+    Tout est recalculé à la trame suivante si une publication a échoué ou
+    après une reconnexion au broker, pour ne jamais laisser de valeur retenue
+    périmée.
+    """
 
-def _kwh(wh: int | float) -> float:
-    """Convertit des Wh en kWh, arrondi à 3 décimales."""
-    return round(wh / 1000, 3)
+    def __init__(self, client: MQTTClient, prefix: str = MQTT_PREFIX,
+                 per_topic: bool = True):
+        self._client = client
+        self._per_topic = per_topic
+        self.values: dict = {}       # topic → dernière valeur calculée (message d'état)
+        # (topic, topic complet interné, champs d'entrée, fonction de calcul)
+        self._outputs = [
+            (topic, sys.intern(f"{prefix}/{topic}"), inputs, derive)
+            for topic, (inputs, derive) in TOPICS.items()
+        ]
+        # champ → indices des topics qui en dépendent
+        self._dependents: dict[str, tuple[int, ...]] = {}
+        for i, (_, _, inputs, _) in enumerate(self._outputs):
+            for attr in inputs:
+                self._dependents[attr] = self._dependents.get(attr, ()) + (i,)
+
+        self._inputs: dict = {}      # dernière valeur vue par champ d'entrée
+        self._last_data = None
+        self._full = True
+
+        client.add_on_connect(lambda _first: self.invalidate())
+
+    def invalidate(self) -> None:
+        """Force le recalcul de tous les topics à la prochaine trame."""
+        self._full = True
+
+    def publish(self, frame: TicFrame) -> int:
+        """Publie les topics impactés par la trame. Retourne le nombre de topics recalculés."""
+        if frame is self._last_data and not self._full:
+            return 0                     # trame identique (servie par le cache de lignes)
+
+        previous = self._inputs
+        if self._full:
+            todo = range(len(self._outputs))
+        else:
+            todo = set()
+            for attr, deps in self._dependents.items():
+                if getattr(frame, attr) != previous.get(attr):
+                    todo.update(deps)
+            todo = sorted(todo)
+
+        for attr in self._dependents:
+            previous[attr] = getattr(frame, attr)
+        self._last_data = frame
+        self._full = False
+
+        values   = self.values
+        failures = self._client.failures
+        for i in todo:
+            topic, full_topic, inputs, derive = self._outputs[i]
+            value = derive(*(getattr(frame, attr) for attr in inputs))
+            if value is None:
+                values.pop(topic, None)
+                continue
+            values[topic] = value
+            if self._per_topic:
+                self._client.publish(topic, value, full_topic=full_topic)
+
+        if self._client.failures != failures:
+            self._full = True
+        return len(todo)
+
+
+# ── Puissance active ───────────────────────────────────────────────────────────
+
+def publish_pinst(client: MQTTClient, pinst: int) -> None:
+    """Publie la puissance active calculée depuis les index (voir power.py)."""
+    client.publish("pinst", pinst)
+
+
+# ── Statistiques de fenêtre ────────────────────────────────────────────────────
+
+def publish_window(client: MQTTClient, stats: dict) -> None:
+    """Publie min / max / moyenne de PAPP et IINST sur l'intervalle écoulé."""
+    for topic, value in stats.items():
+        client.publish(topic, value)
+
+
+# ── Message d'état unique ──────────────────────────────────────────────────────
+
+def format_state(values: dict, fmt: str) -> str:
+    """Sérialise les valeurs en JSON compact ou en « clé=valeur » séparés par des espaces."""
+    if fmt == "kv":
+        return " ".join(f"{topic}={value}" for topic, value in values.items())
+    return json.dumps(values, separators=(",", ":"))
+
+
+def publish_state(client: MQTTClient, values: dict, fmt: str) -> None:
+    """Publie toutes les valeurs en un seul message sur PREFIX/state."""
+    client.publish("state", format_state(values, fmt))
@@ -0,0 +1,119 @@
+"""
+replay.py — Mesure hors ligne du pipeline du bridge, sans compteur ni broker.
+
+Alimente le pipeline de bridge.py, inchangé, avec une source simulée
+(capture rejouée ou trames synthétiques, voir fake_serial.py). Les
+publications vont dans un broker factice (stub_broker.py). Affiche le débit
+en trames/s et la latence de publication par trame (trame complète →
+publications faites).
+
+    python replay.py "synthetic://?speed=0&frames=20000"
+    python replay.py "replay:///data/capture-ttyUSB0.tic?speed=10" --interval 15
+    python replay.py "synthetic://?speed=0&phases=3&corrupt=0.01" --duration 30 --json out.json
+
+Par défaut, PUBLISH_INTERVAL vaut 0 (chaque trame est publiée), la
+persistance, le spool et l'auto-découverte sont désactivés.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].split("— ")[1])
+    parser.add_argument("source", help="URL replay://... ou synthetic://...")
+    parser.add_argument("--interval", type=float, default=0.0,
+                        help="PUBLISH_INTERVAL en secondes (défaut : 0)")
+    parser.add_argument("--duration", type=float, default=0.0,
+                        help="arrêt après N secondes (défaut : fin de la source)")
+    parser.add_argument("--json", metavar="FICHIER", help="écrit aussi le résultat en JSON")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    # Avant l'import de config : pas d'état persistant ni de réseau
+    os.environ["PUBLISH_INTERVAL"] = str(args.interval)
+    for name, value in (("RBE_PERSIST", "false"), ("SPOOL", "false"), ("HA_DISCOVERY", "false"),
+                        ("DIAG_TOPIC", ""), ("CAPTURE_DIR", ""), ("HISTORY_DIR", ""), ("ENERGY", "false"),
+                        ("METRICS_PORT", "0")):
+        os.environ[name] = value
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s [%(levelname)s] %(name)s — %(message)s")
+
+    import serial
+    import bridge
+    import config
+    import metrics
+    from mqtt_client import MQTTClient
+    from stub_broker import StubBroker
+
+    broker = StubBroker(keep=False)
+    mqtt   = MQTTClient(client=broker)
+    mqtt.connect()
+    pipeline = bridge._Pipeline(mqtt.for_prefix(config.MQTT_PREFIX), args.source)
+
+    try:
+        ser = bridge._open_serial(args.source, timeout=0)
+    except serial.SerialException as exc:
+        print(f"Source inutilisable : {exc}", file=sys.stderr)
+        return 1
+
+    latencies: list[float] = []
+    start = time.perf_counter()
+    stop  = start + args.duration if args.duration else float("inf")
+    while time.perf_counter() < stop:
+        try:
+            waiting = ser.in_waiting
+        except serial.SerialException:
+            break                               # fin de la source
+        if not waiting:
+            time.sleep(0.001)
+            continue
+        # Même traitement que _Pipeline.feed, chronométré trame par trame
+        chunk = ser.read(waiting)
+        pipeline.received(chunk)
+        for raw in pipeline.framer.feed(chunk):
+            t0 = time.perf_counter()
+            frame = pipeline.ingest(raw)
+            if frame and pipeline.publish(frame):
+                latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    frames = {stage: metrics.FRAMES.labels(args.source, stage).value
+              for stage in ("framed", "decoded", "rate_limited", "published")}
+    latencies.sort()
+    result = {
+        "source":          args.source,
+        "elapsed_s":       round(elapsed, 3),
+        "frames":          frames,
+        "frames_per_s":    round(frames["framed"] / elapsed, 1) if elapsed else None,
+        "publications":    broker.count,
+        "publish_latency_ms": {
+            "p50": _percentile(latencies, 0.50),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+            "max": _percentile(latencies, 1.0),
+        },
+        "checksum_errors": sum(value for _, _, value in metrics.CHECKSUM_ERRORS.samples()),
+        "line_cache":      pipeline.cache.stats(),
+    }
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+def _percentile(values: list[float], q: float) -> float | None:
+    """Percentile (valeurs triées, en secondes) converti en ms."""
+    if not values:
+        return None
+    return round(values[min(int(q * len(values)), len(values) - 1)] * 1000, 3)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
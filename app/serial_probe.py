@@ -0,0 +1,202 @@
+"""
+serial_probe.py — Détection des paramètres série et du mode TIC d'un port.
+
+Des paramètres série erronés (SERIAL_BAUD, SERIAL_BITS, SERIAL_PARITY) ne
+se voient que par des checksums invalides. Avec SERIAL_PROBE=true, chaque
+port est écouté quelques secondes avec chacun des réglages candidats ; le
+score d'un candidat est la proportion de lignes complètes dont la checksum
+est valide. Le meilleur est retenu, journalisé et mémorisé dans
+STATE_DIR/serial-probe.json : les démarrages suivants ouvrent le port
+directement (supprimer le fichier pour relancer la détection).
+
+Candidats : 1200 7E1 (historique), 9600 7E1 (standard), et les mêmes en
+8N1, pour les adaptateurs USB qui ne gèrent pas 7E1 : le bit de parité
+arrive alors en 8e bit de chaque octet et doit être masqué.
+"""
+
+import logging
+import os
+import time
+from typing import NamedTuple, Optional
+
+import serial
+
+from state_file import StateFile
+from tic_parser import HISTORIQUE, STANDARD, is_valid_line
+
+log = logging.getLogger(__name__)
+
+
+class Settings(NamedTuple):
+    baudrate: int
+    bytesize: int
+    parity:   str              # "E", "N" ou "O"
+    stopbits: int
+    mask:     bool             # 8e bit (parité) à masquer à la lecture
+    mode:     str              # mode TIC attendu à ce débit
+
+
+# nom → réglages, dans l'ordre de préférence à score égal
+CANDIDATES: dict[str, Settings] = {
+    "1200 7E1": Settings(1200, 7, "E", 1, False, HISTORIQUE),
+    "9600 7E1": Settings(9600, 7, "E", 1, False, STANDARD),
+    "1200 8N1": Settings(1200, 8, "N", 1, True,  HISTORIQUE),
+    "9600 8N1": Settings(9600, 8, "N", 1, True,  STANDARD),
+}
+
+# Un candidat est retenu sans tester les suivants à partir de ce score…
+_LOCK_SCORE = 0.9
+# … sur au moins ce nombre de lignes complètes
+_LOCK_LINES = 8
+# En dessous, aucun candidat n'est retenu
+_MIN_SCORE = 0.5
+_MIN_LINES = 3
+
+_CACHE_FILE = "serial-probe.json"
+
+# Table de masquage du 8e bit (lecture 8N1 d'un signal 7E1)
+STRIP_PARITY = bytes(b & 0x7F for b in range(256))
+
+
+class MaskedSerial:
+    """Port série dont les octets lus sont ramenés sur 7 bits."""
+
+    def __init__(self, ser: serial.SerialBase):
+        self._ser = ser
+
+    def read(self, size: int = 1) -> bytes:
+        return self._ser.read(size).translate(STRIP_PARITY)
+
+    def __getattr__(self, name):
+        return getattr(self._ser, name)
+
+
+# ── Sondage ────────────────────────────────────────────────────────────────────
+
+def score(data: bytes, mode: str) -> tuple[int, int]:
+    """(lignes valides, lignes complètes) d'un échantillon du flux."""
+    valid = total = 0
+    # Le premier segment est une fin de ligne prise en cours de route
+    for segment in data.split(b"\n")[1:]:
+        ok, complete = _score_line(segment, mode)
+        valid += ok
+        total += complete
+    return valid, total
+
+
+def _score_line(segment: bytes, mode: str) -> tuple[int, int]:
+    """(ligne valide, ligne complète) pour le segment qui suit un LF."""
+    end = segment.find(b"\r")
+    if end < 0:
+        return 0, 0                         # ligne incomplète (fin d'échantillon)
+    return int(is_valid_line(segment[:end], mode)), 1
+
+
+def _sample(ser: serial.SerialBase, settings: Settings, duration: float) -> tuple[int, int]:
+    """
+    Lit le port jusqu'à `duration` s, ou dès qu'il est manifestement bon.
+    Même résultat que score() sur tout l'échantillon, mais chaque octet n'est
+    examiné qu'une fois : seules les lignes complétées par la lecture sont évaluées.
+    """
+    pending = bytearray()           # ligne en cours, depuis son LF (inclus)
+    started = False                 # premier LF vu
+    searched = 1                    # octets de `pending` où aucun CR n'a été trouvé
+    last: tuple[int, int] | None = None   # score de la ligne en cours, dès son CR
+    valid = total = 0               # lignes terminées par le LF suivant
+    ok = complete = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        chunk = ser.read(ser.in_waiting or 1)
+        if not chunk:
+            continue
+        pending += chunk.translate(STRIP_PARITY) if settings.mask else chunk
+        if not started:
+            lf = pending.find(b"\n")
+            if lf < 0:
+                pending.clear()
+                continue
+            del pending[:lf]
+            started = True
+
+        lf = pending.find(b"\n", 1)
+        while lf >= 0:
+            line_ok, line_complete = last or _score_line(bytes(pending[1:lf]), settings.mode)
+            valid += line_ok
+            total += line_complete
+            del pending[:lf]
+            searched, last = 1, None
+            lf = pending.find(b"\n", 1)
+
+        # La ligne en cours compte dès son CR, comme dans score()
+        if last is None:
+            cr = pending.find(b"\r", searched)
+            if cr >= 0:
+                last = _score_line(bytes(pending[1:cr + 1]), settings.mode)
+            else:
+                searched = len(pending)
+        ok, complete = last or (0, 0)
+        if total + complete >= _LOCK_LINES and (valid + ok) / (total + complete) >= _LOCK_SCORE:
+            break
+    return valid + ok, total + complete
+
+
+def probe(port: str, open_port, duration: float, mode: str = "auto") -> Optional[str]:
+    """
+    Nom du meilleur candidat pour `port`, ou None si aucun ne convient.
+    open_port(settings, timeout) ouvre le port avec ces réglages. `mode` limite
+    les candidats au mode TIC configuré (historique / standard).
+    """
+    results: dict[str, float] = {}
+    for name, settings in CANDIDATES.items():
+        if mode in (HISTORIQUE, STANDARD) and settings.mode != mode:
+            continue
+        try:
+            ser = open_port(settings, 0.2)
+        except serial.SerialException as exc:
+            # ex : adaptateur qui refuse 7 bits ; port absent : tous échouent
+            log.warning("Détection %s : ouverture impossible en %s : %s", port, name, exc)
+            continue
+        try:
+            valid, total = _sample(ser, settings, duration)
+        except serial.SerialException as exc:
+            log.error("Détection %s : erreur de lecture en %s : %s", port, name, exc)
+            return None
+        finally:
+            ser.close()
+        results[name] = valid / total if total >= _MIN_LINES else 0.0
+        log.info("Détection %s : %s %s — %d/%d lignes valides", port, name,
+                 settings.mode, valid, total)
+        if total >= _LOCK_LINES and results[name] >= _LOCK_SCORE:
+            break
+
+    best = max(results, key=results.get, default=None)
+    if best is None or results[best] < _MIN_SCORE:
+        log.warning("Détection %s : aucun réglage ne donne de trame valide (%s)", port,
+                    ", ".join(f"{name}={value:.0%}" for name, value in results.items()))
+        return None
+    log.info("Détection %s : %s retenu (%s, %.0f %% de lignes valides)",
+             port, best, CANDIDATES[best].mode, results[best] * 100)
+    return best
+
+
+# ── Cache ──────────────────────────────────────────────────────────────────────
+
+class ProbeCache:
+    """Réglages retenus par port, conservés entre deux démarrages."""
+
+    def __init__(self, directory: str):
+        self._store = None
+        if os.path.isdir(directory):
+            self._store = StateFile(os.path.join(directory, _CACHE_FILE), min_interval=0)
+        else:
+            log.warning("Détection série non mémorisée : dossier %s absent", directory)
+        self._ports: dict[str, str] = self._store.load() if self._store else {}
+
+    def get(self, port: str) -> Optional[str]:
+        name = self._ports.get(port)
+        return name if name in CANDIDATES else None
+
+    def put(self, port: str, name: str) -> None:
+        self._ports[port] = name
+        if self._store:
+            self._store.save(self._ports)
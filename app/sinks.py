@@ -0,0 +1,308 @@
+"""
+sinks.py — Sorties supplémentaires, en plus de MQTT, alimentées sans bloquer.
+
+Les mêmes lectures peuvent être envoyées à d'autres consommateurs que le
+broker, sans second lecteur sur le port série :
+
+    SINKS=udp://127.0.0.1:8094?format=line,unix:///run/linky.sock,file:///data/out/linky.csv
+
+  - udp://hôte:port      un datagramme par lecture (collecteur local Telegraf...)
+  - unix:///chemin       socket Unix en flux, une ligne par lecture
+  - file:///chemin.ext   fichier tournant chaque jour (chemin-AAAA-MM-JJ.ext),
+                         NDJSON, ou CSV si l'extension est .csv
+
+Paramètres :
+  - data    topics (défaut) : valeurs calculées, à chaque publication
+            raw : étiquettes TIC décodées, à chaque trame
+  - format  line (line protocol InfluxDB, défaut pour udp) ou json
+            (défaut pour unix) ; fichier : d'après l'extension
+  - queue   taille de la file de la sortie (défaut 100)
+  - keep    fichiers : nombre de jours conservés (défaut 7, 0 = tous)
+
+Chaque sortie a sa file bornée et son thread : le pipeline ne fait qu'y
+déposer la lecture (la plus ancienne est écartée si la file est pleine). Une
+sortie lente ou injoignable ne retarde ni les autres, ni la lecture série,
+ni MQTT. Lectures écrites, écartées et en échec et latence (dépôt →
+écriture) par sortie : voir metrics.py.
+"""
+
+import abc
+import datetime
+import glob
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# Après un échec de connexion (unix://), délai avant le nouvel essai
+_RETRY_DELAY = 5.0
+
+_STOP = object()
+
+_sinks: list["Sink"] = []
+metrics.Callback("linky_sink_queue_depth", "Lectures en attente, par sortie", "gauge",
+                 lambda: {(sink.name,): sink.depth() for sink in _sinks}, ("sink",))
+
+
+# ── Formats ────────────────────────────────────────────────────────────────────
+
+def _json(ts: float, prefix: str, values: dict) -> str:
+    return json.dumps({"ts": round(ts, 3), "prefix": prefix, **values},
+                      separators=(",", ":"), ensure_ascii=False)
+
+
+def _escape_key(key: str) -> str:
+    return key.replace(",", r"\,").replace("=", r"\=").replace(" ", r"\ ")
+
+
+def _field(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        return repr(value)
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def _line(ts: float, prefix: str, values: dict) -> str:
+    """Line protocol : linky,prefix=edf papp=750i,ptec="HPJB" <ns>."""
+    fields = ",".join(f"{_escape_key(key)}={_field(value)}" for key, value in values.items())
+    return f"linky,prefix={_escape_key(prefix)} {fields} {int(ts * 1e9)}"
+
+
+FORMATS = {"json": _json, "line": _line}
+
+
+# ── Sortie générique ───────────────────────────────────────────────────────────
+
+class Sink(abc.ABC):
+    """File bornée et thread d'écriture ; write() est fourni par les sous-classes."""
+
+    default_format = "json"
+
+    def __init__(self, url: str, params: dict[str, str]):
+        self.url  = url
+        self.raw  = params.get("data", "topics") == "raw"
+        self._format = FORMATS.get(params.get("format", self.default_format), _json)
+        self._queue: queue.Queue = queue.Queue(int(params.get("queue", 100)))
+        self._failing = False
+        self._thread  = threading.Thread(target=self._run, name=f"sink {url}", daemon=True)
+
+        self.name = urlsplit(url)._replace(query="").geturl()
+        self._written = metrics.SINK_RECORDS.labels(self.name, "written")
+        self._dropped = metrics.SINK_RECORDS.labels(self.name, "dropped")
+        self._failed  = metrics.SINK_RECORDS.labels(self.name, "failed")
+        self._latency = metrics.SINK_SECONDS.labels(self.name)
+
+    def start(self) -> None:
+        self._thread.start()
+        log.info("Sortie %s démarrée (%s)", self.url, "étiquettes TIC" if self.raw else "topics")
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def offer(self, ts: float, prefix: str, item) -> None:
+        """
+        Dépose une lecture (TicFrame si data=raw, dict de valeurs sinon) ; ne
+        bloque jamais. Si la file est pleine, la plus ancienne est écartée.
+        """
+        record = (time.monotonic(), ts, prefix, item)
+        while True:
+            try:
+                self._queue.put_nowait(record)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self._dropped.inc()
+                except queue.Empty:
+                    pass
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Écrit ce qui reste en file (au plus `timeout` s) puis ferme la sortie."""
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self.close()
+
+    def _run(self) -> None:
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                return
+            queued, ts, prefix, item = record
+            values = dict(item.items()) if self.raw else item
+            if not values:
+                continue
+            try:
+                self.write(ts, prefix, values)
+            except Exception as exc:
+                # Erreur réseau ou disque, mais aussi valeur impossible à
+                # formater : le thread de la sortie doit survivre à tout.
+                self._failed.inc()
+                if not self._failing:
+                    if isinstance(exc, OSError):
+                        log.error("Sortie %s en échec : %s", self.url, exc)
+                    else:
+                        log.exception("Sortie %s en échec", self.url)
+                    self._failing = True
+                continue
+            if self._failing:
+                log.info("Sortie %s rétablie", self.url)
+                self._failing = False
+            self._written.inc()
+            self._latency.observe(time.monotonic() - queued)
+
+    @abc.abstractmethod
+    def write(self, ts: float, prefix: str, values: dict) -> None:
+        """Écrit une lecture ; lève OSError si la destination est injoignable."""
+
+    def close(self) -> None:
+        pass
+
+
+# ── Sorties ────────────────────────────────────────────────────────────────────
+
+class UdpSink(Sink):
+
+    default_format = "line"
+
+    def __init__(self, url: str, params: dict[str, str]):
+        super().__init__(url, params)
+        parts = urlsplit(url)
+        self._address = (parts.hostname, parts.port or 8094)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def write(self, ts: float, prefix: str, values: dict) -> None:
+        self._sock.sendto(self._format(ts, prefix, values).encode(), self._address)
+
+    def close(self) -> None:
+        self._sock.close()
+
+
+class UnixSink(Sink):
+    """Socket Unix en flux ; reconnexion au plus toutes les _RETRY_DELAY s."""
+
+    def __init__(self, url: str, params: dict[str, str]):
+        super().__init__(url, params)
+        parts = urlsplit(url)
+        self._path = parts.netloc + parts.path
+        self._sock: Optional[socket.socket] = None
+        self._retry_at = 0.0
+
+    def write(self, ts: float, prefix: str, values: dict) -> None:
+        if self._sock is None:
+            if time.monotonic() < self._retry_at:
+                raise OSError(f"{self._path} non connecté")
+            self._retry_at = time.monotonic() + _RETRY_DELAY
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self._path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+        try:
+            self._sock.sendall((self._format(ts, prefix, values) + "\n").encode())
+        except OSError:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+
+class FileSink(Sink):
+    """Fichier NDJSON ou CSV (ts, prefix, clé, valeur), un par jour."""
+
+    def __init__(self, url: str, params: dict[str, str]):
+        super().__init__(url, params)
+        parts = urlsplit(url)
+        self._base, self._ext = os.path.splitext(parts.netloc + parts.path)
+        self._csv  = self._ext.lower() == ".csv"
+        self._keep = int(params.get("keep", 7))
+        self._day  = ""
+        self._file = None
+        os.makedirs(os.path.dirname(self._base) or ".", exist_ok=True)
+
+    def write(self, ts: float, prefix: str, values: dict) -> None:
+        day = datetime.date.fromtimestamp(ts).isoformat()
+        if day != self._day:
+            self._rotate(day)
+        if self._csv:
+            stamp = round(ts, 3)
+            text = "".join(f"{stamp},{prefix},{key},{_csv_value(value)}\n"
+                           for key, value in values.items())
+        else:
+            text = _json(ts, prefix, values) + "\n"
+        self._file.write(text)
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _rotate(self, day: str) -> None:
+        self.close()
+        path = f"{self._base}-{day}{self._ext}"
+        new  = not os.path.exists(path)
+        self._file = open(path, "a", encoding="utf-8")
+        self._day  = day
+        if new and self._csv:
+            self._file.write("ts,prefix,key,value\n")
+        if self._keep:
+            old = sorted(glob.glob(f"{glob.escape(self._base)}-????-??-??{self._ext}"))
+            for name in old[:-self._keep]:
+                try:
+                    os.unlink(name)
+                except OSError:
+                    pass
+
+
+def _csv_value(value) -> str:
+    text = str(value)
+    if any(c in text for c in ',"\n'):
+        text = '"' + text.replace('"', '""') + '"'
+    return text
+
+
+SCHEMES = {"udp": UdpSink, "unix": UnixSink, "file": FileSink}
+
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+
+def open_sinks(spec: str) -> list[Sink]:
+    """Crée et démarre les sorties de SINKS (URL séparées par des virgules)."""
+    sinks = []
+    for url in filter(None, (u.strip() for u in spec.split(","))):
+        parts  = urlsplit(url)
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        kind   = SCHEMES.get(parts.scheme)
+        if kind is None:
+            log.error("Sortie %s ignorée : schéma inconnu (udp, unix, file)", url)
+            continue
+        try:
+            sink = kind(url, params)
+        except (OSError, ValueError) as exc:
+            log.error("Sortie %s ignorée : %s", url, exc)
+            continue
+        sink.start()
+        sinks.append(sink)
+    _sinks.extend(sinks)
+    return sinks
@@ -0,0 +1,174 @@
+"""
+spool.py — Stockage des lectures non publiées pendant une coupure du broker.
+
+Chaque publication en échec est ajoutée, horodatée, au segment courant
+(fichier append-only, une ligne JSON par lecture). Les segments sont bornés
+en taille totale et en âge : les plus anciens sont supprimés en premier.
+
+À la reconnexion, replay() rejoue les lectures, du plus ancien au plus récent,
+par lots à débit limité. Un segment n'est supprimé qu'une fois entièrement
+rejoué ; si le rejeu échoue, il est réécrit avec ses seules lectures
+restantes. Après un arrêt brutal en cours de rejeu, certaines lectures peuvent
+être rejouées deux fois (livraison « au moins une fois », horodatage inclus).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+_SUFFIX = ".spool"
+
+
+class Spool:
+
+    def __init__(self, directory: str, max_bytes: int, max_age: float,
+                 segment_bytes: int = 256 * 1024):
+        self._dir       = directory
+        self._max_bytes = max_bytes
+        self._max_age   = max_age
+        self._seg_bytes = segment_bytes
+        self._lock      = threading.Lock()
+        self._file      = None          # segment courant, ouvert en ajout
+        self._current   = ""
+
+        os.makedirs(directory, exist_ok=True)
+        # nom de segment → taille en octets, dans l'ordre chronologique
+        self._segments: dict[str, int] = {
+            name: os.path.getsize(os.path.join(directory, name))
+            for name in sorted(os.listdir(directory)) if name.endswith(_SUFFIX)
+        }
+        if self._segments:
+            log.info("Spool : %d lectures en attente dans %d segment(s)",
+                     self.count(), len(self._segments))
+
+    # ── Écriture ───────────────────────────────────────────────────────────────
+
+    def append(self, prefix: str, topic: str, value: str) -> None:
+        """Ajoute une lecture non publiée (horodatée maintenant)."""
+        line = json.dumps({"t": round(time.time(), 3), "p": prefix, "k": topic, "v": value},
+                          separators=(",", ":")) + "\n"
+        data = line.encode()
+        with self._lock:
+            try:
+                if self._file is None or self._segments[self._current] >= self._seg_bytes:
+                    self._rotate()
+                self._file.write(data)
+                self._file.flush()
+                self._segments[self._current] += len(data)
+                self._evict()
+            except OSError as exc:
+                log.error("Spool : écriture impossible : %s", exc)
+
+    def pending(self) -> bool:
+        return bool(self._segments)
+
+    def count(self) -> int:
+        """Nombre de lectures en attente (lit les segments : hors chemin critique)."""
+        total = 0
+        for name in list(self._segments):
+            try:
+                with open(os.path.join(self._dir, name), "rb") as f:
+                    total += sum(1 for _ in f)
+            except OSError:
+                pass
+        return total
+
+    # ── Rejeu ──────────────────────────────────────────────────────────────────
+
+    def replay(self, publish, batch: int, pause: float) -> int:
+        """
+        Rejoue les lectures via publish(prefix, topic, value, ts) -> bool, par
+        lots de `batch` séparés de `pause` secondes. S'arrête au premier échec
+        (le reste est conservé). Retourne le nombre de lectures rejouées.
+        """
+        with self._lock:
+            self._close_current()
+            names = list(self._segments)
+
+        sent = 0
+        limit = time.time() - self._max_age
+        for name in names:
+            path = os.path.join(self._dir, name)
+            try:
+                with open(path, "rb") as f:
+                    lines = f.readlines()
+            except OSError as exc:
+                log.error("Spool : lecture de %s impossible : %s", name, exc)
+                continue
+
+            for i, line in enumerate(lines):
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue                    # ligne tronquée (arrêt brutal)
+                if rec["t"] < limit:
+                    continue
+                if not publish(rec["p"], rec["k"], rec["v"], rec["t"]):
+                    with self._lock:
+                        self._keep(name, lines[i:])
+                    return sent
+                sent += 1
+                if sent % batch == 0:
+                    time.sleep(pause)
+
+            with self._lock:
+                self._remove(name)
+
+        return sent
+
+    # ── Interne (appelé sous verrou) ───────────────────────────────────────────
+
+    def _rotate(self) -> None:
+        self._close_current()
+        self._current = f"{time.time_ns():020d}{_SUFFIX}"
+        self._file = open(os.path.join(self._dir, self._current), "ab")
+        self._segments[self._current] = 0
+
+    def _close_current(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _evict(self) -> None:
+        """Supprime les segments les plus anciens au-delà de la taille ou de l'âge max."""
+        limit = time.time() - self._max_age
+        while len(self._segments) > 1:
+            oldest = next(iter(self._segments))
+            path = os.path.join(self._dir, oldest)
+            too_big = sum(self._segments.values()) > self._max_bytes
+            try:
+                too_old = os.path.getmtime(path) < limit
+            except OSError:
+                too_old = True
+            if not (too_big or too_old):
+                break
+            log.warning("Spool : segment %s supprimé (%s)", oldest,
+                        "taille max atteinte" if too_big else "trop ancien")
+            self._remove(oldest)
+
+    def _keep(self, name: str, lines: list[bytes]) -> None:
+        """Réécrit un segment en partie rejoué avec ses seules lectures restantes."""
+        if name not in self._segments:
+            return                              # évincé pendant le rejeu
+        path = os.path.join(self._dir, name)
+        data = b"".join(lines)
+        try:
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            self._segments[name] = len(data)
+        except OSError as exc:
+            log.error("Spool : réécriture de %s impossible : %s", name, exc)
+
+    def _remove(self, name: str) -> None:
+        self._segments.pop(name, None)
+        if name == self._current:
+            self._close_current()
+        try:
+            os.unlink(os.path.join(self._dir, name))
+        except OSError:
+            pass
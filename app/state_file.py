@@ -0,0 +1,70 @@
+"""
+state_file.py — Petit fichier d'état JSON persistant entre deux redémarrages.
+
+Les écritures sont :
+  - atomiques : fichier temporaire dans le même dossier puis os.replace,
+    un arrêt brutal laisse soit l'ancien état, soit le nouveau
+  - regroupées : au plus une écriture toutes les `min_interval` secondes,
+    les modifications intermédiaires sont écrites au flush() suivant
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+
+log = logging.getLogger(__name__)
+
+
+class StateFile:
+
+    def __init__(self, path: str, min_interval: float = 60.0):
+        self.path = path
+        self._min_interval = min_interval
+        self._last_write = 0.0
+        self._pending = None
+
+    def load(self) -> dict:
+        """Retourne l'état enregistré, ou un dict vide si absent ou illisible."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as exc:
+            log.warning("État illisible (%s) : %s — ignoré", self.path, exc)
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def save(self, state: dict) -> None:
+        """
+        Enregistre `state`, immédiatement si la dernière écriture est assez
+        ancienne, sinon au prochain save() ou flush(). `state` peut être un
+        objet vivant : c'est son contenu au moment de l'écriture qui compte.
+        """
+        self._pending = state
+        if time.monotonic() - self._last_write >= self._min_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Écrit l'état en attente, s'il y en a un."""
+        if self._pending is None:
+            return
+        state, self._pending = self._pending, None
+        self._last_write = time.monotonic()
+
+        directory = os.path.dirname(self.path) or "."
+        try:
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".state-")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(state, f, separators=(",", ":"))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError as exc:
+            log.error("Écriture de l'état impossible (%s) : %s", self.path, exc)
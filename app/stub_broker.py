@@ -0,0 +1,106 @@
+"""
+stub_broker.py — Broker MQTT factice, dans le processus, pour les mesures hors ligne.
+
+Remplace le client paho de MQTTClient (MQTTClient(client=StubBroker())) :
+la connexion réussit immédiatement (loop_start) et chaque PUBLISH est
+enregistré avec son instant d'arrivée, sans réseau. Comme avec paho, un
+PUBLISH avant la connexion ou après disconnect() échoue (MQTT_ERR_NO_CONN). Les messages reçus peuvent être simulés avec
+deliver().
+"""
+
+import fnmatch
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+
+class _Result:
+    __slots__ = ("rc", "mid")
+
+    def __init__(self, rc: int, mid: int):
+        self.rc, self.mid = rc, mid
+
+
+class _Message:
+    __slots__ = ("topic", "payload")
+
+    def __init__(self, topic: str, payload: bytes):
+        self.topic, self.payload = topic, payload
+
+
+class StubBroker:
+
+    def __init__(self, keep: bool = True):
+        """`keep=False` : ne garde que les compteurs (rejeux longs)."""
+        self.keep = keep
+        self.publications: list[tuple[float, str, bytes, bool]] = []   # (monotonic, topic, payload, retain)
+        self.count  = 0
+        self.retained: dict[str, bytes] = {}
+        self._lock  = threading.Lock()
+        self._callbacks: dict[str, object] = {}
+        self._aliases: dict[int, str] = {}
+        self.connected = False
+        self.on_connect = self.on_disconnect = self.on_connect_fail = None
+
+    # ── Interface paho utilisée par MQTTClient ─────────────────────────────────
+
+    def username_pw_set(self, username, password=None) -> None:
+        pass
+
+    def will_set(self, topic, payload=None, qos=0, retain=False, properties=None) -> None:
+        pass
+
+    def reconnect_delay_set(self, min_delay=1, max_delay=120) -> None:
+        pass
+
+    def connect_async(self, host, port=1883, keepalive=60, **kwargs) -> None:
+        pass
+
+    def loop_start(self) -> None:
+        self.connected = True
+        if self.on_connect:
+            self.on_connect(self, None, {}, 0, None)
+
+    def loop_stop(self) -> None:
+        pass
+
+    def disconnect(self, *args, **kwargs) -> None:
+        self.connected = False
+        if self.on_disconnect:
+            self.on_disconnect(self, None, 0, None)
+
+    def subscribe(self, topic, qos=0, **kwargs):
+        return (mqtt.MQTT_ERR_SUCCESS, 0)
+
+    def message_callback_add(self, sub: str, callback) -> None:
+        self._callbacks[sub] = callback
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None) -> _Result:
+        if not self.connected:
+            return _Result(mqtt.MQTT_ERR_NO_CONN, 0)
+        now = time.monotonic()
+        alias = getattr(properties, "TopicAlias", None)
+        if alias is not None:
+            if topic:
+                self._aliases[alias] = topic
+            else:
+                topic = self._aliases[alias]
+        if isinstance(payload, str):
+            payload = payload.encode()
+        with self._lock:
+            self.count += 1
+            if self.keep:
+                self.publications.append((now, topic, payload, retain))
+            if retain:
+                self.retained[topic] = payload
+        return _Result(mqtt.MQTT_ERR_SUCCESS, self.count)
+
+    # ── Simulation ─────────────────────────────────────────────────────────────
+
+    def deliver(self, topic: str, payload: bytes) -> None:
+        """Simule un message reçu du broker sur `topic`."""
+        message = _Message(topic, payload)
+        for sub, callback in self._callbacks.items():
+            if fnmatch.fnmatchcase(topic, sub.replace("+", "*").replace("#", "*")):
+                callback(self, None, message)
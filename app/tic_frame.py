@@ -0,0 +1,107 @@
+"""
+tic_frame.py — Trame TIC décodée et typée.
+
+Une TicFrame remplace le dict { étiquette: valeur } qui circulait entre le
+parseur, payload.py et publisher.py :
+  - les étiquettes connues ont un attribut dédié (__slots__), déjà typé :
+    index en int, PTEC et DEMAIN en énumérations (ou chaîne brute si la
+    valeur est inconnue, pour qu'elle soit tout de même publiée)
+  - un attribut à None signifie « étiquette absente de la trame » : un index
+    manquant n'est plus confondu avec un index à 0
+  - les autres étiquettes vont dans le dict `extra` (non typées au-delà de
+    la conversion numérique de payload.py)
+"""
+
+from enum import StrEnum
+
+
+class Ptec(StrEnum):
+    """Période tarifaire en cours (valeur brute de PTEC)."""
+    TH   = "TH.."
+    HC   = "HC.."
+    HP   = "HP.."
+    HN   = "HN.."
+    PM   = "PM.."
+    HCJB = "HCJB"
+    HCJW = "HCJW"
+    HCJR = "HCJR"
+    HPJB = "HPJB"
+    HPJW = "HPJW"
+    HPJR = "HPJR"
+
+
+class Tempo(StrEnum):
+    """Couleur d'un jour Tempo, telle que publiée."""
+    BLUE  = "BLUE"
+    WHITE = "WHITE"
+    RED   = "RED"
+
+
+# étiquette TIC → (attribut, type attendu)
+FIELDS: dict[str, tuple[str, type]] = {
+    "ADCO":    ("adco",    str),
+    "OPTARIF": ("optarif", int),
+    "ISOUSC":  ("isousc",  int),
+    "BBRHCJB": ("bbrhcjb", int),
+    "BBRHPJB": ("bbrhpjb", int),
+    "BBRHCJW": ("bbrhcjw", int),
+    "BBRHPJW": ("bbrhpjw", int),
+    "BBRHCJR": ("bbrhcjr", int),
+    "BBRHPJR": ("bbrhpjr", int),
+    "PTEC":    ("ptec",    str),     # Ptec, ou valeur brute hors énumération
+    "DEMAIN":  ("demain",  str),     # Tempo, ou valeur brute hors énumération
+    "IINST1":  ("iinst1",  int),
+    "IINST2":  ("iinst2",  int),
+    "IINST3":  ("iinst3",  int),
+    "IMAX1":   ("imax1",   int),
+    "IMAX2":   ("imax2",   int),
+    "IMAX3":   ("imax3",   int),
+    "PMAX":    ("pmax",    int),
+    "PAPP":    ("papp",    int),
+    "HHPHC":   ("hhphc",   int),
+}
+
+# Les six index Tempo, dans l'ordre de la table
+INDEX_FIELDS = ("bbrhcjb", "bbrhpjb", "bbrhcjw", "bbrhpjw", "bbrhcjr", "bbrhpjr")
+
+_ATTRS = tuple(attr for attr, _ in FIELDS.values())
+_LABELS = {attr: label for label, (attr, _) in FIELDS.items()}
+
+
+class TicFrame:
+    """
+    Une trame : un attribut par étiquette connue (None si absente) et
+    `extra` pour les autres. Une trame servie par le cache de lignes peut
+    être partagée entre deux appels : ne pas la modifier après coup.
+    """
+
+    __slots__ = _ATTRS + ("extra",)
+
+    def __init__(self):
+        for attr in _ATTRS:
+            setattr(self, attr, None)
+        self.extra: dict[str, int | float | str] = {}
+
+    def items(self):
+        """Couples (étiquette, valeur) des étiquettes présentes."""
+        for attr in _ATTRS:
+            value = getattr(self, attr)
+            if value is not None:
+                yield _LABELS[attr], value
+        yield from self.extra.items()
+
+    def index_total(self) -> int | None:
+        """Somme des six index Tempo en Wh, ou None s'il en manque un."""
+        total = 0
+        for attr in INDEX_FIELDS:
+            value = getattr(self, attr)
+            if value is None:
+                return None
+            total += value
+        return total
+
+    def __len__(self) -> int:
+        return sum(getattr(self, attr) is not None for attr in _ATTRS) + len(self.extra)
+
+    def __repr__(self) -> str:
+        return f"TicFrame({dict(self.items())!r})"
@@ -0,0 +1,101 @@
+"""
+tic_framer.py — Découpage incrémental du flux série en trames TIC.
+
+Le flux est lu par blocs (tout ce que contient le buffer du port série) et
+les délimiteurs STX (0x02) / ETX (0x03) sont cherchés avec bytes.find, sans
+repasser par Python octet par octet.
+
+Comportement identique à l'ancienne boucle de bridge.py :
+  - les octets hors trame (avant le premier STX, entre ETX et STX) sont ignorés
+  - un STX au milieu d'une trame la fait repartir de zéro
+  - un ETX sans trame ouverte, ou sur une trame vide, ne produit rien
+"""
+
+import logging
+from typing import Iterator
+
+log = logging.getLogger(__name__)
+
+STX = 0x02
+ETX = 0x03
+
+# Une trame historique fait ~300 octets, une trame standard ~1 Ko.
+# Au-delà, la trame est considérée comme corrompue et abandonnée.
+MAX_FRAME_SIZE = 4096
+
+
+class TicFramer:
+    """
+    Assemble les trames TIC à partir de blocs d'octets de taille quelconque.
+
+    Le contenu de la trame en cours est accumulé dans un buffer unique alloué
+    une seule fois ; seule la trame complète est copiée en `bytes`.
+    """
+
+    def __init__(self, max_size: int = MAX_FRAME_SIZE):
+        self._buf  = bytearray(max_size)
+        self._view = memoryview(self._buf)
+        self._max  = max_size
+        self._len  = 0
+        self._in_frame = False
+        self._overflow = False
+
+    def reset(self) -> None:
+        """Abandonne la trame en cours (ex : après une erreur série)."""
+        self._len = 0
+        self._in_frame = False
+        self._overflow = False
+
+    def feed(self, chunk: bytes) -> Iterator[bytes]:
+        """
+        Ajoute un bloc d'octets lus sur le port série et renvoie les trames
+        complètes qu'il termine (contenu entre STX et ETX, délimiteurs exclus).
+        """
+        pos = 0
+        end = len(chunk)
+
+        while pos < end:
+
+            if not self._in_frame:
+                stx = chunk.find(STX, pos)
+                if stx < 0:
+                    return                      # octets hors trame : ignorés
+                self._start()
+                pos = stx + 1
+                continue
+
+            etx = chunk.find(ETX, pos)
+            stop = etx if etx >= 0 else end
+            stx = chunk.find(STX, pos, stop)
+            if stx >= 0:                        # STX avant ETX : resynchronisation
+                self._start()
+                pos = stx + 1
+                continue
+
+            self._append(chunk, pos, stop)
+            if etx < 0:
+                return                          # trame incomplète : on attend la suite
+
+            pos = etx + 1
+            self._in_frame = False
+            if self._overflow:
+                log.debug("Trame abandonnée (> %d octets)", self._max)
+            elif self._len:
+                yield bytes(self._view[:self._len])
+
+    # ── Interne ────────────────────────────────────────────────────────────────
+
+    def _start(self) -> None:
+        self._len = 0
+        self._in_frame = True
+        self._overflow = False
+
+    def _append(self, chunk: bytes, start: int, stop: int) -> None:
+        size = stop - start
+        if not size or self._overflow:
+            return
+        if self._len + size > self._max:
+            self._overflow = True
+            return
+        self._view[self._len:self._len + size] = chunk[start:stop]
+        self._len += size
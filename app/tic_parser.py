@@ -1,75 +1,171 @@
 """
-tic_parser.py — Décodage et validation des trames TIC historique (mode standard Linky).
+tic_parser.py — Décodage et validation des trames TIC (modes historique et standard).
 
 Protocole : chaque trame est délimitée par STX (0x02) et ETX (0x03).
-Chaque ligne contient : LABEL SP VALEUR SP CHECKSUM CR LF
+  - historique (1200 bauds) : LABEL SP VALEUR SP CHECKSUM CR LF
+  - standard   (9600 bauds) : LABEL HT [HORODATE HT] VALEUR HT CHECKSUM CR LF
+
+Le décodage travaille directement sur les octets : seules les lignes valides
+sont converties en str. Les positions du séparateur et la portée de la
+checksum sont décrites par mode dans la table _MODES.
+
+En mode historique, une ligne qui n'a pas exactement cette forme est relue
+comme le faisait l'ancien décodeur sur str (octets non ASCII écartés, blancs
+de début et de fin retirés, trois derniers champs) : mêmes lignes acceptées,
+à une exception près — une checksum valant SP (espace) est désormais
+acceptée, alors que le strip() de l'ancien décodeur la supprimait.
 """
 
 import logging
 
+import metrics
+from tic_standard import to_historique
+
 log = logging.getLogger(__name__)
 
+HISTORIQUE = "historique"
+STANDARD   = "standard"
+AUTO       = "auto"
+
+# mode → (octet séparateur, nb d'octets de fin exclus du calcul de checksum,
+#         nb max de champs avant la checksum)
+#   historique : checksum sur « LABEL SP VALEUR » (ni le dernier SP, ni la checksum)
+#   standard   : checksum sur « LABEL HT [HORODATE HT] VALEUR HT » (dernier HT inclus)
+_MODES: dict[str, tuple[int, int, int]] = {
+    HISTORIQUE: (0x20, 2, 2),
+    STANDARD:   (0x09, 1, 3),
+}
 
-def _validate_checksum(label: str, value: str, check: str) -> bool:
+
+def _validate_checksum(body: bytes, check: int) -> bool:
     """
-    Calcule la checksum TIC historique et la compare à celle reçue.
+    Calcule la checksum TIC et la compare à celle reçue.
 
-    Algorithme : somme des codes ASCII de (label + ' ' + value), modulo 256,
-    masque 0x3F, décalé de +32.
+    Algorithme : somme des octets de la portée, masque 0x3F, décalé de +32.
     """
-    total = 32  # espace séparateur entre label et valeur
-    for c in label:
-        total += ord(c)
-    for c in value:
-        total += ord(c)
-    expected = chr(((total % 256) & 0x3F) + 32)
-    return expected == check
+    return (sum(body) & 0x3F) + 0x20 == check
 
 
-def parse_frame(raw: bytes) -> dict[str, str]:
+def parse_line(line: bytes, mode: str = HISTORIQUE) -> tuple[str, str] | None:
+    """
+    Décode une ligne TIC (sans CR/LF). Retourne (label, valeur) si le format
+    et la checksum sont corrects, None sinon.
+
+    En mode standard, l'horodate éventuelle est ignorée, sauf pour les
+    étiquettes sans valeur (DATE) où elle tient lieu de valeur.
+    """
+    sep, span, max_fields = _MODES[mode]
+
+    # La checksum est le dernier octet, toujours précédée du séparateur
+    # (elle peut elle-même valoir SP en mode historique).
+    if len(line) >= 5 and line[-2] == sep and line[0] > 0x20 and line.isascii():
+        fields = line[:-2].split(bytes((sep,)))
+        count  = len(fields)
+        if 2 <= count <= max_fields and fields[0] and (fields[-1] or count > 2):
+            if not _validate_checksum(line[:len(line) - span], line[-1]):
+                metrics.CHECKSUM_ERRORS.labels(fields[0].decode("ascii")).inc()
+                log.debug("Checksum KO — ligne=%r", line)
+                return None
+            value = fields[-1] or fields[1]
+            return fields[0].decode("ascii"), value.decode("ascii")
+
+    item = _parse_legacy(line) if mode == HISTORIQUE else None
+    if item is None:
+        metrics.MALFORMED_LINES.inc()
+        log.debug("Ligne ignorée (format inattendu) : %r", line)
+    return item
+
+
+def _parse_legacy(line: bytes) -> tuple[str, str] | None:
+    """
+    Relecture d'une ligne historique mal formée à la manière de l'ancien
+    décodeur : octets non ASCII ignorés, blancs retirés aux extrémités, les
+    trois derniers champs pris comme étiquette, valeur et checksum.
     """
-    Décode une trame TIC brute (contenu entre STX et ETX, délimiteurs inclus).
+    text = line.decode("ascii", errors="ignore").strip()
+    # Une checksum SP laissée entre deux champs est protégée par une sentinelle
+    parts = text.replace("  ", " \x00").split(" ")
+    if len(parts) < 3:
+        return None
+    label, value, check = parts[-3:]
+    if check == "\x00":
+        check = " "
+    body = f"{label} {value}".encode("ascii")
+    if len(check) != 1 or (sum(body) & 0x3F) + 0x20 != ord(check):
+        return None
+    return label, value
+
+
+def is_valid_line(line: bytes, mode: str) -> bool:
+    """
+    Vrai si la ligne a le format et la checksum attendus dans ce mode.
+    Sans journalisation ni métriques : sert à sonder un port (serial_probe.py).
+    """
+    sep, span, max_fields = _MODES[mode]
+    if len(line) < 5 or line[-2] != sep or not line.isascii():
+        return False
+    count = line.count(sep, 0, len(line) - 2) + 1
+    return 2 <= count <= max_fields and _validate_checksum(line[:len(line) - span], line[-1])
+
+
+def detect_mode(raw: bytes) -> str:
+    """Devine le mode TIC d'une trame : seul le mode standard utilise HT."""
+    return STANDARD if b"\t" in raw else HISTORIQUE
+
+
+def decode_line(line: bytes, mode: str) -> tuple[str, str] | None:
+    """
+    Décode une ligne et ramène les étiquettes du mode standard à leurs
+    équivalents historiques (voir tic_standard.py).
+    """
+    item = parse_line(line, mode)
+    if item and mode == STANDARD:
+        return to_historique(*item)
+    return item
+
+
+def parse_frame(raw: bytes, mode: str = HISTORIQUE) -> dict[str, str]:
+    """
+    Décode une trame TIC brute (contenu entre STX et ETX, délimiteurs
+    éventuellement inclus).
 
     Retourne un dict { LABEL: valeur_brute_string } pour les lignes dont
     la checksum est correcte. Les lignes invalides sont simplement ignorées
     (avec un log debug).
     """
-    teleinfo: dict[str, str] = {}
+    return _collect(raw, mode, parse_line)
 
-    try:
-        text = raw.decode("ascii", errors="ignore")
-    except Exception as exc:
-        log.warning("Impossible de décoder la trame : %s", exc)
-        return teleinfo
 
-    # Supprimer les délimiteurs de trame
-    text = text.replace("\x02\n", "").replace("\r\x03", "")
+def decode_frame(raw: bytes, mode: str = AUTO) -> dict[str, str]:
+    """
+    Comme parse_frame, mais avec les étiquettes normalisées en historique
+    quel que soit le mode de la trame. mode=AUTO détecte le mode à chaque trame.
+    """
+    if mode == AUTO:
+        mode = detect_mode(raw)
 
-    for line in text.split("\r\n"):
-        line = line.strip()
-        if not line:
-            continue
+    return _collect(raw, mode, decode_line)
 
-        # La checksum peut être un espace, ce qui complique le split.
-        # On remplace "  " (espace-espace) par "espace-sentinel" avant de splitter.
-        SENTINEL = "\x00"
-        parts = line.replace("  ", f" {SENTINEL}").split(" ")
 
-        if len(parts) < 3:
-            log.debug("Ligne ignorée (format inattendu) : %r", line)
-            continue
+def split_lines(raw: bytes) -> list[bytes]:
+    """
+    Lignes d'une trame, sans CR ni LF. Le découpage se fait sur CR LF, comme
+    l'ancien décodeur : un CR ou un LF isolé (octet corrompu) reste dans sa ligne.
+    """
+    lines = raw.replace(b"\x02\n", b"").replace(b"\r\x03", b"").split(b"\r\n")
+    lines[0]  = lines[0].lstrip(b"\n")
+    lines[-1] = lines[-1].rstrip(b"\r")
+    return lines
 
-        check = parts.pop()
-        value = parts.pop()
-        label = parts.pop() if parts else ""
 
-        # Rétablir le vrai caractère si la checksum était un espace
-        if check == SENTINEL:
-            check = " "
+def _collect(raw: bytes, mode: str, decode) -> dict[str, str]:
+    teleinfo: dict[str, str] = {}
 
-        if _validate_checksum(label, value, check):
-            teleinfo[label] = value
-        else:
-            log.debug("Checksum KO — label=%r value=%r check=%r", label, value, check)
+    for line in split_lines(raw):
+        if not line or line in (b"\x02", b"\x03"):
+            continue
+        item = decode(line, mode)
+        if item:
+            teleinfo[item[0]] = item[1]
 
     return teleinfo
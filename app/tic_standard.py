@@ -0,0 +1,65 @@
+"""
+tic_standard.py — Correspondance des étiquettes TIC standard → historique.
+
+Le mode standard nomme différemment les mêmes grandeurs (EASF01..06, SINSTS,
+IRMS1...) et code la période tarifaire et la couleur du lendemain sous forme
+numérique (NTARF, STGE). On les ramène aux étiquettes et valeurs du mode
+historique pour que payload.py et publisher.py restent inchangés et que les
+topics edf/* soient identiques quel que soit le mode du compteur.
+
+!!! Correspondance des index établie pour le contrat Tempo !!!
+"""
+
+# ── Tables de correspondance ───────────────────────────────────────────────────
+
+# Renommage simple : étiquette standard → étiquette historique
+LABEL_MAP = {
+    "ADSC":   "ADCO",      # Adresse du compteur
+    "EASF01": "BBRHCJB",   # Index fournisseur 1 : HC Bleu
+    "EASF02": "BBRHPJB",   # Index fournisseur 2 : HP Bleu
+    "EASF03": "BBRHCJW",   # Index fournisseur 3 : HC Blanc
+    "EASF04": "BBRHPJW",   # Index fournisseur 4 : HP Blanc
+    "EASF05": "BBRHCJR",   # Index fournisseur 5 : HC Rouge
+    "EASF06": "BBRHPJR",   # Index fournisseur 6 : HP Rouge
+    "IRMS1":  "IINST1",    # Courant efficace phase 1
+    "IRMS2":  "IINST2",    # Courant efficace phase 2
+    "IRMS3":  "IINST3",    # Courant efficace phase 3
+    "SINSTS": "PAPP",      # Puissance apparente soutirée
+    "SMAXSN": "PMAX",      # Puissance max soutirée du jour
+}
+
+# NTARF : numéro de l'index tarifaire en cours → PTEC historique
+NTARF_MAP = {
+    "01": "HCJB",
+    "02": "HPJB",
+    "03": "HCJW",
+    "04": "HPJW",
+    "05": "HCJR",
+    "06": "HPJR",
+}
+
+# STGE bits 26-27 : couleur du lendemain → DEMAIN historique
+STGE_DEMAIN = ("----", "BLEU", "BLAN", "ROUG")
+
+
+# ── Conversion ─────────────────────────────────────────────────────────────────
+
+def to_historique(label: str, value: str) -> tuple[str, str]:
+    """
+    Convertit une ligne standard validée en (étiquette, valeur) historique.
+    Les étiquettes sans équivalent sont conservées telles quelles.
+    """
+    mapped = LABEL_MAP.get(label)
+    if mapped:
+        return mapped, value
+
+    if label == "NTARF":
+        return "PTEC", NTARF_MAP.get(value, value)
+
+    if label == "STGE":
+        try:
+            return "DEMAIN", STGE_DEMAIN[(int(value, 16) >> 26) & 0x03]
+        except ValueError:
+            return label, value
+
+    return label, value
@@ -0,0 +1,115 @@
+"""
+tic_synth.py — Générateur de trames TIC historiques synthétiques (contrat Tempo).
+
+Produit des trames réalistes sans compteur : index qui progressent avec la
+puissance consommée, PTEC qui parcourt les six périodes Tempo, mono ou
+triphasé, checksums éventuellement corrompues ou valant SP (espace). Utilisé par le rejeu
+(fake_serial.py) et les benchmarks.
+"""
+
+import random
+
+STX, ETX = b"\x02", b"\x03"
+
+# PTEC → index actif
+PERIODS = {
+    "HCJB": "BBRHCJB", "HPJB": "BBRHPJB",
+    "HCJW": "BBRHCJW", "HPJW": "BBRHPJW",
+    "HCJR": "BBRHCJR", "HPJR": "BBRHPJR",
+}
+
+
+def checksum(body: bytes) -> int:
+    """Checksum historique de « LABEL SP VALEUR »."""
+    return (sum(body) & 0x3F) + 0x20
+
+
+def line(label: str, value: str, corrupt: bool = False) -> bytes:
+    """Une ligne « LABEL SP VALEUR SP CHECKSUM » (sans LF ni CR)."""
+    body = f"{label} {value}".encode("ascii")
+    check = checksum(body)
+    if corrupt:
+        check = 0x20 + (check - 0x20 + 1) % 64
+    return body + b" " + bytes((check,))
+
+
+def frame(lines: list[bytes]) -> bytes:
+    """Trame complète, délimiteurs STX / ETX inclus."""
+    return STX + b"".join(b"\n" + ln + b"\r" for ln in lines) + ETX
+
+
+class FrameGenerator:
+    """
+    Trames successives d'un compteur simulé, une toutes les `interval`
+    secondes de temps simulé. `period` force la période tarifaire ; sinon
+    elle change toutes les `period_frames` trames.
+    """
+
+    def __init__(self, phases: int = 1, seed: int = 0, interval: float = 1.5,
+                 corrupt_rate: float = 0.0, period: str | None = None,
+                 period_frames: int = 200, space_checksums: bool = False):
+        self._rand   = random.Random(seed)
+        self._phases = phases
+        self._interval = interval
+        self._corrupt  = corrupt_rate
+        self._period   = period
+        self._period_frames = period_frames
+        self._space  = space_checksums
+        self._count  = 0
+        self._papp   = 1500
+        self._wh     = {label: float(self._rand.randrange(100_000, 10_000_000))
+                        for label in PERIODS.values()}
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        return frame(self.lines())
+
+    def lines(self) -> list[bytes]:
+        rand = self._rand
+        periods = tuple(PERIODS)
+        ptec = self._period or periods[(self._count // self._period_frames) % len(periods)]
+        self._count += 1
+
+        self._papp = min(max(self._papp + rand.randint(-150, 150), 80), 11_000)
+        self._wh[PERIODS[ptec]] += self._papp * 0.95 * self._interval / 3600
+
+        values = [
+            ("ADCO", "021528603314"),
+            ("OPTARIF", "BBR("),
+            ("ISOUSC", "45"),
+            *((label, f"{int(wh):09d}") for label, wh in self._wh.items()),
+            ("PTEC", ptec),
+            ("DEMAIN", rand.choice(("----", "BLEU", "BLAN", "ROUG"))),
+        ]
+        if self._phases == 3:
+            share = self._papp / 3 / 230
+            values += [(f"IINST{i}", f"{round(share):03d}") for i in (1, 2, 3)]
+            values += [(f"IMAX{i}", "060") for i in (1, 2, 3)]
+            values += [("PMAX", "06870"), ("PAPP", f"{self._papp:05d}"), ("PPOT", "00")]
+        else:
+            values += [("IINST", f"{round(self._papp / 230):03d}"), ("IMAX", "090"),
+                       ("PAPP", f"{self._papp:05d}")]
+        values += [("HHPHC", "Y"), ("MOTDETAT", "000000")]
+
+        if self._space:
+            values = [(label, _space_value(label, value)) for label, value in values]
+        corrupt = self._corrupt
+        return [line(label, value, corrupt and rand.random() < corrupt)
+                for label, value in values]
+
+
+def _space_value(label: str, value: str) -> str:
+    """
+    Plus petite valeur numérique ≥ `value`, de même largeur, dont la checksum
+    vaut SP (cas qu'un strip() naïf casse). Inchangée si impossible.
+    """
+    if not value.isdigit():
+        return value
+    width = len(value)
+    for n in range(int(value), min(int(value) + 1000, 10 ** width)):
+        candidate = f"{n:0{width}d}"
+        if checksum(f"{label} {candidate}".encode("ascii")) == 0x20:
+            return candidate
+    return value
@@ -0,0 +1,9 @@
+"""
+conftest.py — Les modules de app/ s'importent à plat (comme dans l'image
+Docker) : le dossier est ajouté au chemin d'import des tests.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
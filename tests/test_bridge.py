@@ -0,0 +1,115 @@
+"""Configuration des compteurs (bridge.py) : METERS et mode TIC par port."""
+
+import threading
+
+import pytest
+
+import bridge
+import config
+import serial_probe
+import tic_synth
+from mqtt_client import MQTTClient
+from spool import Spool
+from stub_broker import StubBroker
+
+
+@pytest.mark.parametrize("entry, expected", [
+    ("/dev/ttyUSB0=edf",             ("/dev/ttyUSB0", "edf")),
+    ("socket://10.0.0.5:4001=edf2",  ("socket://10.0.0.5:4001", "edf2")),
+    ("socket://10.0.0.5:4001",       ("socket://10.0.0.5:4001", "")),
+    ("synthetic://?speed=1",         ("synthetic://?speed=1", "")),
+    ("synthetic://?speed=1=edf2",    ("synthetic://?speed=1", "edf2")),
+    ("synthetic://?speed=1&loop=1",  ("synthetic://?speed=1&loop=1", "")),
+    ("replay:///data/a.tic?speed=10=garage", ("replay:///data/a.tic?speed=10", "garage")),
+    ("/dev/ttyUSB0=home/edf",        ("/dev/ttyUSB0=home/edf", "")),
+])
+def test_split_meter(entry, expected):
+    assert bridge._split_meter(entry) == expected
+
+
+def test_meters_default_prefix(monkeypatch):
+    monkeypatch.setattr(config, "METERS", " /dev/ttyUSB0=edf , synthetic://?speed=1 ")
+    monkeypatch.setattr(config, "MQTT_PREFIX", "linky")
+    assert bridge.meters() == [("/dev/ttyUSB0", "edf"), ("synthetic://?speed=1", "linky")]
+
+
+def test_port_mode_follows_probed_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TIC_MODE", "auto")
+    monkeypatch.setattr(config, "SERIAL_PROBE", True)
+    cache = serial_probe.ProbeCache(str(tmp_path))
+    cache.put("/dev/ttyUSB0", "9600 8N1")
+    monkeypatch.setattr(bridge, "_probe_cache", cache)
+    assert bridge._port_mode("/dev/ttyUSB0") == "standard"
+    assert bridge._port_mode("/dev/ttyUSB1") == "auto"
+    monkeypatch.setattr(config, "SERIAL_PROBE", False)
+    assert bridge._port_mode("/dev/ttyUSB0") == "auto"
+
+
+def _unconnected_pipeline(monkeypatch, port: str):
+    monkeypatch.setattr(config, "PUBLISH_INTERVAL", 3600)
+    broker = StubBroker()
+    mqtt = MQTTClient(client=broker)
+    return broker, mqtt, bridge._Pipeline(mqtt.for_prefix("edf"), port)
+
+
+def _publish_frames(pipeline, count: int) -> None:
+    generator = tic_synth.FrameGenerator(seed=3)
+    for _ in range(count):
+        frame = pipeline.ingest(next(generator)[1:-1])
+        pipeline.publish(frame)
+
+
+def test_frame_received_before_first_connect_is_published_on_connect(monkeypatch):
+    broker, mqtt, pipeline = _unconnected_pipeline(monkeypatch, "/dev/ttyHELD0")
+    _publish_frames(pipeline, 3)
+    assert broker.publications == []
+    mqtt.connect()
+    topics = {topic for _, topic, _, _ in broker.publications}
+    assert "edf/papp" in topics and pipeline._held is None
+
+
+def test_readings_before_first_connect_go_to_the_spool(monkeypatch, tmp_path):
+    broker, mqtt, pipeline = _unconnected_pipeline(monkeypatch, "/dev/ttyHELD1")
+    mqtt._spool = Spool(str(tmp_path), max_bytes=1 << 20, max_age=3600)
+    _publish_frames(pipeline, 1)
+    assert mqtt._spool.count() > 0 and broker.publications == []
+    mqtt.connect()
+    mqtt._replay.join(5)
+    topics = {topic for _, topic, _, _ in broker.publications}
+    assert "edf/papp" in topics and "edf/history/papp" in topics
+    assert not mqtt._spool.pending()
+
+
+class _FakeSerial:
+    """Port série ouvert rendant des blocs prédéfinis, puis plus rien."""
+
+    is_open = True
+    in_waiting = 0
+
+    def __init__(self, chunks: list[bytes]):
+        self._chunks = chunks
+
+    def read(self, size: int = 1) -> bytes:
+        return self._chunks.pop(0) if self._chunks else b""
+
+    def close(self) -> None:
+        self.is_open = False
+
+
+def test_reader_survives_a_failing_frame(monkeypatch):
+    generator = tic_synth.FrameGenerator(seed=4)
+    chunks = [next(generator) for _ in range(3)]
+    monkeypatch.setattr(bridge, "_open_serial", lambda port, timeout: _FakeSerial(chunks))
+    stop = threading.Event()
+    seen = []
+
+    def _on_frame(raw: bytes) -> None:
+        seen.append(raw)
+        if len(seen) == 1:
+            raise ValueError("trame piégée")
+        if len(seen) == 3:
+            stop.set()
+
+    pipeline = bridge._Pipeline(MQTTClient(client=StubBroker()).for_prefix("edf"), "/dev/ttyFAKE0")
+    bridge._read_serial(pipeline, stop, _on_frame, timeout=0)
+    assert len(seen) == 3
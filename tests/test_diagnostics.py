@@ -0,0 +1,70 @@
+"""Diagnostic à la demande (diagnostics.py) : fin de session et tracemalloc."""
+
+import time
+import tracemalloc
+
+import pytest
+
+from diagnostics import Diagnostics
+
+
+@pytest.fixture(autouse=True)
+def _no_tracing():
+    yield
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _wait_report(diagnostics: Diagnostics, directory, timeout: float = 5.0) -> list:
+    """Rapports écrits, une fois le thread d'écriture terminé."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        reports = sorted(directory.glob("diag-*.txt"))
+        if reports and not diagnostics._writing:
+            return reports
+        time.sleep(0.05)
+    return []
+
+
+def _session(diagnostics: Diagnostics, directory) -> str:
+    diagnostics.request(1)
+    diagnostics.tick()                          # démarrage à la trame suivante
+    assert tracemalloc.is_tracing()
+    # Plus aucune trame : la session s'arrête quand même au bout de la durée
+    (report,) = _wait_report(diagnostics, directory)
+    return report.read_text(encoding="utf-8")
+
+
+def test_session_stops_without_frames(tmp_path):
+    diagnostics = Diagnostics(str(tmp_path), 60, lambda: {"line_cache": 3})
+    text = _session(diagnostics, tmp_path)
+    assert "line_cache" in text and "tracemalloc" in text
+    assert list(tmp_path.glob("diag-*.prof"))
+    assert not tracemalloc.is_tracing()
+    diagnostics.tick()                          # désactivation différée (Python < 3.12)
+    assert not diagnostics.active
+
+
+def test_persistent_tracing(tmp_path):
+    diagnostics = Diagnostics(str(tmp_path), 60, dict, persist=True)
+    _session(diagnostics, tmp_path)
+    assert tracemalloc.is_tracing()
+
+
+def test_request_ignored_while_running(tmp_path):
+    diagnostics = Diagnostics(str(tmp_path), 60, dict)
+    diagnostics.request(1)
+    diagnostics.tick()
+    diagnostics.request(1)
+    assert diagnostics._requested is None
+    assert _wait_report(diagnostics, tmp_path)
+    diagnostics.tick()
+    assert not diagnostics.active
+
+
+def test_command_payload(tmp_path):
+    diagnostics = Diagnostics(str(tmp_path), 60, dict)
+    diagnostics.on_command(b"abc")
+    assert not diagnostics.active
+    diagnostics.on_command(b"5000")
+    assert diagnostics._requested == 3600
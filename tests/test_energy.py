@@ -0,0 +1,97 @@
+"""Consommation par couleur et période (energy.py) : jour Tempo, mois, persistance."""
+
+import datetime
+
+from energy import DEFAULT_PRICES, EnergyMeter
+from state_file import StateFile
+from tic_frame import Ptec, TicFrame
+
+BASE = {"bbrhcjb": 1_000_000, "bbrhpjb": 2_000_000, "bbrhcjw": 300_000,
+        "bbrhpjw": 400_000, "bbrhcjr": 50_000, "bbrhpjr": 60_000}
+
+
+def _at(*args) -> float:
+    return datetime.datetime(*args).timestamp()
+
+
+def _frame(ptec: Ptec, **index) -> TicFrame:
+    frame = TicFrame()
+    for attr, value in {**BASE, **index}.items():
+        setattr(frame, attr, value)
+    frame.ptec = ptec
+    return frame
+
+
+def _today(meter: EnergyMeter) -> dict[str, float]:
+    return {topic.rpartition("/")[2]: value for topic, value in meter.values().items()
+            if topic.startswith("energy/today/")}
+
+
+def test_day_rolls_over_at_hc_to_hp_transition():
+    meter = EnergyMeter(DEFAULT_PRICES)
+    meter.add(_at(2025, 1, 15, 5, 50), _frame(Ptec.HCJB))
+    meter.add(_at(2025, 1, 15, 5, 55), _frame(Ptec.HCJB, bbrhcjb=1_000_500))
+    assert _today(meter)["blue_hc"] == 0.5
+    # Horloge du bridge en retard : le passage HC → HP fait foi
+    meter.add(_at(2025, 1, 15, 5, 58), _frame(Ptec.HPJB, bbrhcjb=1_000_500, bbrhpjb=2_000_200))
+    assert _today(meter)["blue_hc"] == 0 and _today(meter)["blue_hp"] == 0.2
+    assert meter._day == "2025-01-15"
+    # L'horloge (encore avant 6 h) ne fait pas revenir au jour précédent
+    meter.add(_at(2025, 1, 15, 5, 59), _frame(Ptec.HPJB, bbrhcjb=1_000_500, bbrhpjb=2_000_300))
+    assert _today(meter)["blue_hp"] == 0.3
+
+
+def test_clock_fallback_when_transition_not_seen(tmp_path):
+    path = str(tmp_path / "energy.json")
+    meter = EnergyMeter(DEFAULT_PRICES, StateFile(path, min_interval=0))
+    meter.add(_at(2025, 1, 15, 5, 0), _frame(Ptec.HCJW))
+    meter.add(_at(2025, 1, 15, 5, 30), _frame(Ptec.HCJW, bbrhcjw=300_400))
+    assert meter._day == "2025-01-14"
+    meter.flush()
+
+    # Bridge arrêté de 5 h 30 à 7 h : le passage HC → HP n'est pas vu
+    restarted = EnergyMeter(DEFAULT_PRICES, StateFile(path, min_interval=0))
+    restarted.add(_at(2025, 1, 15, 7, 0), _frame(Ptec.HPJW, bbrhcjw=300_400, bbrhpjw=400_100))
+    assert restarted._day == "2025-01-15"
+    today = _today(restarted)
+    assert today["white_hc"] == 0 and today["white_hp"] == 0.1   # arrêt : jour du redémarrage
+
+
+def test_month_reset():
+    meter = EnergyMeter(DEFAULT_PRICES)
+    meter.add(_at(2025, 1, 31, 12), _frame(Ptec.HPJR))
+    meter.add(_at(2025, 1, 31, 13), _frame(Ptec.HPJR, bbrhpjr=61_000))
+    meter.add(_at(2025, 1, 31, 23), _frame(Ptec.HCJR, bbrhpjr=61_000, bbrhcjr=50_500))
+    month = {topic: value for topic, value in meter.values().items() if "/month/" in topic}
+    assert month["energy/month/red_hp"] == 1.0 and month["energy/month/total"] == 1.5
+    # Le jour Tempo du 31 janvier se termine le 1er février à 6 h
+    meter.add(_at(2025, 2, 1, 6, 1), _frame(Ptec.HPJB, bbrhpjr=61_000, bbrhcjr=50_500))
+    values = meter.values()
+    assert meter._day == "2025-02-01"
+    assert values["energy/month/total"] == 0 and values["cost/month"] == 0
+
+
+def test_index_going_back_is_ignored():
+    meter = EnergyMeter(DEFAULT_PRICES)
+    meter.add(_at(2025, 1, 15, 12), _frame(Ptec.HPJB))
+    meter.add(_at(2025, 1, 15, 12, 1), _frame(Ptec.HPJB, bbrhpjb=1_999_000))
+    assert _today(meter)["blue_hp"] == 0
+    # L'index en recul devient la nouvelle référence
+    meter.add(_at(2025, 1, 15, 12, 2), _frame(Ptec.HPJB, bbrhpjb=1_999_250))
+    assert _today(meter)["blue_hp"] == 0.25
+    assert meter.values()["cost/today"] == round(0.25 * DEFAULT_PRICES["blue_hp"], 2)
+
+
+def test_state_is_restored_after_restart(tmp_path):
+    path = str(tmp_path / "energy.json")
+    meter = EnergyMeter(DEFAULT_PRICES, StateFile(path, min_interval=0))
+    meter.add(_at(2025, 1, 15, 12), _frame(Ptec.HPJB))
+    meter.add(_at(2025, 1, 15, 12, 1), _frame(Ptec.HPJB, bbrhpjb=2_000_700))
+    meter.flush()
+
+    # Redémarrage : la consommation pendant l'arrêt compte dans le jour en cours
+    restored = EnergyMeter(DEFAULT_PRICES, StateFile(path, min_interval=0))
+    assert restored._day == "2025-01-15" and _today(restored)["blue_hp"] == 0.7
+    restored.add(_at(2025, 1, 15, 14), _frame(Ptec.HPJB, bbrhpjb=2_001_000))
+    assert _today(restored)["blue_hp"] == 1.0
+    assert StateFile(path).load()["last"]["bbrhpjb"] == 2_001_000
@@ -0,0 +1,58 @@
+"""Historique local (history.py) : format des enregistrements, ajout, requêtes."""
+
+import datetime
+
+import history
+from history import HistoryStore, pack, unpack
+from tic_frame import Ptec, Tempo, TicFrame
+
+DAY = datetime.datetime(2025, 1, 15, 12).timestamp()
+
+
+def _frame(**values) -> TicFrame:
+    frame = TicFrame()
+    for attr, value in values.items():
+        setattr(frame, attr, value)
+    return frame
+
+
+def test_pack_roundtrip():
+    frame = _frame(bbrhcjb=1234567, papp=750, iinst1=3, ptec=Ptec.HPJB, demain=Tempo.RED)
+    record = unpack(pack(DAY, frame))
+    assert record["t"] == DAY
+    assert (record["bbrhcjb"], record["papp"], record["iinst1"]) == (1234567, 750, 3)
+    assert (record["ptec"], record["demain"]) == (Ptec.HPJB, Tempo.RED)
+    assert record["bbrhpjr"] is None and record["iinst2"] is None
+
+
+def test_out_of_range_values_are_stored_as_missing():
+    frame = _frame(bbrhcjb=2**32 + 5, bbrhpjb=-1, papp=750, iinst1=70_000, iinst2=0xFFFF)
+    record = unpack(pack(DAY, frame))
+    assert record["bbrhcjb"] is None and record["bbrhpjb"] is None
+    assert record["iinst1"] is None and record["iinst2"] is None
+    assert record["papp"] == 750
+
+
+def test_append_skips_unrepresentable_timestamp(tmp_path):
+    store = HistoryStore(str(tmp_path), interval=0)
+    store.append(1e18, _frame(papp=1))               # instant hors int64 en ms
+    store.append(DAY, _frame(papp=2))
+    store.close()
+    rows = history.query(str(tmp_path), DAY - 1, DAY + 1, 60)
+    assert [row["papp_max"] for row in rows] == [2]
+
+
+def test_query_and_daily(tmp_path):
+    store = HistoryStore(str(tmp_path), interval=10)
+    start = datetime.datetime(2025, 1, 15).timestamp()
+    for n in range(2 * 8640):                         # deux jours, une trame par 10 s
+        store.append(start + n * 10, _frame(bbrhcjb=1000 + n, papp=100 + n % 10))
+    store.close()
+
+    rows = history.query(str(tmp_path), start, start + 3600, 900)
+    assert len(rows) == 4
+    assert rows[0]["n"] == 90 and rows[0]["papp_max"] == 109 and rows[0]["papp_avg"] == 104
+    assert rows[-1]["bbrhcjb"] == 1000 + 359
+
+    days = history.daily(str(tmp_path), datetime.date(2025, 1, 15), datetime.date(2025, 1, 16))
+    assert [day["wh"]["bbrhcjb"] for day in days] == [8640, 8639]
@@ -0,0 +1,36 @@
+"""Exposition Prometheus (metrics.py), avec plusieurs compteurs."""
+
+import collections
+
+import bridge
+import metrics
+import tic_synth
+from mqtt_client import MQTTClient
+from stub_broker import StubBroker
+
+
+def test_render_declares_each_family_once():
+    mqtt = MQTTClient(client=StubBroker())
+    pipelines = [bridge._Pipeline(mqtt.for_prefix(prefix), port)
+                 for port, prefix in (("/dev/ttyMETER0", "edf"), ("/dev/ttyMETER1", "edf2"))]
+    generator = tic_synth.FrameGenerator(seed=1)
+    for pipeline in pipelines:
+        for _ in range(3):
+            pipeline.ingest(next(generator)[1:-1])
+
+    text = metrics.render()
+    declared = collections.Counter(line.split()[2] for line in text.splitlines()
+                                   if line.startswith("# TYPE "))
+    assert declared and max(declared.values()) == 1
+    samples = [line.rpartition(" ")[0] for line in text.splitlines() if not line.startswith("#")]
+    assert len(samples) == len(set(samples))
+    for port in ("/dev/ttyMETER0", "/dev/ttyMETER1"):
+        assert f'linky_line_cache_total{{port="{port}",result="miss"}}' in text
+
+
+def test_same_name_registered_twice():
+    metrics.Callback("linky_test_twice", "Test", "gauge", lambda: {("a",): 1}, ("k",))
+    metrics.Callback("linky_test_twice", "Test", "gauge", lambda: {("b",): 2}, ("k",))
+    text = metrics.render()
+    assert text.count("# TYPE linky_test_twice gauge") == 1
+    assert 'linky_test_twice{k="a"} 1' in text and 'linky_test_twice{k="b"} 2' in text
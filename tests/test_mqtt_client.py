@@ -0,0 +1,127 @@
+"""
+Publication filtrée (mqtt_client.py) : heartbeat, persistance RBE, abonnements.
+Le client paho est remplacé par stub_broker.StubBroker.
+"""
+
+import json
+
+import pytest
+
+import mqtt_client
+from mqtt_client import MQTTClient
+from stub_broker import StubBroker
+
+
+@pytest.fixture
+def broker() -> StubBroker:
+    return StubBroker()
+
+
+@pytest.fixture
+def client(broker) -> MQTTClient:
+    client = MQTTClient(client=broker)
+    client.connect()
+    return client
+
+
+def _published(broker: StubBroker, topic: str) -> list[str]:
+    return [payload.decode() for _t, name, payload, _r in broker.publications if name == topic]
+
+
+def _age(client: MQTTClient, full_topic: str, seconds: float) -> None:
+    """Fait comme si la dernière publication datait de `seconds` secondes de plus."""
+    client._last_time[full_topic] -= seconds
+
+
+def test_heartbeat_sends_latest_observed_value(client, broker):
+    assert client.publish("papp", 1000, prefix="edf")
+    assert not client.publish("papp", 1030, prefix="edf")      # zone morte (50 VA)
+    _age(client, "edf/papp", 3600)
+    client.publish_due()
+    assert _published(broker, "edf/papp") == ["1000", "1030"]
+    # La valeur du heartbeat est la nouvelle référence de la zone morte :
+    # 1075 en est à 45 VA (1000 : 75 VA)
+    assert not client.publish("papp", 1075, prefix="edf")
+    assert client.publish("papp", 1081, prefix="edf")
+
+
+def test_heartbeat_republishes_last_value_when_nothing_observed(client, broker):
+    client.publish("ptec", "HPJB", prefix="edf")
+    _age(client, "edf/ptec", 3600)
+    client.publish_due()
+    assert _published(broker, "edf/ptec") == ["HPJB", "HPJB"]
+
+
+def test_deferred_value_published_when_due(client, broker):
+    client.publish("energy/today/total", 1.0, prefix="edf")
+    assert not client.publish("energy/today/total", 1.5, prefix="edf")   # min_interval=60
+    client.publish_due()
+    assert _published(broker, "edf/energy/today/total") == ["1.0"]
+    _age(client, "edf/energy/today/total", 60)
+    client.publish_due()
+    assert _published(broker, "edf/energy/today/total") == ["1.0", "1.5"]
+
+
+@pytest.mark.parametrize("topic", ["index_wh", "index_kwh", "index_hp_kwh", "index_hcr_kwh"])
+def test_every_index_is_rate_limited(client, broker, topic):
+    client.publish(topic, 1234.567, prefix="edf")
+    assert not client.publish(topic, 1234.568, prefix="edf")
+    assert client.policy.rule(topic).min_interval == 60
+    assert _published(broker, f"edf/{topic}") == ["1234.567"]
+
+
+def test_rbe_restores_prefix_and_topic(tmp_path, monkeypatch, broker):
+    monkeypatch.setattr(mqtt_client, "STATE_DIR", str(tmp_path))
+    first = MQTTClient(client=StubBroker())
+    first._load_rbe()
+    first.connect()
+    first.for_prefix("edf").publish("energy/today/blue_hc", 1.25)
+    first.disconnect()
+
+    state = json.loads((tmp_path / "rbe.json").read_text())
+    assert state["topics"]["edf/energy/today/blue_hc"] == ["energy/today/blue_hc", "edf"]
+
+    second = MQTTClient(client=broker)
+    second._load_rbe()
+    second.connect()
+    _age(second, "edf/energy/today/blue_hc", 3600)
+    second.publish_due()
+    assert _published(broker, "edf/energy/today/blue_hc") == ["1.25"]
+    assert second.policy.rule("energy/today/blue_hc").pattern == "energy/*"
+
+
+def test_rbe_legacy_file(tmp_path, monkeypatch, client, broker):
+    (tmp_path / "rbe.json").write_text(json.dumps({"edf/energy/today/blue_hc": "1.25"}))
+    monkeypatch.setattr(mqtt_client, "STATE_DIR", str(tmp_path))
+    client._load_rbe()
+    assert not client.publish("energy/today/blue_hc", 1.25, prefix="edf")
+    _age(client, "edf/energy/today/blue_hc", 3600)
+    client.publish_due()
+    assert _published(broker, "edf/energy/today/blue_hc") == ["1.25"]
+
+
+
+def test_subscribe_fans_out_to_every_callback(client, broker):
+    received = []
+    client.subscribe("homeassistant/status", lambda payload: received.append(("a", payload)))
+    client.subscribe("homeassistant/status", lambda payload: 1 / 0)
+    client.subscribe("homeassistant/status", lambda payload: received.append(("b", payload)))
+    broker.deliver("homeassistant/status", b"online")
+    assert received == [("a", b"online"), ("b", b"online")]
+
+
+def test_topic_aliases_reset_on_reconnect(client, broker, monkeypatch):
+    monkeypatch.setattr(mqtt_client, "MQTT_TOPIC_ALIASES", True)
+    connack = type("Properties", (), {"TopicAliasMaximum": 10})()
+    sent = []
+    send = broker.publish
+    monkeypatch.setattr(broker, "publish", lambda topic, **kw: sent.append(topic) or send(topic, **kw))
+
+    client._on_connect(broker, None, {}, 0, connack)
+    client.publish("papp", 1000, prefix="edf")
+    client.publish("papp", 2000, prefix="edf")
+    client._on_disconnect(broker, None, 1)
+    client._on_connect(broker, None, {}, 0, connack)
+    client.publish("papp", 3000, prefix="edf")
+    # Après reconnexion, l'alias est rétabli avec le topic complet
+    assert [t for t in sent if t in ("", "edf/papp")] == ["edf/papp", "", "edf/papp"]
@@ -0,0 +1,52 @@
+"""Puissance active calculée depuis les index (power.py)."""
+
+from power import PowerEstimator
+from tic_frame import INDEX_FIELDS, TicFrame
+
+
+def _frame(total: int) -> TicFrame:
+    frame = TicFrame()
+    for attr in INDEX_FIELDS:
+        setattr(frame, attr, 0)
+    frame.bbrhcjb = total
+    return frame
+
+
+def _feed(estimator: PowerEstimator, start: float, end: float, watts: float, wh: float,
+          step: float = 2.0) -> float:
+    """Trames toutes les `step` s de start à end à puissance constante ; retourne l'index final."""
+    t = start
+    while t <= end:
+        estimator.add(t, _frame(round(wh)))
+        wh += watts * step / 3600
+        t += step
+    return wh - watts * step / 3600
+
+
+def test_steady_load():
+    estimator = PowerEstimator(window=120)
+    _feed(estimator, 0, 600, 3000, 1_000_000)
+    assert abs(estimator.value() - 3000) <= 60
+
+
+def test_load_after_idle_plateau_is_averaged_over_the_window_only():
+    estimator = PowerEstimator(window=120)
+    wh = _feed(estimator, 0, 3600, 0, 1_000_000)
+    assert estimator.size() == 2                # plateau réduit à ses extrémités
+    _feed(estimator, 3602, 3660, 3000, wh + 3000 * 2 / 3600)
+    # 60 s à 3000 W dans une fenêtre de 120 s : 1500 W (et non ≈ 49 W sur l'heure)
+    assert abs(estimator.value() - 1500) <= 60
+
+
+def test_plateau_then_full_window_of_load():
+    estimator = PowerEstimator(window=120)
+    wh = _feed(estimator, 0, 3600, 0, 1_000_000)
+    _feed(estimator, 3602, 3900, 3000, wh + 3000 * 2 / 3600)
+    assert abs(estimator.value() - 3000) <= 60
+
+
+def test_index_going_back_resets_the_window():
+    estimator = PowerEstimator(window=120)
+    _feed(estimator, 0, 60, 3000, 1_000_000)
+    estimator.add(62, _frame(10))
+    assert estimator.size() == 1 and estimator.value() is None
@@ -0,0 +1,98 @@
+"""Publication incrémentale (publisher.Publisher) comparée à publish_all."""
+
+import copy
+
+import tic_synth
+from line_cache import LineCache
+from publisher import TOPICS, Publisher, publish_all
+from tic_frame import TicFrame
+
+
+class _Client:
+    """Client MQTT en mémoire : dernière valeur publiée par topic, échecs à la demande."""
+
+    def __init__(self):
+        self.retained: dict = {}
+        self.failures = 0
+        self.fail_next = 0
+        self.on_connect = []
+
+    def publish(self, topic, value, retain=True, full_topic=None) -> bool:
+        if self.fail_next:
+            self.fail_next -= 1
+            self.failures += 1
+            return False
+        self.retained[topic] = value
+        return True
+
+    def add_on_connect(self, callback) -> None:
+        self.on_connect.append(callback)
+
+
+def _frames(count: int) -> list[TicFrame]:
+    """Trames décodées par le cache de lignes (trames identiques : même objet)."""
+    generator = tic_synth.FrameGenerator(seed=7, phases=3, corrupt_rate=0.05)
+    cache = LineCache()
+    raws, frames = [], []
+    for i in range(count):
+        if i % 5 == 4:
+            raws.append(raws[-1])                  # trame répétée à l'identique
+        else:
+            raws.append(next(generator)[1:-1])
+        frames.append(cache.decode(raws[-1]))
+    return frames
+
+
+def test_incremental_matches_publish_all():
+    incremental, full = _Client(), _Client()
+    publisher = Publisher(incremental, "linky")
+    recomputed = []
+    for i, frame in enumerate(_frames(400)):
+        if i == 100:
+            incremental.fail_next = 1              # publication perdue : tout est recalculé
+        if i == 200:
+            for callback in incremental.on_connect:
+                callback(False)                    # reconnexion au broker
+        failures = incremental.failures
+        recomputed.append(publisher.publish(frame))
+        publish_all(full, frame)
+        if incremental.failures == failures:
+            # topics calculables sur cette trame (une ligne corrompue n'en publie aucun)
+            current = {topic: full.retained[topic] for topic, (inputs, derive) in TOPICS.items()
+                       if derive(*(getattr(frame, attr) for attr in inputs)) is not None}
+            assert {topic: incremental.retained[topic] for topic in current} == current, i
+    assert recomputed[0] == recomputed[101] == recomputed[200] == len(TOPICS)
+    assert recomputed[4] == recomputed[9] == 0     # trames répétées
+
+
+def test_only_dependent_topics_are_recomputed():
+    client = _Client()
+    publisher = Publisher(client, "linky")
+    frame = _frames(1)[0]
+    assert publisher.publish(frame) == len(TOPICS)
+    assert publisher.publish(frame) == 0           # même objet : rien à recalculer
+
+    changed = copy.copy(frame)
+    changed.papp += 10
+    changed.bbrhcjb += 1
+    expected = {topic for topic, (inputs, _) in TOPICS.items()
+                if "papp" in inputs or "bbrhcjb" in inputs}
+    assert expected == {"papp", "index_wh", "index_kwh", "index_hc_kwh", "index_hcb_kwh"}
+    assert publisher.publish(changed) == len(expected)
+    assert client.retained["papp"] == changed.papp
+    assert client.retained["index_hcb_kwh"] == round(changed.bbrhcjb / 1000, 3)
+
+
+def test_unknown_ptec_and_demain_are_published_raw():
+    generator = tic_synth.FrameGenerator(seed=8)
+    lines = [line for line in next(generator)[1:-1].split(b"\r\n")
+             if line and not line.startswith((b"PTEC", b"DEMAIN"))]
+    lines += [tic_synth.line("PTEC", "XX.."), tic_synth.line("DEMAIN", "VERT")]
+    frame = LineCache().decode(b"\r\n".join(lines))
+    assert (frame.ptec, frame.demain) == ("XX..", "VERT")
+    assert "PTEC" not in frame.extra and "DEMAIN" not in frame.extra
+
+    client = _Client()
+    Publisher(client, "linky").publish(frame)
+    assert client.retained["ptec"] == "XX.." and client.retained["next_tempo_day"] == "VERT"
+    assert "tempo_day" not in client.retained
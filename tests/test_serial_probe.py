@@ -0,0 +1,81 @@
+"""Détection des paramètres série (serial_probe.py) sur des flux simulés."""
+
+import random
+
+import pytest
+
+import serial_probe
+import tic_synth
+from serial_probe import CANDIDATES, STRIP_PARITY, _sample, probe, score
+from tic_parser import HISTORIQUE, STANDARD
+
+
+class _Port:
+    """Port simulé : rend le flux par blocs de taille aléatoire."""
+
+    def __init__(self, data: bytes, seed: int = 0):
+        self._data = data
+        self._pos  = 0
+        self._rand = random.Random(seed)
+
+    @property
+    def in_waiting(self) -> int:
+        left = len(self._data) - self._pos
+        return min(left, self._rand.randint(0, 40))
+
+    def read(self, size: int = 1) -> bytes:
+        chunk = self._data[self._pos:self._pos + size]
+        self._pos += len(chunk)
+        return chunk
+
+    def close(self) -> None:
+        pass
+
+
+def _stream(frames: int = 30, corrupt_rate: float = 0.0) -> bytes:
+    generator = tic_synth.FrameGenerator(seed=7, corrupt_rate=corrupt_rate)
+    return b"ADCO 0215" + b"".join(next(generator) for _ in range(frames))
+
+
+def _with_parity(data: bytes) -> bytes:
+    """Flux 7E1 lu en 8N1 : le bit de parité paire arrive en 8e bit."""
+    return bytes(b | (bin(b).count("1") % 2) << 7 for b in data)
+
+
+@pytest.mark.parametrize("corrupt_rate", [0.0, 0.3, 1.0])
+@pytest.mark.parametrize("seed", range(5))
+def test_sample_matches_score_on_whole_sample(corrupt_rate, seed):
+    data = _stream(corrupt_rate=corrupt_rate)
+    # Échantillon tronqué à une position quelconque, pour finir en milieu de ligne
+    data = data[:random.Random(seed).randrange(len(data) // 2, len(data))]
+    port = _Port(data, seed)
+    result = _sample(port, CANDIDATES["1200 7E1"], duration=0.05)
+    assert result == score(data[:port._pos], HISTORIQUE)
+
+
+def test_sample_stops_once_locked():
+    port = _Port(_stream(frames=50))
+    valid, total = _sample(port, CANDIDATES["1200 7E1"], duration=5)
+    assert total == serial_probe._LOCK_LINES and valid == total
+    assert port._pos < len(port._data)
+
+
+def test_sample_masks_parity_bit():
+    data = _with_parity(_stream())
+    assert _sample(_Port(data), CANDIDATES["1200 7E1"], 0.05)[0] == 0
+    assert data.translate(STRIP_PARITY) == _stream()
+    valid, total = _sample(_Port(data), CANDIDATES["1200 8N1"], 0.05)
+    assert total and valid == total
+
+
+def test_probe_picks_matching_candidate():
+    streams = {"1200 7E1": b"\xff" * 2000, "9600 7E1": b"\x00" * 2000,
+               "1200 8N1": _with_parity(_stream()), "9600 8N1": b"\xfe" * 2000}
+
+    def open_port(settings, timeout):
+        name = next(n for n, s in CANDIDATES.items() if s == settings)
+        return _Port(streams[name])
+
+    assert probe("/dev/null", open_port, 0.05) == "1200 8N1"
+    assert CANDIDATES["1200 8N1"].mode == HISTORIQUE
+    assert probe("/dev/null", open_port, 0.05, mode=STANDARD) is None
@@ -0,0 +1,66 @@
+"""Sorties supplémentaires (sinks.py) : écriture, échecs, formats."""
+
+import json
+
+import pytest
+
+from sinks import FileSink, Sink, _line
+
+
+class _Flaky(Sink):
+    """Échoue sur les lectures marquées, enregistre les autres."""
+
+    def __init__(self, fail: type[Exception], params: dict[str, str] | None = None):
+        super().__init__(f"test://{fail.__name__}", params or {})
+        self.fail = fail
+        self.written: list[dict] = []
+
+    def write(self, ts: float, prefix: str, values: dict) -> None:
+        if values.get("fail"):
+            raise self.fail("échec simulé")
+        self.written.append(values)
+
+
+def test_sink_is_abstract():
+    with pytest.raises(TypeError):
+        Sink("test://", {})
+
+
+@pytest.mark.parametrize("fail", [OSError, ValueError, KeyError])
+def test_worker_survives_write_errors(fail):
+    sink = _Flaky(fail)
+    sink.start()
+    sink.offer(1.0, "edf", {"papp": 1})
+    sink.offer(2.0, "edf", {"fail": True})
+    sink.offer(3.0, "edf", {"papp": 3})
+    sink.stop()
+    assert sink.written == [{"papp": 1}, {"papp": 3}]
+
+
+def test_full_queue_drops_oldest():
+    sink = _Flaky(OSError, {"queue": "2"})
+    for papp in range(5):
+        sink.offer(float(papp), "edf", {"papp": papp})
+    sink.start()
+    sink.stop()
+    assert sink.written == [{"papp": 3}, {"papp": 4}]
+
+
+def test_file_sink_json_and_csv(tmp_path):
+    for name in ("out.ndjson", "out.csv"):
+        sink = FileSink(f"file://{tmp_path / name}", {})
+        sink.start()
+        sink.offer(86400.0 * 365, "edf", {"papp": 750, "ptec": "HP, JB"})
+        sink.stop()
+    (ndjson,) = tmp_path.glob("out-*.ndjson")
+    assert json.loads(ndjson.read_text()) == {"ts": 31536000.0, "prefix": "edf",
+                                              "papp": 750, "ptec": "HP, JB"}
+    (csv,) = tmp_path.glob("out-*.csv")
+    assert csv.read_text().splitlines() == ["ts,prefix,key,value",
+                                            "31536000.0,edf,papp,750",
+                                            '31536000.0,edf,ptec,"HP, JB"']
+
+
+def test_line_protocol():
+    assert (_line(1.5, "edf", {"papp": 750, "ptec": "HPJB", "ok": True, "kwh": 1.25})
+            == 'linky,prefix=edf papp=750i,ptec="HPJB",ok=true,kwh=1.25 1500000000')
@@ -0,0 +1,97 @@
+"""Stockage des lectures non publiées (spool.py) : segments, éviction, rejeu."""
+
+import os
+import time
+
+from spool import Spool
+
+
+def _spool(tmp_path, **options) -> Spool:
+    options = {"max_bytes": 1 << 20, "max_age": 3600, "segment_bytes": 1024, **options}
+    return Spool(str(tmp_path), **options)
+
+
+def _fill(spool: Spool, count: int, start: int = 0) -> None:
+    for i in range(start, start + count):
+        spool.append("linky", "papp", str(i))
+
+
+class _Publish:
+    """publish(prefix, topic, value, ts) qui échoue après `accept` lectures."""
+
+    def __init__(self, accept: int | None = None):
+        self.accept = accept
+        self.values: list[str] = []
+
+    def __call__(self, prefix: str, topic: str, value: str, ts: float) -> bool:
+        if self.accept is not None and len(self.values) >= self.accept:
+            return False
+        self.values.append(value)
+        return True
+
+
+def _segments(tmp_path) -> list[str]:
+    return sorted(name for name in os.listdir(tmp_path) if name.endswith(".spool"))
+
+
+def test_segments_rotate_and_replay_in_order(tmp_path):
+    spool = _spool(tmp_path)
+    _fill(spool, 100)
+    assert len(_segments(tmp_path)) > 1
+    assert all(os.path.getsize(tmp_path / name) < 1024 + 100 for name in _segments(tmp_path))
+    assert spool.count() == 100
+
+    publish = _Publish()
+    assert spool.replay(publish, batch=10, pause=0) == 100
+    assert publish.values == [str(i) for i in range(100)]
+    assert not spool.pending() and _segments(tmp_path) == []
+
+
+def test_size_limit_evicts_oldest_segments(tmp_path):
+    spool = _spool(tmp_path, max_bytes=4096)
+    _fill(spool, 500)
+    assert sum(os.path.getsize(tmp_path / name) for name in _segments(tmp_path)) <= 4096
+    publish = _Publish()
+    spool.replay(publish, batch=100, pause=0)
+    assert publish.values[-1] == "499" and publish.values[0] != "0"
+    assert publish.values == [str(i) for i in range(int(publish.values[0]), 500)]
+
+
+def test_age_limit_evicts_and_skips_old_readings(tmp_path):
+    spool = _spool(tmp_path, max_age=60)
+    _fill(spool, 20)
+    old = _segments(tmp_path)[0]
+    past = time.time() - 120
+    os.utime(tmp_path / old, (past, past))
+    _fill(spool, 40, start=20)                   # nouveau segment : l'ancien est évincé
+    assert old not in _segments(tmp_path)
+    publish = _Publish()
+    spool.replay(publish, batch=100, pause=0)
+    assert "0" not in publish.values and publish.values[-1] == "59"
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    spool = _spool(tmp_path)
+    _fill(spool, 3)
+    with open(tmp_path / _segments(tmp_path)[0], "ab") as f:
+        f.write(b'{"t":1,"p":"linky","k":"pa')          # arrêt brutal en pleine écriture
+
+    reopened = _spool(tmp_path)                          # redémarrage
+    _fill(reopened, 2, start=3)
+    publish = _Publish()
+    assert reopened.replay(publish, batch=10, pause=0) == 5
+    assert publish.values == ["0", "1", "2", "3", "4"]
+
+
+def test_replay_stops_at_first_failure_and_resumes(tmp_path):
+    spool = _spool(tmp_path)
+    _fill(spool, 50)
+    failing = _Publish(accept=7)
+    assert spool.replay(failing, batch=10, pause=0) == 7
+    assert spool.pending() and spool.count() == 43
+
+    _fill(spool, 5, start=50)                            # pendant la coupure
+    publish = _Publish()
+    assert spool.replay(publish, batch=10, pause=0) == 48
+    assert publish.values == [str(i) for i in range(7, 55)]
+    assert not spool.pending()
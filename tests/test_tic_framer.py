@@ -0,0 +1,95 @@
+"""
+Découpage en trames (tic_framer.py) sur des flux enregistrés au format de
+capture.py, relus par blocs de tailles variées.
+"""
+
+import pytest
+
+import tic_synth
+from capture import CaptureWriter, read_capture
+from tic_framer import MAX_FRAME_SIZE, TicFramer
+
+
+def _capture(tmp_path, chunks: list[bytes]) -> bytes:
+    """Enregistre les blocs dans une capture et renvoie le flux relu."""
+    path = str(tmp_path / "capture.tic")
+    writer = CaptureWriter(path)
+    for chunk in chunks:
+        writer.write(chunk)
+    writer.close()
+    return b"".join(data for _offset, data in read_capture(path))
+
+
+def _split(stream: bytes, size: int) -> list[bytes]:
+    return [stream[i:i + size] for i in range(0, len(stream), size)]
+
+
+def _frames(chunks: list[bytes], framer: TicFramer | None = None) -> list[bytes]:
+    framer = framer or TicFramer()
+    return [raw for chunk in chunks for raw in framer.feed(chunk)]
+
+
+@pytest.fixture
+def frames() -> list[bytes]:
+    """Trames complètes (STX / ETX inclus) d'un compteur triphasé simulé."""
+    generator = tic_synth.FrameGenerator(phases=3, seed=1)
+    return [next(generator) for _ in range(20)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, 333, 4096, 1 << 20])
+def test_frames_split_across_reads(tmp_path, frames, size):
+    stream = _capture(tmp_path, frames)
+    assert _frames(_split(stream, size)) == [f[1:-1] for f in frames]
+
+
+def test_bytes_before_first_stx_are_ignored(tmp_path, frames):
+    # Démarrage au milieu d'une trame : la fin de celle-ci est ignorée
+    stream = _capture(tmp_path, [frames[0][40:], *frames[1:3]])
+    assert _frames(_split(stream, 16)) == [f[1:-1] for f in frames[1:3]]
+
+
+def test_stray_etx(tmp_path, frames):
+    stream = _capture(tmp_path, [b"\x03", frames[0], b"\x03\x03 parasite \x03", frames[1]])
+    assert _frames(_split(stream, 5)) == [frames[0][1:-1], frames[1][1:-1]]
+
+
+def test_empty_frame_yields_nothing(tmp_path, frames):
+    stream = _capture(tmp_path, [b"\x02\x03", frames[0]])
+    assert _frames([stream]) == [frames[0][1:-1]]
+
+
+@pytest.mark.parametrize("size", [1, 10, 1 << 20])
+def test_stx_mid_frame_resynchronises(tmp_path, frames, size):
+    # Trame interrompue (débranchement, parasite) : STX avant l'ETX attendu
+    stream = _capture(tmp_path, [frames[0][:len(frames[0]) // 2], frames[1], frames[2]])
+    assert _frames(_split(stream, size)) == [frames[1][1:-1], frames[2][1:-1]]
+
+
+@pytest.mark.parametrize("size", [1, 1000, 1 << 20])
+def test_oversized_frame_is_dropped(tmp_path, frames, size):
+    oversized = b"\x02" + b"A" * (MAX_FRAME_SIZE + 1) + b"\x03"
+    stream = _capture(tmp_path, [frames[0], oversized, frames[1]])
+    assert _frames(_split(stream, size)) == [frames[0][1:-1], frames[1][1:-1]]
+
+
+def test_frame_of_max_size_is_kept(tmp_path):
+    body = b"A" * MAX_FRAME_SIZE
+    stream = _capture(tmp_path, [b"\x02" + body + b"\x03"])
+    assert _frames(_split(stream, 1000)) == [body]
+
+
+def test_reset_drops_frame_in_progress(tmp_path, frames):
+    stream = _capture(tmp_path, frames[:2])
+    cut = len(frames[0]) // 2
+    framer = TicFramer()
+    assert _frames([stream[:cut]], framer) == []
+    framer.reset()
+    # La suite de la trame interrompue n'est pas raccrochée à son début
+    assert _frames([stream[cut:]], framer) == [frames[1][1:-1]]
+
+
+def test_reset_clears_overflow(frames):
+    framer = TicFramer(max_size=64)
+    assert _frames([b"\x02" + b"A" * 100], framer) == []
+    framer.reset()
+    assert _frames([b"\x02short\x03"], framer) == [b"short"]
@@ -0,0 +1,175 @@
+"""
+Décodage des lignes et trames (tic_parser.py), comparé à l'ancien décodeur
+sur str : mêmes lignes acceptées, sauf les checksums valant SP. Le cache de
+lignes (line_cache.py) doit donner les mêmes trames que le décodage direct.
+"""
+
+import random
+
+import pytest
+
+import tic_synth
+from line_cache import LineCache
+from payload import structure_payload
+from tic_parser import AUTO, HISTORIQUE, STANDARD, decode_frame, parse_frame, parse_line
+
+
+def _baseline_parse_frame(raw: bytes) -> dict[str, str]:
+    """Ancien parse_frame (avant le décodage sur octets), pour comparaison."""
+    teleinfo: dict[str, str] = {}
+    text = raw.decode("ascii", errors="ignore")
+    text = text.replace("\x02\n", "").replace("\r\x03", "")
+    for line in text.split("\r\n"):
+        line = line.strip()
+        if not line:
+            continue
+        parts = line.replace("  ", " \x00").split(" ")
+        if len(parts) < 3:
+            continue
+        check = parts.pop()
+        value = parts.pop()
+        label = parts.pop() if parts else ""
+        if check == "\x00":
+            check = " "
+        total = 32 + sum(map(ord, label)) + sum(map(ord, value))
+        if chr(((total % 256) & 0x3F) + 32) == check:
+            teleinfo[label] = value
+    return teleinfo
+
+
+def _corrupt(rand: random.Random, line: bytes) -> bytes:
+    """Une à trois altérations : octet remplacé, inséré, supprimé, séparateurs ajoutés."""
+    data = bytearray(line)
+    for _ in range(rand.randint(1, 3)):
+        op  = rand.random()
+        pos = rand.randrange(len(data) + 1)
+        if op < 0.4 and data:
+            data[rand.randrange(len(data))] = rand.randrange(256)
+        elif op < 0.6:
+            data.insert(pos, rand.choice(b" \t\x00\xffA\x0b\x1c\r\n"))
+        elif op < 0.8 and data:
+            del data[rand.randrange(len(data))]
+        else:
+            data[pos:pos] = rand.choice((b"  ", b" X ", b"\t", b" "))
+    return bytes(data)
+
+
+def _space_checksum(line: bytes) -> bool:
+    return line.endswith(b"  ")
+
+
+def test_same_lines_as_baseline_except_space_checksums():
+    rand = random.Random(3)
+    generator = tic_synth.FrameGenerator(phases=3, seed=5)
+    for _ in range(20_000):
+        line = rand.choice(generator.lines())
+        if rand.random() < 0.5:
+            line = _corrupt(rand, line)
+        for raw in (b"\x02\n" + line + b"\r\x03", b"\n" + line + b"\r"):
+            new, old = parse_frame(raw), _baseline_parse_frame(raw)
+            if _space_checksum(line):
+                assert new.items() >= old.items(), line
+            else:
+                assert new == old, line
+
+
+@pytest.mark.parametrize("phases", [1, 3])
+def test_same_frames_as_baseline(phases):
+    generator = tic_synth.FrameGenerator(phases=phases, seed=2, corrupt_rate=0.05)
+    for raw in (next(generator) for _ in range(500)):
+        new, old = parse_frame(raw), _baseline_parse_frame(raw)
+        assert new.items() >= old.items()
+        # Lignes en plus : uniquement celles dont la checksum vaut SP
+        spaced = {line.split(b" ")[0].decode() for line in raw[2:-2].split(b"\r\n")
+                  if _space_checksum(line)}
+        assert new.keys() - old.keys() <= spaced
+
+
+# ── Checksum SP : changement de comportement voulu ─────────────────────────────
+
+def test_space_checksum_is_accepted():
+    line = tic_synth.line("BBRHPJW", "000586626")
+    assert line.endswith(b"  ")
+    assert parse_line(line) == ("BBRHPJW", "000586626")
+    # L'ancien décodeur retirait la checksum avec strip() et ignorait la ligne
+    raw = tic_synth.frame([line])
+    assert _baseline_parse_frame(raw) == {}
+    assert parse_frame(raw) == {"BBRHPJW": "000586626"}
+
+
+def test_space_checksum_frames():
+    generator = tic_synth.FrameGenerator(seed=4, space_checksums=True)
+    for raw in (next(generator) for _ in range(50)):
+        lines = [line for line in raw[1:-1].split(b"\r\n") if line]
+        assert len(parse_frame(raw)) == len(lines)
+
+
+def test_wrong_space_checksum_is_rejected():
+    body = b"PAPP 00750"
+    assert tic_synth.checksum(body) != 0x20
+    assert parse_line(body + b"  ") is None
+
+
+# ── Formats ────────────────────────────────────────────────────────────────────
+
+def test_historique_line():
+    assert parse_line(tic_synth.line("PAPP", "00750")) == ("PAPP", "00750")
+    assert parse_line(tic_synth.line("PAPP", "00750", corrupt=True)) is None
+
+
+def test_legacy_reading_of_malformed_lines():
+    line = tic_synth.line("IINST", "003")
+    assert parse_line(b" " + line) == ("IINST", "003")            # blanc en tête
+    assert parse_line(b"XX " + line) == ("IINST", "003")          # champ en trop
+    assert parse_line(line[:2] + b"\xff" + line[2:]) == ("IINST", "003")
+    assert parse_line(b" " + line, STANDARD) is None
+
+
+def test_standard_line_and_frame():
+    def std(label: str, value: str, date: str = "") -> bytes:
+        body = f"{label}\t{date}\t{value}\t" if date else f"{label}\t{value}\t"
+        return body.encode() + bytes((tic_synth.checksum(body.encode()),))
+
+    assert parse_line(std("SINSTS", "00750"), STANDARD) == ("SINSTS", "00750")
+    assert parse_line(std("SMAXSN", "06870", "E250101120000"), STANDARD) == ("SMAXSN", "06870")
+    assert parse_line(std("SINSTS", "00750"), HISTORIQUE) is None
+    raw = b"\x02\n" + std("SINSTS", "00750") + b"\r\n" + std("EASF01", "001234567") + b"\r\x03"
+    assert decode_frame(raw)["PAPP"] == "00750"
+
+
+# ── Cache de lignes ────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("options", [{"phases": 1}, {"phases": 3}, {"corrupt_rate": 0.2},
+                                     {"space_checksums": True}])
+def test_line_cache_matches_direct_decoding(options):
+    generator = tic_synth.FrameGenerator(seed=5, **options)
+    cache = LineCache(max_lines=16)                # petit : évictions fréquentes
+    for _ in range(300):
+        raw = next(generator)[1:-1]
+        for mode in (AUTO, HISTORIQUE):
+            expected = structure_payload(decode_frame(raw, mode))
+            assert list(cache.decode(raw, mode).items()) == list(expected.items())
+
+
+def test_line_cache_evicts_least_recently_used():
+    cache = LineCache(max_lines=3)
+    a, b, c, d = (tic_synth.line("PAPP", f"{watts:05d}") for watts in (100, 200, 300, 400))
+    cache.decode(a + b"\r\n" + b + b"\r\n" + c)
+    cache.decode(a)                                # a redevient la plus récente
+    cache.decode(d)                                # évince b, la moins récente
+    assert set(cache._lines) == {a, c, d}
+    assert len(cache) == 3
+    hits = cache.hits
+    cache.decode(a + b"\r\n" + c)
+    assert cache.hits == hits + 2
+
+
+def test_line_cache_returns_previous_frame_for_identical_raw():
+    generator = tic_synth.FrameGenerator(seed=6)
+    cache = LineCache()
+    raw = next(generator)[1:-1]
+    first = cache.decode(raw)
+    assert cache.decode(bytes(raw)) is first and cache.frame_hits == 1
+    other = next(generator)[1:-1]
+    assert cache.decode(other) is not first and cache.frame_hits == 1
+    assert list(cache.decode(raw).items()) == list(first.items())